@@ -0,0 +1,57 @@
+import httpx
+
+from typing import Dict
+
+from api.config import appconfig
+# Pools live in the api package so both the bot and the api deployables share a single implementation
+from api.adapters.rpc_pool import PooledAsyncClient, PooledClient, RpcGateway
+
+
+rpc_gateway = RpcGateway(
+    names={
+        appconfig.RPC_URL_HELIUS: "helius",
+        appconfig.RPC_URL_QUICKNODE: "quicknode",
+        appconfig.RPC_JITO_URL: "jito",
+    },
+    concurrency=appconfig.RPC_ENDPOINTS_CONCURRENCY,
+    max_concurrency=appconfig.RPC_MAX_CONCURRENT_REQUESTS,
+    max_connections=appconfig.RPC_POOL_MAX_CONNECTIONS,
+    keepalive=appconfig.RPC_POOL_KEEPALIVE_SECONDS,
+    timeout=appconfig.RPC_TIMEOUT_SECONDS
+)
+
+
+def rpc_client(url: str) -> PooledAsyncClient:
+    """
+    Pooled replacement of `AsyncClient(url)`: `async with rpc_client(url) as client:`
+    """
+    return rpc_gateway.endpoint(url).async_rpc_client()
+
+
+def rpc_sync_client(url: str) -> PooledClient:
+    """
+    Pooled replacement of `Client(url)`
+    """
+    return rpc_gateway.endpoint(url).rpc_client()
+
+
+def rpc_post(url: str, **kwargs) -> httpx.Response:
+    """
+    Pooled replacement of `requests.post(url, ...)`. Requests are sent to the endpoint owning the url.
+    :param url[str]: endpoint url, optionally followed by a path.
+    """
+    return rpc_gateway.endpoint(endpoint_url(url)).client().post(url, **kwargs)
+
+
+def endpoint_url(url: str) -> str:
+    """
+    Known endpoint url the url belongs to. Unknown urls get a pool of their own per scheme and host.
+    """
+    return rpc_gateway.endpoint_url(url)
+
+
+def rpc_metrics() -> Dict:
+    """
+    :return: requests, errors, in flight requests and average latency by endpoint.
+    """
+    return rpc_gateway.metrics()
@@ -0,0 +1,304 @@
+import asyncio
+import threading
+import time
+import httpx
+
+from solana.rpc.api import Client
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.providers.core import _after_request_unparsed
+from solana.rpc.providers.http import HTTPProvider
+from typing import Dict
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    # httpx needs h2 for HTTP/2. Without it connections are kept alive over HTTP/1.1
+    HTTP2 = False
+
+
+class EndpointMetrics:
+    """
+    Counters of the requests sent to an endpoint through its pool
+    """
+    __slots__ = ("requests", "errors", "in_flight", "max_in_flight", "waiting", "total_seconds", "lock")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.waiting = 0        # Requests waiting for a concurrency slot
+        self.total_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def queue(self):
+        with self.lock:
+            self.waiting += 1
+
+    def start(self):
+        with self.lock:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def finish(self, seconds: float, failed: bool):
+        with self.lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.errors += int(failed)
+            self.total_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "avg_seconds": round(self.total_seconds / self.requests, 6) if self.requests else 0.0
+        }
+
+
+class LimitedTransport(httpx.BaseTransport):
+    """
+    Sync transport letting at most max_concurrency requests reach the endpoint at the same time
+    """
+
+    def __init__(self, endpoint: "RpcEndpoint"):
+        self.endpoint = endpoint
+        self.semaphore = threading.BoundedSemaphore(endpoint.max_concurrency)
+        self.transport = httpx.HTTPTransport(http2=HTTP2, limits=endpoint.limits)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = self.endpoint.metrics
+        metrics.queue()
+        with self.semaphore:
+            metrics.start()
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = self.transport.handle_request(request)
+                failed = response.status_code >= 500
+                return response
+            finally:
+                metrics.finish(seconds=time.perf_counter() - start, failed=failed)
+
+    def close(self):
+        self.transport.close()
+
+
+class LimitedAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async version of LimitedTransport. It belongs to the event loop it was created in.
+    """
+
+    def __init__(self, endpoint: "RpcEndpoint"):
+        self.endpoint = endpoint
+        self.semaphore = asyncio.Semaphore(endpoint.max_concurrency)
+        self.transport = httpx.AsyncHTTPTransport(http2=HTTP2, limits=endpoint.limits)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = self.endpoint.metrics
+        metrics.queue()
+        async with self.semaphore:
+            metrics.start()
+            start = time.perf_counter()
+            failed = True
+            try:
+                response = await self.transport.handle_async_request(request)
+                failed = response.status_code >= 500
+                return response
+            finally:
+                metrics.finish(seconds=time.perf_counter() - start, failed=failed)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    solana-py sync provider posting through the endpoint's pool instead of opening a connection per request
+    """
+
+    def __init__(self, endpoint: "RpcEndpoint", timeout: float):
+        super().__init__(endpoint.url, timeout=timeout)
+        self.pool = endpoint
+
+    def make_request_unparsed(self, body) -> str:
+        return _after_request_unparsed(self.pool.client().post(**self._before_request(body=body)))
+
+    def make_batch_request_unparsed(self, reqs) -> str:
+        return _after_request_unparsed(self.pool.client().post(**self._before_batch_request(reqs)))
+
+
+class PooledClient(Client):
+    def __init__(self, endpoint: "RpcEndpoint", timeout: float = 10):
+        super().__init__(endpoint.url, timeout=timeout)
+        self._provider = PooledHTTPProvider(endpoint=endpoint, timeout=timeout)
+
+
+class PooledAsyncClient(AsyncClient):
+    """
+    solana-py AsyncClient sharing its endpoint's connections.
+    It can be used as `async with` like AsyncClient but leaving the block doesn't close the pool.
+    """
+
+    def __init__(self, endpoint: "RpcEndpoint", session: httpx.AsyncClient, timeout: float = 10):
+        super().__init__(endpoint.url, timeout=timeout)
+        self._provider.session = session
+
+    async def __aenter__(self) -> "PooledAsyncClient":
+        return self
+
+    async def __aexit__(self, _exc_type, _exc, _tb):
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RpcEndpoint:
+    """
+    Keep-alive connection pool and concurrency limit of a single endpoint.
+    The sync pool is shared by every thread and the async pool by every coroutine of the running event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        max_concurrency: int,
+        max_connections: int,
+        keepalive: float,
+        timeout: float = 10
+    ):
+        self.name = name
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive
+        )
+        self.metrics = EndpointMetrics()
+        self.lock = threading.Lock()
+        self._client = None
+        self._sync_rpc = None
+        self._async_loop = None
+        self._async_client = None
+        self._async_rpc = None
+
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self.lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        transport=LimitedTransport(endpoint=self),
+                        timeout=self.timeout
+                    )
+        return self._client
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # Connections and semaphores can't be shared between event loops
+            self._async_loop = loop
+            self._async_client = httpx.AsyncClient(
+                transport=LimitedAsyncTransport(endpoint=self),
+                timeout=self.timeout
+            )
+            self._async_rpc = None
+        return self._async_client
+
+    def rpc_client(self) -> PooledClient:
+        if self._sync_rpc is None:
+            self._sync_rpc = PooledClient(endpoint=self, timeout=self.timeout)
+        return self._sync_rpc
+
+    def async_rpc_client(self) -> PooledAsyncClient:
+        session = self.async_client()
+        if self._async_rpc is None:
+            self._async_rpc = PooledAsyncClient(endpoint=self, session=session, timeout=self.timeout)
+        return self._async_rpc
+
+    def snapshot(self) -> Dict:
+        metrics = self.metrics.snapshot()
+        metrics.update({"max_concurrency": self.max_concurrency, "http2": HTTP2})
+        return metrics
+
+    async def aclose(self):
+        if self._async_client is not None and self._async_loop is asyncio.get_running_loop():
+            await self._async_client.aclose()
+        self._async_loop = None
+        self._async_client = None
+        self._async_rpc = None
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._sync_rpc = None
+
+
+class RpcGateway:
+    """
+    Process-wide registry of endpoint pools. Endpoints are identified by their url so
+    callers keep using the urls from appconfig.
+    :param names[dict]: endpoint name by url. Unknown urls are named after their host.
+    :param concurrency[dict]: concurrent requests by endpoint name. max_concurrency for the rest.
+    """
+
+    def __init__(
+        self,
+        names: Dict[str, str] = None,
+        concurrency: Dict[str, int] = None,
+        max_concurrency: int = 8,
+        max_connections: int = 20,
+        keepalive: float = 30,
+        timeout: float = 10
+    ):
+        self.names = names or {}
+        self.concurrency = concurrency or {}
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.endpoints: Dict[str, RpcEndpoint] = {}
+        self.lock = threading.Lock()
+
+    def endpoint(self, url: str) -> RpcEndpoint:
+        endpoint = self.endpoints.get(url)
+        if endpoint is None:
+            with self.lock:
+                endpoint = self.endpoints.get(url)
+                if endpoint is None:
+                    name = self.names.get(url, httpx.URL(url).host)
+                    endpoint = self.endpoints[url] = RpcEndpoint(
+                        name=name,
+                        url=url,
+                        max_concurrency=self.concurrency.get(name, self.max_concurrency),
+                        max_connections=self.max_connections,
+                        keepalive=self.keepalive,
+                        timeout=self.timeout
+                    )
+        return endpoint
+
+    def endpoint_url(self, url: str) -> str:
+        """
+        Known endpoint url the url belongs to. Unknown urls get a pool of their own per scheme and host.
+        """
+        for known_url in self.names:
+            if url.startswith(known_url):
+                return known_url
+        parsed = httpx.URL(url)
+        return "{}://{}".format(parsed.scheme, parsed.netloc.decode("ascii"))
+
+    def metrics(self) -> Dict:
+        return {endpoint.name: endpoint.snapshot() for endpoint in self.endpoints.values()}
+
+    async def aclose(self):
+        for endpoint in self.endpoints.values():
+            await endpoint.aclose()
+            endpoint.close()
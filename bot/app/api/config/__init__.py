@@ -41,6 +41,12 @@ class AuthConfig:
     RPC_URL_HELIUS = "https://mainnet.helius-rpc.com/?api-key=f32b640c-6877-43e7-924b-2035b448d17e"
     RPC_URL_QUICKNODE = "https://orbital-hardworking-knowledge.solana-mainnet.quiknode.pro/be0d348509d4f9ae26cd7371cd7a08b7d784324d"  # noqa: E501
     RPC_JITO_URL = "https://amsterdam.mainnet.block-engine.jito.wtf/api/v1"
+    # RPC pools: keep-alive connections and concurrent requests per endpoint
+    RPC_TIMEOUT_SECONDS = 10
+    RPC_POOL_MAX_CONNECTIONS = 20
+    RPC_POOL_KEEPALIVE_SECONDS = 30
+    RPC_MAX_CONCURRENT_REQUESTS = 8         # Endpoints not listed in RPC_ENDPOINTS_CONCURRENCY
+    RPC_ENDPOINTS_CONCURRENCY = {"helius": 10, "quicknode": 10, "jito": 4}
     SOL_USD_QUOTE = [
         {
             "url": "https://quote-api.jup.ag/v6/quote?inputMint=So11111111111111111111111111111111111111112&outputMint=EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v&amount=1000000000&slippageBps=1",
@@ -10,7 +10,6 @@ import time
 from api.handlers.exceptions import ErrorProcessingData
 
 from datetime import datetime
-from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TxOpts
 from solana.rpc.commitment import Confirmed
 
@@ -33,6 +32,7 @@ from spl.token.instructions import (
     CloseAccountParams
 )
 from spl.token.constants import ASSOCIATED_TOKEN_PROGRAM_ID, TOKEN_PROGRAM_ID
+from api.adapters.rpc_gateway import rpc_client, rpc_post
 from api.config import appconfig
 from api.handlers.exceptions import EntityNotFoundException
 # from bot.app.api.config import appconfig
@@ -46,7 +46,7 @@ async def get_solana_balance(public_key: Pubkey) -> float:
     :param wallet_address: The public address of the Solana wallet.
     :return: Balance in SOL as a float.
     """
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             # Fetch the balance (in lamports)
             balance_response = await client.get_balance(public_key)
@@ -120,7 +120,7 @@ def get_token_accounts_by_owner(wallet_address=str) -> list[dict]:
         if print_trace:
             logging.info("Requesting getTokenAccountsByOwner for account {}".format(wallet_address))
 
-        response = requests.post(
+        response = rpc_post(
             url=appconfig.RPC_URL_HELIUS,
             json=data,
             headers={"Content-Type": "application/json"}
@@ -171,7 +171,7 @@ def get_token_metadata(token_address: str) -> dict:
             break
 
         try:
-            response = requests.post(
+            response = rpc_post(
                 url=appconfig.RPC_URL_HELIUS,
                 json=data,
                 headers={"Content-Type": "application/json"}
@@ -510,7 +510,7 @@ async def burn_and_close_associated_token_account(
     :return: [str] transaction signature.
     """
     txn_signature = None
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             response = await client.get_account_info(associated_token_account)
             account_info = response.value
@@ -641,7 +641,7 @@ async def close_ata_transaction(
     console_handler = logging.StreamHandler()
     logger.addHandler(console_handler)
 
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             # Will set both burn and close intructions for every ATA
             METRIC = {'ACCOUNTS': len(tokens), 'CLAIMED': sum(token.balance for token in tokens)}
@@ -909,7 +909,7 @@ async def close_burn_ata_instructions(
     """
     instructions = None
 
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             # Will set both burn and close intructions for every ATA
             burn_close_instructions_hex = []
@@ -1078,7 +1078,7 @@ async def recover_rent_client_from_transaction(go_local: bool = True):
         # ]
 
         # Send the signed transaction (example assumes using a Solana RPC client)
-        async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+        async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
             blockhash = await client.get_latest_blockhash()
             recent_blockhash = blockhash.value.blockhash
 
@@ -1165,7 +1165,7 @@ async def recover_rent_client_from_instructions(go_local: bool = True):
         instructions = [Instruction.from_bytes(ix_bytes) for ix_bytes in instructions_bytes]
 
         # Send the signed transaction (example assumes using a Solana RPC client)
-        async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+        async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
             blockhash = await client.get_latest_blockhash()
             recent_blockhash = blockhash.value.blockhash
 
@@ -40,6 +40,33 @@ class AuthConfig:
     WSS_URL_QUICKNODE = "wss://orbital-hardworking-knowledge.solana-mainnet.quiknode.pro/be0d348509d4f9ae26cd7371cd7a08b7d784324d"
     RPC_URL_QUICKNODE = "https://orbital-hardworking-knowledge.solana-mainnet.quiknode.pro/be0d348509d4f9ae26cd7371cd7a08b7d784324d"
     JITO_RPC_URL = "https://amsterdam.mainnet.block-engine.jito.wtf"
+    # RPC pools: keep-alive connections and concurrent requests per endpoint
+    RPC_TIMEOUT_SECONDS = 10
+    RPC_POOL_MAX_CONNECTIONS = 20
+    RPC_POOL_KEEPALIVE_SECONDS = 30
+    RPC_MAX_CONCURRENT_REQUESTS = 8         # Endpoints not listed in RPC_ENDPOINTS_CONCURRENCY
+    RPC_ENDPOINTS_CONCURRENCY = {"helius": 10, "quicknode": 10, "jito": 4}
+    BLOCKHASH_REFRESH_SECONDS = 0.4         # Background refresh of the blockhash used to build transactions
+    BLOCKHASH_MAX_AGE_SECONDS = 20          # Older cached blockhashes are fetched again before being used
+    BONDING_CURVE_MAX_AGE_SECONDS = 5       # Mirrored bonding curves older than this are fetched from the RPC node
+    PUMP_FEE_BASIS_POINTS = 100             # Pump.fun fee charged on every buy and sell
+    JITO_TIP_ACCOUNTS_TTL_SECONDS = 600     # Tip accounts directory is refreshed in background
+    JITO_TIP_ACCOUNTS = [                   # Used until the directory is loaded from the block engine
+        "96gYZGLnJYVFmbjzopPSU6QiEV5fGqZNyN9nmNhvrZU5",
+        "HFqU5x63VTqvQss8hp11i4wVV8bD44PvwucfZ2bU7gRe",
+        "Cw8CFyM9FkoMi7K7Crf6HNQqf4uEMzpKw6QNghXLvLkY",
+        "ADaUMid9yfUytqMBgopwjb2DTLSokTSzL1zt6iGPaS49",
+        "DfXygSm4jCyNCybVYYK6DwvWqjKee8pbDmJGcLWNDXjh",
+        "ADuUkR4vqLUMWXxW9gh6D6L8pMSawimctcNZ5pGwDcEt",
+        "DttWaMuVvTiduZRnguLF7jNxTgiMBZ1hyAumKUiL2KRL",
+        "3AVi9Tg9Uo68tJfuvoKvqKNWKkC5wPdSSdeBnizKZ6jT",
+    ]
+    SIGNATURE_POLL_MIN_SECONDS = 0.2        # Pending signatures are checked together every tick
+    SIGNATURE_POLL_MAX_SECONDS = 2          # Ticks slow down up to this while nothing lands
+    SIGNATURE_SUBSCRIBE_FALLBACK_SECONDS = 3    # Signatures without notification after this are polled too
+    TX_SINKS = ["jito", "jito_bundle", "helius"]    # Transactions are sent to all of them at the same time
+    TX_REBROADCAST_SECONDS = 2              # Sinks send the transaction again until it lands
+    TX_LANDING_TIMEOUT_SECONDS = 30
     PUMPFUN_TRANSACTION_URL = "https://pumpportal.fun/api/trade-local"
     PUMPFUN_WEBSOCKET = "wss://pumpportal.fun/api/data"
     MARKETMAKING_SOL_BUY_AMOUNT = 0.03
@@ -56,9 +83,15 @@ class AuthConfig:
             3
         )
     )
-    TRADING_TOKENS_AT_THE_SAME_TIME = 1
+    TRADING_TRADES_HISTORY_SIZE = 256               # Last trades kept per token being traded
+    TRADING_CONSECUTIVE_BUYS_HISTORY_SIZE = 32      # Last consecutive buys records kept per token
+    TRADING_BUYS_TIMESTAMPS_HISTORY_SIZE = 64       # Last seconds with buys kept per token
+    TRADING_TOKENS_AT_THE_SAME_TIME = int(os.environ.get("TRADING_TOKENS_AT_THE_SAME_TIME", 1))
     TRADING_EXPECTED_GAIN_IN_PERCENTAGE = 0.5
     TRADING_RETRIES = 6
+    TRADING_DEADLINE_SECONDS = 30                   # A trade gives up retrying after this time
+    TRADING_BACKOFF_BASE_SECONDS = 0.25             # First retry waits up to this time, doubling on each retry
+    TRADING_BACKOFF_MAX_SECONDS = 4
     TRADING_TOKEN_TOO_OLD_SECONDS = 5
     TRADING_MARKETING_INACTIVITY_TIMEOUT = 60
     SCANNER_MIN_TRADING_AMOUNT = 1.00       # Min Sols a token must have as first buy to be considered for trading
@@ -69,9 +102,16 @@ class AuthConfig:
     SCANNER_THRESHOLD = 400_000_000         # SOLs bought by scam bot to consider a scam token
     SCANNER_MIN_SCAM_BUYERS = 4             # Minimum bot buyers for a scam to token to be considered
     SCANNER_MAX_TARDES = -1
+    SCANNER_MAX_CONCURRENT_DETECTIONS = 4   # New tokens being checked at the same time in background
     # DB
     REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
     REDIS_PORT = os.environ.get("REDIS_PORT", "6379")
+    REDIS_MAX_CONNECTIONS = 20              # Connections shared by every AsyncRedisDB
+    REDIS_CONNECT_TIMEOUT_SECONDS = 30      # Seconds waiting for redis to be ready when starting
+    REDIS_UNCHECKED_TOKEN_TTL_SECONDS = 60  # Scanned tokens no sniper checked in time are deleted by redis
+    REDIS_STREAM_MAXLEN = 10_000            # Approximate max scanned tokens kept in the handoff stream
+    REDIS_STREAM_BLOCK_SECONDS = 1          # Seconds a sniper waits for new tokens on every read
+    REDIS_STREAM_CLAIM_IDLE_SECONDS = 30    # Tokens not acknowledged by a sniper after this time go to another one
     # BUY and SELL
     BUY_SLIPPAGE = 0.2  # 20% slippage tolerance for buying
     SELL_SLIPPAGE = 0.2
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+from solders.hash import Hash
+from typing import NamedTuple
+
+from bot.config import appconfig
+from bot.domain.rpc_gateway import rpc_client
+
+
+class CachedBlockhash(NamedTuple):
+    blockhash: Hash
+    last_valid_block_height: int
+    slot: int
+    fetched_at: float   # time.monotonic() when it was fetched
+
+
+class BlockhashCache:
+    """
+    Keeps the latest blockhash refreshed in background so transactions can be built
+    without a get_latest_blockhash round trip.
+    The refreshing task is started by the first request and belongs to the running event loop.
+    """
+
+    def __init__(
+        self,
+        url: str = appconfig.RPC_URL_HELIUS,
+        refresh_seconds: float = appconfig.BLOCKHASH_REFRESH_SECONDS,
+        max_age_seconds: float = appconfig.BLOCKHASH_MAX_AGE_SECONDS
+    ):
+        """
+        :param url[str]: RPC endpoint the blockhash is fetched from.
+        :param refresh_seconds[float]: seconds between refreshes.
+        :param max_age_seconds[float]: older blockhashes aren't handed out.
+        """
+        self.url = url
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.cached: CachedBlockhash = None
+        self.task: asyncio.Task = None
+        self.refreshes = 0
+        self.errors = 0
+
+    async def fetch(self) -> CachedBlockhash:
+        async with rpc_client(self.url) as client:
+            response = await client.get_latest_blockhash()
+        return CachedBlockhash(
+            blockhash=response.value.blockhash,
+            last_valid_block_height=response.value.last_valid_block_height,
+            slot=response.context.slot,
+            fetched_at=time.monotonic()
+        )
+
+    async def refresh(self) -> CachedBlockhash:
+        cached = await self.fetch()
+        # Slow responses mustn't replace a newer blockhash
+        if self.cached is None or cached.last_valid_block_height >= self.cached.last_valid_block_height:
+            self.cached = cached
+        self.refreshes += 1
+        return self.cached
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print("BlockhashCache-> Error refreshing blockhash: {}".format(e))
+            await asyncio.sleep(self.refresh_seconds)
+
+    @property
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def start(self) -> asyncio.Task:
+        if not self.is_running:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.is_running:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+
+    def current(self) -> CachedBlockhash:
+        """
+        :return: the freshest blockhash without any network I/O. None if there isn't a fresh one.
+        """
+        cached = self.cached
+        if cached is None or time.monotonic() - cached.fetched_at > self.max_age_seconds:
+            return None
+        return cached
+
+    async def latest(self) -> CachedBlockhash:
+        """
+        Cached blockhash, fetching it only when the cache is cold or stale.
+        """
+        if not self.is_running:
+            self.start()
+        return self.current() or await self.refresh()
+
+
+blockhash_cache = BlockhashCache()
@@ -0,0 +1,193 @@
+import asyncio
+import time
+
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from typing import Dict, List, NamedTuple
+
+from bot.config import appconfig
+from bot.domain.rpc_gateway import rpc_client
+
+# getSignatureStatuses accepts up to 256 signatures per call
+MAX_SIGNATURES_PER_REQUEST = 256
+
+
+class SignatureStatus(NamedTuple):
+    signature: Signature
+    slot: int
+    err: object                 # Transaction error or None when it succeeded
+    confirmation_status: TransactionConfirmationStatus
+    landed_at: float            # time.monotonic() when the status was seen
+
+    @property
+    def ok(self) -> bool:
+        return self.err is None
+
+
+class Watcher(NamedTuple):
+    future: asyncio.Future
+    commitment: TransactionConfirmationStatus
+
+
+class SignatureStatusPoller:
+    """
+    Confirmation service: every pending signature is checked with one getSignatureStatuses call per tick
+    (chunks of 256 sent at the same time), whatever the amount of callers waiting.
+    Callers await the future returned by watch or call confirm. Polling starts every min_interval seconds
+    and slows down to max_interval while nothing lands. New signatures bring it back to min_interval.
+    The polling task only runs while there are pending signatures.
+    """
+
+    def __init__(
+        self,
+        url: str = appconfig.RPC_URL_HELIUS,
+        min_interval: float = appconfig.SIGNATURE_POLL_MIN_SECONDS,
+        max_interval: float = appconfig.SIGNATURE_POLL_MAX_SECONDS,
+        commitment: TransactionConfirmationStatus = TransactionConfirmationStatus.Confirmed
+    ):
+        """
+        :param url[str]: RPC endpoint the statuses are fetched from.
+        :param min_interval[float]: seconds between polls when signatures are landing or were just added.
+        :param max_interval[float]: max seconds between polls.
+        :param commitment[TransactionConfirmationStatus]: default level futures are resolved at.
+        """
+        self.url = url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.commitment = commitment
+        self.pending: Dict[Signature, List[Watcher]] = {}
+        self.task: asyncio.Task = None
+        self.wakeup: asyncio.Event = None
+        self.polls = 0
+        self.requests = 0
+        self.confirmed = 0
+        self.errors = 0
+
+    def watch(self, signature: Signature, commitment: TransactionConfirmationStatus = None) -> asyncio.Future:
+        """
+        :param commitment[TransactionConfirmationStatus]: level to wait for. Defaults to the service one.
+        :return: future resolved with the SignatureStatus once the signature lands (successfully or not).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(signature, []).append(Watcher(future=future, commitment=commitment or self.commitment))
+        self.interval = self.min_interval
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = loop.create_task(self.run())
+        else:
+            self.wakeup.set()
+        return future
+
+    def forget(self, signature: Signature, future: asyncio.Future = None):
+        """
+        Stops watching a signature, only for the given future if any.
+        """
+        watchers = self.pending.get(signature, [])
+        for watcher in list(watchers):
+            if future is None or watcher.future is future:
+                watchers.remove(watcher)
+                watcher.future.cancel()
+        if not watchers:
+            self.pending.pop(signature, None)
+
+    async def confirm(
+        self,
+        signature: Signature,
+        timeout: float = None,
+        commitment: TransactionConfirmationStatus = None
+    ) -> SignatureStatus:
+        """
+        Waits for a signature to land.
+        :return: its status or None if it didn't land within timeout seconds.
+        """
+        future = self.watch(signature, commitment=commitment)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.forget(signature, future)
+            return None
+
+    async def fetch(self, signatures: List[Signature]) -> List:
+        async with rpc_client(self.url) as client:
+            response = await client.get_signature_statuses(signatures)
+        return response.value
+
+    async def poll(self) -> int:
+        """
+        :return: how many watchers were resolved.
+        """
+        signatures = list(self.pending)
+        chunks = [
+            signatures[index: index + MAX_SIGNATURES_PER_REQUEST]
+            for index in range(0, len(signatures), MAX_SIGNATURES_PER_REQUEST)
+        ]
+        responses = await asyncio.gather(*[self.fetch(chunk) for chunk in chunks])
+        self.polls += 1
+        self.requests += len(chunks)
+
+        now = time.monotonic()
+        landed = 0
+        statuses = [status for response in responses for status in response]
+        for signature, status in zip(signatures, statuses):
+            if status is None or status.confirmation_status is None or signature not in self.pending:
+                continue
+            result = SignatureStatus(
+                signature=signature,
+                slot=status.slot,
+                err=status.err,
+                confirmation_status=status.confirmation_status,
+                landed_at=now
+            )
+            for watcher in list(self.pending[signature]):
+                # Processed < Confirmed < Finalized. Failed transactions won't get any further
+                if status.err is None and int(status.confirmation_status) < int(watcher.commitment):
+                    continue
+                self.pending[signature].remove(watcher)
+                if not watcher.future.done():
+                    watcher.future.set_result(result)
+                    landed += 1
+            if not self.pending[signature]:
+                del self.pending[signature]
+        self.confirmed += landed
+        return landed
+
+    async def run(self):
+        while self.pending:
+            self.wakeup.clear()
+            try:
+                if await self.poll():
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval * 1.5, self.max_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.interval = self.max_interval
+                print("SignatureStatusPoller-> Error polling {} signatures: {}".format(len(self.pending), e))
+            # Futures cancelled by their callers aren't polled anymore
+            for signature in list(self.pending):
+                self.pending[signature] = [watcher for watcher in self.pending[signature] if not watcher.future.done()]
+                if not self.pending[signature]:
+                    del self.pending[signature]
+            if self.pending:
+                try:
+                    # New signatures are polled right away
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def metrics(self) -> Dict:
+        return {
+            "pending": len(self.pending),
+            "polls": self.polls,
+            "requests": self.requests,
+            "confirmed": self.confirmed,
+            "errors": self.errors,
+            "interval": round(self.interval, 3)
+        }
+
+
+signature_poller = SignatureStatusPoller()
@@ -1,6 +1,14 @@
-import requests
+import asyncio
+import httpx
 import os
 import random
+import time
+
+from collections import deque
+from solders.pubkey import Pubkey
+
+from bot.config import appconfig
+from bot.domain.rpc_gateway import rpc_post
 
 
 # Jito JSON RPC SDK
@@ -43,20 +51,20 @@ class JitoJsonRpcSDK:
 
         # print(data)
         try:
-            resp = requests.post(self.url + endpoint, headers=headers, json=data)
+            resp = rpc_post(self.url + endpoint, headers=headers, json=data)
             resp.raise_for_status()
             return {"success": True, "data": resp.json()}
-        except requests.exceptions.HTTPError as errh:
+        except httpx.HTTPStatusError as errh:
             return {"succes s": False, "error": f"HTTP Error: {errh}"}
-        except requests.exceptions.ConnectionError as errc:
+        except httpx.ConnectError as errc:
             return {"success": False, "error": f"Error Connecting: {errc}"}
-        except requests.exceptions.Timeout as errt:
+        except httpx.TimeoutException as errt:
             return {"success": False, "error": f"Timeout Error: {errt}"}
-        except requests.exceptions.InvalidHeader as err:
+        except httpx.LocalProtocolError as err:
             return {"success": False, "error": f"Invalid Header error: {err}"}
-        except requests.exceptions.InvalidURL as err:
+        except (httpx.InvalidURL, httpx.UnsupportedProtocol) as err:
             return {"success": False, "error": f"InvalidURL error: {err}"}
-        except requests.exceptions.RequestException as err:
+        except httpx.HTTPError as err:
             return {"success": False, "error": f"An error occurred: {err}"}
 
     # Bundle Endpoint
@@ -141,3 +149,81 @@ class JitoJsonRpcSDK:
             ep += "?" + "&".join(query_params)
 
         return self.__send_request(endpoint=ep, method="sendTransaction", params=params)
+
+
+class TipAccountsDirectory:
+    """
+    Jito tip accounts loaded once and refreshed in background every ttl_seconds.
+    Picking an account never waits for the block engine: until the directory is loaded
+    the well known accounts from appconfig are used.
+    """
+
+    def __init__(self, sdk: JitoJsonRpcSDK = None, ttl_seconds: float = appconfig.JITO_TIP_ACCOUNTS_TTL_SECONDS):
+        self.sdk = sdk or JitoJsonRpcSDK(url="{}/api/v1".format(appconfig.JITO_RPC_URL))
+        self.ttl_seconds = ttl_seconds
+        # Least recently used account on the left
+        self.accounts = deque(Pubkey.from_string(account) for account in appconfig.JITO_TIP_ACCOUNTS)
+        self.loaded_at = None
+        self.task: asyncio.Task = None
+
+    @property
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl_seconds
+
+    def refresh(self) -> bool:
+        """
+        Loads the tip accounts from the block engine (blocking).
+        :return: True if the directory was updated.
+        """
+        response = self.sdk.get_tip_accounts()
+        if not response.get("success"):
+            print("TipAccountsDirectory-> Error getting tip accounts: {}".format(
+                response.get("error", "Unknown error")
+            ))
+            return False
+
+        tip_accounts = response["data"].get("result") or []
+        if not tip_accounts:
+            print("TipAccountsDirectory-> No tip accounts found.")
+            return False
+
+        # New accounts haven't been used yet and go first. Accounts still in the directory keep their usage order
+        accounts = [Pubkey.from_string(account) for account in tip_accounts]
+        known = set(accounts)
+        kept = [account for account in list(self.accounts) if account in known]
+        kept_set = set(kept)
+        self.accounts = deque([account for account in accounts if account not in kept_set] + kept)
+        self.loaded_at = time.monotonic()
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("TipAccountsDirectory-> Error refreshing tip accounts: {}".format(e))
+            await asyncio.sleep(self.ttl_seconds)
+
+    def start(self) -> asyncio.Task:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    def pick(self) -> Pubkey:
+        """
+        Least recently used tip account. Starts the background refresh when it's called from
+        a running event loop and the directory is stale.
+        """
+        if self.is_stale and (self.task is None or self.task.done()):
+            try:
+                self.start()
+            except RuntimeError:
+                pass    # No running event loop: the current directory is used
+        account = self.accounts.popleft()
+        self.accounts.append(account)
+        return account
+
+
+tip_accounts = TipAccountsDirectory()
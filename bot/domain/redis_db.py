@@ -1,15 +1,54 @@
+import asyncio
+import base64
 import json
+import os
 import redis
-from redisearch import Client, NumericField
+import redis.asyncio
+import socket
+import time
+import zlib
+from redis.commands.search.field import NumericField, TagField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.commands.search.query import Query
+from redis.commands.search.result import Result
 from datetime import datetime
 from bot.config import appconfig
 from bot.libs.utils import TxType, Path, Trader
-from typing import List, Dict
+from typing import List, Dict, Tuple
+
+# Unlinks the given token keys that are still unchecked and not newer than ARGV[1] (timestamp).
+# Keys are checked and deleted atomically: a token checked or rewritten meanwhile is kept
+UNLINK_UNCHECKED_TOKENS = """
+local deleted = 0
+for _, key in ipairs(KEYS) do
+    local checked = redis.pcall('JSON.GET', key, '$.is_checked')
+    local timestamp = redis.pcall('JSON.GET', key, '$.timestamp')
+    if checked == '[false]' and type(timestamp) == 'string' then
+        timestamp = tonumber(string.sub(timestamp, 2, -2))
+        if timestamp and timestamp <= tonumber(ARGV[1]) then
+            redis.call('UNLINK', key)
+            deleted = deleted + 1
+        end
+    end
+end
+return deleted
+"""
 
 
 class RedisDB:
     key_prefix = "token"
     index_name = "token_idx"
+    # Fields the fresh tokens are looked up by. Indexes missing any of them are recreated
+    index_tags = ["is_checked", "trader"]
+    # Documents returned per FT.SEARCH page / keys per JSON.MGET
+    batch_size = 1000
+    # Scanner -> sniper handoff. Every trader type is a consumer group
+    stream_name = "tokens:stream"
+    stream_fields = [
+        "amount", "trader", "is_checked", "timestamp", "name", "symbol", "traderPublicKey", "track_traders"
+    ]
+    # Trades of closed tokens are moved to archive:<token key>
+    archive_prefix = "archive"
 
     def __init__(self) -> None:
         self.client = redis.StrictRedis(
@@ -18,8 +57,13 @@ class RedisDB:
             db=0, # DB index number
             decode_responses=True
         )
-        self.search_client = Client("token_idx", conn=self.client)
+        self.search_client = self.client.ft(RedisDB.index_name)
+        # False when RediSearch isn't loaded: tokens are scanned instead
+        self.search_enabled = True
         self.create_index()
+        # Consumer name of this process in the stream groups
+        self.consumer = "{}-{}".format(socket.gethostname(), os.getpid())
+        self.stream_groups = set()
         # Event listener
         self.pubsub = self.client.pubsub()
     
@@ -38,68 +82,231 @@ class RedisDB:
         indexes = self.client.execute_command("FT._LIST")
         return index_name in indexes
 
+    def index_attributes(self) -> List[str]:
+        return RedisDB.parse_index_attributes(self.search_client.info())
+
+    @staticmethod
+    def parse_index_attributes(info: Dict) -> List[str]:
+        # Each attribute is a flat list: identifier, $.path, attribute, name, type, ...
+        return [
+            attribute[attribute.index("attribute") + 1]
+            for attribute in info.get("attributes", [])
+            if "attribute" in attribute
+        ]
+
+    @staticmethod
+    def index_schema() -> Tuple[List, IndexDefinition]:
+        """
+        Index on the JSON token documents.
+        :return: fields and definition.
+        """
+        fields = [
+            NumericField("$.amount", as_name="amount"),
+            NumericField("$.timestamp", as_name="timestamp"),
+            TagField("$.is_traded", as_name="is_traded"),
+            TagField("$.is_checked", as_name="is_checked"),
+            TagField("$.trader", as_name="trader")
+        ]
+        definition = IndexDefinition(
+            prefix=["{}:".format(RedisDB.key_prefix)],
+            index_type=IndexType.JSON
+        )
+        return fields, definition
+
     def create_index(self):
-        if not self.index_exists(RedisDB.index_name):
-            # Create the index on JSON fields
-            self.search_client.create_index([
-                NumericField("amount"),
-                NumericField("timestamp"),
-                NumericField("is_traded")
-            ])
-        else:
-            print("Index '{}' already exists".format(RedisDB.index_name))
+        try:
+            if self.index_exists(RedisDB.index_name):
+                if all(tag in self.index_attributes() for tag in RedisDB.index_tags):
+                    print("Index '{}' already exists".format(RedisDB.index_name))
+                    return
+                # Former index without the lookup tags. Documents are kept
+                print("Index '{}' is outdated. Recreating it".format(RedisDB.index_name))
+                self.search_client.dropindex(delete_documents=False)
 
-    def set_token(self, token: str, token_data: Dict)->bool:
-        response = self.client.json().set(
-            name="{}:{}".format(RedisDB.key_prefix, token),
-            path=Path.rootPath(),
-            obj=token_data
+            fields, definition = RedisDB.index_schema()
+            self.search_client.create_index(fields, definition=definition)
+        except redis.exceptions.ResponseError as e:
+            print("Redis.create_index Error: {}. Tokens will be scanned".format(e))
+            self.search_enabled = False
+
+    @staticmethod
+    def queue_set_token(pipeline, token: str, token_data: Dict):
+        key = "{}:{}".format(RedisDB.key_prefix, token)
+        # Compact record: everything a sniper needs to pick the token up without reading it
+        record = {field: token_data[field] for field in RedisDB.stream_fields if field in token_data}
+        pipeline.json().set(name=key, path=Path.rootPath(), obj=token_data)
+        # Tokens are kept once a sniper checks them
+        pipeline.expire(key, appconfig.REDIS_UNCHECKED_TOKEN_TTL_SECONDS)
+        pipeline.xadd(
+            RedisDB.stream_name,
+            {"key": key, "token": json.dumps(record)},
+            maxlen=appconfig.REDIS_STREAM_MAXLEN,
+            approximate=True
         )
-        return response
+
+    def set_token(self, token: str, token_data: Dict)->bool:
+        """
+        Saves a token and hands it to the snipers through the stream, in one transaction.
+        """
+        pipeline = self.client.pipeline()
+        RedisDB.queue_set_token(pipeline, token=token, token_data=token_data)
+        response = pipeline.execute()
+        return response[0]
+
+    def create_stream_group(self, trader: Trader):
+        if trader.value in self.stream_groups:
+            return
+        try:
+            # Only tokens written from now on are handed to a new group
+            self.client.xgroup_create(RedisDB.stream_name, trader.value, id="$", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.stream_groups.add(trader.value)
+
+    def read_tokens(
+        self,
+        trader: Trader,
+        count: int = 1,
+        block: float = appconfig.REDIS_STREAM_BLOCK_SECONDS
+    ) -> List[Dict]:
+        """
+        Takes new tokens from the stream. Every token is delivered to only one consumer of the trader group
+        and is delivered again to another one unless it's acknowledged with ack_tokens.
+        :param count[int]: max tokens taken.
+        :param block[float]: seconds waiting for tokens when there isn't any.
+        :return: tokens like get_fresh_tokens ones plus their stream_id.
+        """
+        self.create_stream_group(trader=trader)
+        # Tokens left unacknowledged by a stopped sniper come first
+        entries = self.claim_tokens(trader=trader, count=count)
+        if not entries:
+            response = self.client.xreadgroup(
+                trader.value,
+                self.consumer,
+                {RedisDB.stream_name: ">"},
+                count=count,
+                block=int(block * 1000)
+            )
+            entries = response[0][1] if response else []
+
+        tokens, skipped = RedisDB.stream_tokens(entries=entries, trader=trader)
+        self.ack_tokens(trader=trader, stream_ids=skipped)
+        return tokens
+
+    @staticmethod
+    def stream_tokens(entries: List, trader: Trader) -> Tuple[List[Dict], List[str]]:
+        """
+        :return: tokens of the trader and stream ids of the entries to be skipped.
+        """
+        tokens = []
+        skipped = []
+        for stream_id, fields in entries:
+            data = json.loads(fields["token"])
+            if data.get("is_checked", False) or data.get("trader", "unknown") != trader.value:
+                skipped.append(stream_id)
+                continue
+            token = RedisDB.to_token(key=fields["key"], data=data)
+            token["stream_id"] = stream_id
+            tokens.append(token)
+        return tokens, skipped
+
+    def claim_tokens(self, trader: Trader, count: int = 1) -> List:
+        try:
+            response = self.client.xautoclaim(
+                RedisDB.stream_name,
+                trader.value,
+                self.consumer,
+                min_idle_time=int(appconfig.REDIS_STREAM_CLAIM_IDLE_SECONDS * 1000),
+                count=count
+            )
+        except redis.exceptions.ResponseError:
+            # XAUTOCLAIM requires redis 6.2
+            return []
+        # Entries deleted by the stream max length are returned empty
+        return [(stream_id, fields) for stream_id, fields in response or [] if fields]
+
+    def ack_tokens(self, trader: Trader, stream_ids: List[str]) -> int:
+        if not stream_ids:
+            return 0
+        return self.client.xack(RedisDB.stream_name, trader.value, *stream_ids)
 
     def get_token_keys(self, pattern="token:*"):
         keys = self.client.scan_iter(match=pattern)
         return keys
     
     def get_fresh_tokens(self, trader=Trader, mint_address: str = None) -> List[Dict]:
-        tokens = []
-        token_keys = []
-        # Search for all tokens where is_checked = False
+        """
+        Unchecked tokens of a trader.
+        :param mint_address[str]: token key to check instead of every token, e.g. a keyspace notification key.
+        """
         if mint_address:
-            token_keys = [mint_address]
+            documents = [(mint_address, self.client.json().get(mint_address))]
+        elif self.search_enabled:
+            documents = self.search_fresh_tokens(trader=trader)
         else:
-            token_keys = self.get_token_keys()
+            documents = self.scan_tokens()
+        return RedisDB.fresh_tokens(documents=documents, trader=trader)
 
-        # query = Query('@is_traded:[0 0]').paging(0, 1000)
-        # results = self.search_client.search(query)
-        for key in token_keys:
-            data = self.client.json().get(key)
+    @staticmethod
+    def fresh_tokens(documents: List[tuple], trader: Trader) -> List[Dict]:
+        tokens = []
+        for key, data in documents:
             if not data:
                 continue
+            # Search results are already filtered. Scanned or notified ones aren't
+            if not data.get("is_checked", False) and data.get("trader", "unknown") == trader.value:
+                tokens.append(RedisDB.to_token(key=key, data=data))
+        return tokens
 
-            # Extract and validate fields
-            is_checked = data.get("is_checked", False)
-
-            trader_match = data.get("trader", "unknown") == trader.value
-
-            if not is_checked and trader_match:
-                track_traders = data["track_traders"] if "track_traders" in data else []
-                # By default we'll always keeep track of the developer
-                track_traders.append(data["traderPublicKey"])
-                token = {
-                    "key": key,
-                    "mint": key.replace("token:", ""),      # Mint address from key value
-                    "amount": float(data["amount"]),        # Amount of Sols to be traded
-                    "trader": data["trader"],               # Trader bot that will execute this trade
-                    "is_checked": is_checked,               # By default is_checked is False.
-                    "timestamp": data["timestamp"],         # Getting timestamp from redis
-                    "name": data["name"],                   # Token name
-                    "symbol": data["symbol"],               # Token's symbol
-                    "track_traders": track_traders          # Tracking other traders activity
-                }
-                tokens.append(token)
+    @staticmethod
+    def fresh_tokens_query(trader: Trader, offset: int) -> Query:
+        return Query("@trader:{{{}}} @is_checked:{{false}}".format(trader.value)).paging(offset, RedisDB.batch_size)
 
-        return tokens
+    def search_fresh_tokens(self, trader: Trader) -> List[tuple]:
+        """
+        Unchecked tokens of a trader from the index, one FT.SEARCH per page of matches.
+        :return: (key, document) pairs.
+        """
+        documents = []
+        offset = 0
+        while True:
+            results = self.search_client.search(RedisDB.fresh_tokens_query(trader=trader, offset=offset))
+            documents += [(document.id, json.loads(document.json)) for document in results.docs]
+            offset += RedisDB.batch_size
+            if offset >= results.total or not results.docs:
+                return documents
+
+    def scan_tokens(self) -> List[tuple]:
+        """
+        Every token, fetched with one JSON.MGET per batch of scanned keys.
+        :return: (key, document) pairs.
+        """
+        documents = []
+        keys = list(self.get_token_keys())
+        for index in range(0, len(keys), RedisDB.batch_size):
+            batch = keys[index: index + RedisDB.batch_size]
+            # $ paths return a list of matches per key
+            values = self.client.json().mget(batch, Path.rootPath())
+            documents += [(key, value[0] if value else None) for key, value in zip(batch, values)]
+        return documents
+
+    @staticmethod
+    def to_token(key: str, data: Dict) -> Dict:
+        track_traders = data["track_traders"] if "track_traders" in data else []
+        # By default we'll always keeep track of the developer
+        track_traders.append(data["traderPublicKey"])
+        return {
+            "key": key,
+            "mint": key.replace("token:", ""),      # Mint address from key value
+            "amount": float(data["amount"]),        # Amount of Sols to be traded
+            "trader": data["trader"],               # Trader bot that will execute this trade
+            "is_checked": data.get("is_checked", False),    # By default is_checked is False.
+            "timestamp": data["timestamp"],         # Getting timestamp from redis
+            "name": data["name"],                   # Token name
+            "symbol": data["symbol"],               # Token's symbol
+            "track_traders": track_traders          # Tracking other traders activity
+        }
 
     def update_token(
             self,
@@ -112,15 +319,59 @@ class RedisDB:
             is_closed: bool = False,
             balance: float = None,
             token_balance: float = None,
-            trades: List[Dict] = []
+            trades: List[Dict] = None
         ) -> Dict:
+        """
+        Updates only the fields of a state transition, in one pipeline. The stored document isn't rewritten.
+        Closing a traded token moves its trades to the archive.
+        :param trades[List[Dict]]: trades appended to the token's trades list.
+        """
+        archived_trades = None
+        if is_closed and not is_checked:
+            # $ paths return a list of matches
+            stored_trades = self.client.json().get(token["key"], "$.trades")
+            archived_trades = (stored_trades[0] if stored_trades else []) + (trades or [])
 
-        key = token["key"]
-        data = token.copy()
-        data.pop("key")
-        data.pop("mint")
-        #data["timestamp"] = data["timestamp"].isoformat()
+        pipeline = self.client.pipeline()
+        new_data = RedisDB.queue_update_token(
+            pipeline,
+            key=token["key"],
+            txn=txn,
+            action=action,
+            amount=amount,
+            trader=trader,
+            is_checked=is_checked,
+            is_closed=is_closed,
+            balance=balance,
+            token_balance=token_balance,
+            trades=trades,
+            archived_trades=archived_trades
+        )
+        RedisDB.report_errors(key=token["key"], responses=pipeline.execute(raise_on_error=False))
 
+        # Returning original token data with new data
+        token.update(new_data)
+        return token
+
+    @staticmethod
+    def queue_update_token(
+            pipeline,
+            key: str,
+            txn: str = None,
+            action: TxType = None,
+            amount: float = None,
+            trader: Trader = None,
+            is_checked: bool = False,
+            is_closed: bool = False,
+            balance: float = None,
+            token_balance: float = None,
+            trades: List[Dict] = None,
+            archived_trades: List[Dict] = None
+        ) -> Dict:
+        """
+        :param archived_trades[List[Dict]]: every trade of a token being closed. They're archived instead of appended.
+        :return: the new token data.
+        """
         # Prepare the data to update
         current_time = datetime.now().timestamp()
         new_data = {}
@@ -142,42 +393,356 @@ class RedisDB:
                 "{}_balance".format(action.value): balance,             # Wallet balance before buy / after sell
                 "{}_token_balance".format(action.value): token_balance,  # Token balance after buy
                 "is_closed": is_closed,
-                "trades": trades
+                "trades": trades or []
             }
 
-        data.update(new_data)
+        for field, value in new_data.items():
+            if field != "trades":
+                pipeline.json().set(key, "$.{}".format(field), value)
+        if is_checked:
+            pipeline.json().set(key, "$.trades", [])
+            # Tokens closed when checked aren't traded: they expire as unchecked ones do
+            if not is_closed:
+                pipeline.persist(key)
+        elif archived_trades is not None:
+            RedisDB.queue_archive_trades(pipeline, key=key, trades=archived_trades)
+        elif trades:
+            # Tokens that were never checked have no trades list yet
+            pipeline.json().set(key, "$.trades", [], nx=True)
+            pipeline.json().arrappend(key, "$.trades", *trades)
+        return new_data
+
+    @staticmethod
+    def queue_archive_trades(pipeline, key: str, trades: List[Dict]):
+        """
+        Compressed trades go to the archive key. The token keeps a summary of them.
+        """
+        archive_key = "{}:{}".format(RedisDB.archive_prefix, key)
+        pipeline.set(archive_key, RedisDB.compress_trades(trades))
+        pipeline.json().set(key, "$.trades", [])
+        pipeline.json().set(key, "$.trades_count", len(trades))
+        pipeline.json().set(key, "$.trades_archive", archive_key)
 
-        # Add or update the fields in the existing token
-        self.client.json().set(key, Path.rootPath(), data)
+    @staticmethod
+    def compress_trades(trades: List[Dict]) -> str:
+        # Base64 text: the client decodes every response
+        return base64.b64encode(zlib.compress(json.dumps(trades).encode(), 9)).decode()
 
-        # Returning original token data with new data
+    @staticmethod
+    def decompress_trades(archive: str) -> List[Dict]:
+        return json.loads(zlib.decompress(base64.b64decode(archive)))
+
+    def get_archived_trades(self, key: str) -> List[Dict]:
+        """
+        :param key[str]: token key.
+        :return: trades of a closed token.
+        """
+        archive = self.client.get("{}:{}".format(RedisDB.archive_prefix, key))
+        return RedisDB.decompress_trades(archive) if archive else []
+
+    @staticmethod
+    def report_errors(key: str, responses: List):
+        for response in responses:
+            if isinstance(response, Exception):
+                # Mostly tokens that expired before being checked
+                print("Redis.update_token-> Token {} wasn't updated: {}".format(key, response))
+                return
+
+    @staticmethod
+    def unchecked_tokens_query(before: float, offset: int = 0) -> Query:
+        """
+        Page of unchecked tokens written before a timestamp. Deleted tokens leave the index, so the offset
+        only skips the tokens kept in previous pages.
+        """
+        query = Query("@is_checked:{{false}} @timestamp:[-inf {}]".format(before))
+        return query.no_content().paging(offset, RedisDB.batch_size)
+
+    @staticmethod
+    def report_deletions(deleted_tokens: int, started: float):
+        seconds = time.monotonic() - started
+        print("Redis.delete_unchecked_tokens-> {} tokens deleted in {:.2f}s ({:.0f} tokens/s)".format(
+            deleted_tokens,
+            seconds,
+            deleted_tokens / seconds if seconds else 0
+        ))
+
+    def delete_unchecked_tokens(self) -> int:
+        """
+        Deletes unchecked tokens written before the call, batch_size keys per round trip. Keys come from the index
+        (or a SCAN without RediSearch) and are filtered and unlinked server side, so tokens being written or
+        checked by the scanners and snipers meanwhile are kept.
+        :return: tokens deleted.
+        """
+        started = time.monotonic()
+        before = datetime.now().timestamp()
+        script = self.client.register_script(UNLINK_UNCHECKED_TOKENS)
+        deleted_tokens = 0
+        try:
+            if self.search_enabled:
+                offset = 0
+                while True:
+                    query = RedisDB.unchecked_tokens_query(before, offset=offset)
+                    keys = [document.id for document in self.search_client.search(query).docs]
+                    deleted = script(keys=keys, args=[before]) if keys else 0
+                    deleted_tokens += deleted
+                    # Tokens kept by the script (being updated meanwhile) are skipped in the next pages
+                    offset += len(keys) - deleted
+                    if len(keys) < RedisDB.batch_size:
+                        break
+            else:
+                cursor = 0
+                while True:
+                    cursor, keys = self.client.scan(
+                        cursor=cursor,
+                        match="{}:*".format(RedisDB.key_prefix),
+                        count=RedisDB.batch_size
+                    )
+                    if keys:
+                        deleted_tokens += script(keys=keys, args=[before])
+                    if cursor == 0:
+                        break
+        except Exception as e:
+            print("Redis.delete_unchecked_tokens Error: {}".format(e))
+
+        RedisDB.report_deletions(deleted_tokens=deleted_tokens, started=started)
+        return deleted_tokens
+
+
+class AsyncRedisDB:
+    """
+    RedisDB for the event loop: same token store, stream and index, every call is awaitable.
+    Every instance shares one connection pool. Calls wait until connect has reached the server.
+    """
+    pool: redis.asyncio.ConnectionPool = None
+
+    def __init__(self) -> None:
+        if AsyncRedisDB.pool is None:
+            AsyncRedisDB.pool = redis.asyncio.ConnectionPool(
+                host=appconfig.REDIS_HOST,
+                port=appconfig.REDIS_PORT,
+                db=0,
+                decode_responses=True,
+                max_connections=appconfig.REDIS_MAX_CONNECTIONS
+            )
+        self.client = redis.asyncio.StrictRedis(connection_pool=AsyncRedisDB.pool)
+        self.ready = asyncio.Event()
+        # False when RediSearch isn't loaded: tokens are scanned instead
+        self.search_enabled = True
+        # Consumer name of this process in the stream groups
+        self.consumer = "{}-{}".format(socket.gethostname(), os.getpid())
+        self.stream_groups = set()
+
+    async def connect(self, timeout: float = appconfig.REDIS_CONNECT_TIMEOUT_SECONDS) -> "AsyncRedisDB":
+        """
+        Waits for the server to answer and prepares the index. Sets ready when it's done.
+        :param timeout[float]: seconds retrying before raising the connection error.
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                await self.client.ping()
+                break
+            except (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, OSError) as e:
+                if asyncio.get_running_loop().time() + appconfig.RETRYING_SECONDS > deadline:
+                    raise
+                print("AsyncRedisDB-> Redis isn't ready: {}. Retrying...".format(e))
+                await asyncio.sleep(appconfig.RETRYING_SECONDS)
+        await self.create_index()
+        self.ready.set()
+        return self
+
+    async def wait_ready(self, timeout: float = None) -> bool:
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def close(self):
+        # The pool is shared by every instance and it's kept open
+        await self.client.close()
+
+    async def index_exists(self, index_name) -> bool:
+        indexes = await self.client.execute_command("FT._LIST")
+        return index_name in indexes
+
+    async def index_attributes(self) -> List[str]:
+        response = await self.client.execute_command("FT.INFO", RedisDB.index_name)
+        return RedisDB.parse_index_attributes(dict(zip(response[::2], response[1::2])))
+
+    async def create_index(self):
+        try:
+            if await self.index_exists(RedisDB.index_name):
+                attributes = await self.index_attributes()
+                if all(tag in attributes for tag in RedisDB.index_tags):
+                    return
+                print("Index '{}' is outdated. Recreating it".format(RedisDB.index_name))
+                await self.client.execute_command("FT.DROPINDEX", RedisDB.index_name)
+
+            fields, definition = RedisDB.index_schema()
+            await self.client.ft(RedisDB.index_name).create_index(fields, definition=definition)
+        except redis.exceptions.ResponseError as e:
+            print("AsyncRedisDB.create_index Error: {}. Tokens will be scanned".format(e))
+            self.search_enabled = False
+
+    async def set_token(self, token: str, token_data: Dict) -> bool:
+        """
+        Saves a token and hands it to the snipers through the stream, in one transaction.
+        """
+        await self.ready.wait()
+        pipeline = self.client.pipeline()
+        RedisDB.queue_set_token(pipeline, token=token, token_data=token_data)
+        response = await pipeline.execute()
+        return response[0]
+
+    async def create_stream_group(self, trader: Trader):
+        if trader.value in self.stream_groups:
+            return
+        try:
+            await self.client.xgroup_create(RedisDB.stream_name, trader.value, id="$", mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.stream_groups.add(trader.value)
+
+    async def read_tokens(
+        self,
+        trader: Trader,
+        count: int = 1,
+        block: float = appconfig.REDIS_STREAM_BLOCK_SECONDS
+    ) -> List[Dict]:
+        """
+        Same as RedisDB.read_tokens. Waiting for tokens doesn't block the event loop.
+        """
+        await self.ready.wait()
+        await self.create_stream_group(trader=trader)
+        entries = await self.claim_tokens(trader=trader, count=count)
+        if not entries:
+            response = await self.client.xreadgroup(
+                trader.value,
+                self.consumer,
+                {RedisDB.stream_name: ">"},
+                count=count,
+                block=int(block * 1000)
+            )
+            entries = response[0][1] if response else []
+
+        tokens, skipped = RedisDB.stream_tokens(entries=entries, trader=trader)
+        await self.ack_tokens(trader=trader, stream_ids=skipped)
+        return tokens
+
+    async def claim_tokens(self, trader: Trader, count: int = 1) -> List:
+        try:
+            response = await self.client.xautoclaim(
+                RedisDB.stream_name,
+                trader.value,
+                self.consumer,
+                min_idle_time=int(appconfig.REDIS_STREAM_CLAIM_IDLE_SECONDS * 1000),
+                count=count
+            )
+        except redis.exceptions.ResponseError:
+            return []
+        return [(stream_id, fields) for stream_id, fields in response or [] if fields]
+
+    async def ack_tokens(self, trader: Trader, stream_ids: List[str]) -> int:
+        if not stream_ids:
+            return 0
+        return await self.client.xack(RedisDB.stream_name, trader.value, *stream_ids)
+
+    async def get_fresh_tokens(self, trader=Trader, mint_address: str = None) -> List[Dict]:
+        """
+        Same as RedisDB.get_fresh_tokens.
+        """
+        await self.ready.wait()
+        if mint_address:
+            documents = [(mint_address, await self.client.json().get(mint_address))]
+        elif self.search_enabled:
+            documents = await self.search_fresh_tokens(trader=trader)
+        else:
+            documents = await self.scan_tokens()
+        return RedisDB.fresh_tokens(documents=documents, trader=trader)
+
+    async def search_fresh_tokens(self, trader: Trader) -> List[tuple]:
+        documents = []
+        offset = 0
+        while True:
+            query = RedisDB.fresh_tokens_query(trader=trader, offset=offset)
+            # Search results are parsed by the client synchronously: FT.SEARCH is sent as a raw command
+            response = await self.client.execute_command("FT.SEARCH", RedisDB.index_name, *query.get_args())
+            results = Result(response, True)
+            documents += [(document.id, json.loads(document.json)) for document in results.docs]
+            offset += RedisDB.batch_size
+            if offset >= results.total or not results.docs:
+                return documents
+
+    async def scan_tokens(self) -> List[tuple]:
+        documents = []
+        keys = [key async for key in self.client.scan_iter(match="{}:*".format(RedisDB.key_prefix))]
+        for index in range(0, len(keys), RedisDB.batch_size):
+            batch = keys[index: index + RedisDB.batch_size]
+            values = await self.client.json().mget(batch, Path.rootPath())
+            documents += [(key, value[0] if value else None) for key, value in zip(batch, values)]
+        return documents
+
+    async def update_token(self, token: Dict, **kwargs) -> Dict:
+        """
+        Same as RedisDB.update_token.
+        """
+        await self.ready.wait()
+        if kwargs.get("is_closed") and not kwargs.get("is_checked"):
+            stored_trades = await self.client.json().get(token["key"], "$.trades")
+            kwargs["archived_trades"] = (stored_trades[0] if stored_trades else []) + (kwargs.get("trades") or [])
+
+        pipeline = self.client.pipeline()
+        new_data = RedisDB.queue_update_token(pipeline, key=token["key"], **kwargs)
+        RedisDB.report_errors(key=token["key"], responses=await pipeline.execute(raise_on_error=False))
         token.update(new_data)
         return token
 
-    def delete_unchecked_tokens(self)-> int:
+    async def get_archived_trades(self, key: str) -> List[Dict]:
+        archive = await self.client.get("{}:{}".format(RedisDB.archive_prefix, key))
+        return RedisDB.decompress_trades(archive) if archive else []
+
+    async def delete_unchecked_tokens(self) -> int:
+        """
+        Same as RedisDB.delete_unchecked_tokens.
+        """
+        await self.ready.wait()
+        started = time.monotonic()
+        before = datetime.now().timestamp()
+        script = self.client.register_script(UNLINK_UNCHECKED_TOKENS)
         deleted_tokens = 0
-        # Search for keys where is_checked is false
         try:
-            # Scan and filter keys
-            cursor = 0
-            while True:
-                cursor, keys = self.client.scan(cursor=cursor, match='token:*', count=1000)
-                for key in keys:
-                    data = self.client.json().get(key)
-                    if data:
-                        try: 
-                            if data.get('is_checked') is False:  # Check the condition
-                                self.client.delete(key)
-                                deleted_tokens += 1
-                        except json.JSONDecodeError:
-                            continue  # Skip keys with invalid JSON
-                if cursor == 0:
-                    break
+            if self.search_enabled:
+                offset = 0
+                while True:
+                    query = RedisDB.unchecked_tokens_query(before, offset=offset)
+                    response = await self.client.execute_command("FT.SEARCH", RedisDB.index_name, *query.get_args())
+                    keys = [document.id for document in Result(response, False).docs]
+                    deleted = await script(keys=keys, args=[before]) if keys else 0
+                    deleted_tokens += deleted
+                    offset += len(keys) - deleted
+                    if len(keys) < RedisDB.batch_size:
+                        break
+            else:
+                cursor = 0
+                while True:
+                    cursor, keys = await self.client.scan(
+                        cursor=cursor,
+                        match="{}:*".format(RedisDB.key_prefix),
+                        count=RedisDB.batch_size
+                    )
+                    if keys:
+                        deleted_tokens += await script(keys=keys, args=[before])
+                    if cursor == 0:
+                        break
         except Exception as e:
-            print("Redis.delete_unchecked_tokens Error: {}".format(e))
+            print("AsyncRedisDB.delete_unchecked_tokens Error: {}".format(e))
 
+        RedisDB.report_deletions(deleted_tokens=deleted_tokens, started=started)
         return deleted_tokens
 
+
 def test_create_record(mint_address: str):
     redis_object = RedisDB()
     is_traded = False
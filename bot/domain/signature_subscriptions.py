@@ -0,0 +1,248 @@
+import asyncio
+import itertools
+import json
+import time
+import websockets
+import websockets.exceptions
+
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from typing import Dict, List
+
+from bot.config import appconfig
+from bot.domain.confirmations import SignatureStatus, SignatureStatusPoller, signature_poller
+
+COMMITMENT_STATUS = {
+    "processed": TransactionConfirmationStatus.Processed,
+    "confirmed": TransactionConfirmationStatus.Confirmed,
+    "finalized": TransactionConfirmationStatus.Finalized,
+}
+
+
+class SignatureSubscriptions:
+    """
+    Push confirmations: a signatureSubscribe per pending signature, all of them multiplexed over one
+    persistent websocket connection. Signatures are handed to the batched poller when the connection
+    is down, the subscription is rejected or the notification doesn't arrive within fallback_seconds.
+    Whichever sees the signature landing first resolves it.
+    Same interface as SignatureStatusPoller: watch, forget and confirm.
+    """
+
+    def __init__(
+        self,
+        url: str = appconfig.WSS_URL_HELIUS,
+        poller: SignatureStatusPoller = signature_poller,
+        commitment: str = "confirmed",
+        fallback_seconds: float = appconfig.SIGNATURE_SUBSCRIBE_FALLBACK_SECONDS
+    ):
+        """
+        :param url[str]: RPC node websocket url.
+        :param poller[SignatureStatusPoller]: confirmation service used as fallback.
+        :param commitment[str]: processed, confirmed or finalized.
+        :param fallback_seconds[float]: seconds waiting for a notification before polling the signature too.
+        """
+        self.url = url
+        self.poller = poller
+        self.commitment = commitment
+        self.fallback_seconds = fallback_seconds
+        self.pending: Dict[Signature, List[asyncio.Future]] = {}
+        self.polled: Dict[Signature, asyncio.Future] = {}
+        self.requests: Dict[int, Signature] = {}            # Request id -> signature
+        self.subscriptions: Dict[int, Signature] = {}       # Subscription id -> signature
+        self.ids = itertools.count(1)
+        self.websocket = None
+        self.task: asyncio.Task = None
+        self.pushed = 0
+        self.fallbacks = 0
+
+    def watch(self, signature: Signature, commitment: TransactionConfirmationStatus = None) -> asyncio.Future:
+        """
+        :param commitment[TransactionConfirmationStatus]: a level other than the subscriptions one is only polled.
+        :return: future resolved with the SignatureStatus once the signature lands (successfully or not).
+        """
+        if commitment is not None and commitment != COMMITMENT_STATUS[self.commitment]:
+            return self.poller.watch(signature, commitment=commitment)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        is_new = signature not in self.pending
+        self.pending.setdefault(signature, []).append(future)
+        self.start()
+        if is_new:
+            if self.websocket is not None:
+                loop.create_task(self.subscribe(signature))
+            else:
+                self.fallback(signature)
+            loop.call_later(self.fallback_seconds, self.fallback, signature)
+        return future
+
+    def forget(self, signature: Signature, future: asyncio.Future = None):
+        """
+        Stops watching a signature, only for the given future if any.
+        """
+        futures = self.pending.get(signature, [])
+        for watcher in list(futures):
+            if future is None or watcher is future:
+                futures.remove(watcher)
+                watcher.cancel()
+        if not futures:
+            self.release(signature)
+        # Watchers of other commitment levels are handled by the poller
+        self.poller.forget(signature, future)
+
+    async def confirm(
+        self,
+        signature: Signature,
+        timeout: float = None,
+        commitment: TransactionConfirmationStatus = None
+    ) -> SignatureStatus:
+        """
+        Waits for a signature to land.
+        :return: its status or None if it didn't land within timeout seconds.
+        """
+        future = self.watch(signature, commitment=commitment)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            self.forget(signature, future)
+            return None
+
+    def fallback(self, signature: Signature):
+        """
+        Polls a signature that is still pending and isn't being polled yet.
+        """
+        if signature not in self.pending or signature in self.polled:
+            return
+        self.fallbacks += 1
+        future = self.polled[signature] = self.poller.watch(signature)
+        future.add_done_callback(
+            lambda done: self.resolve(signature, done.result()) if not done.cancelled() else None
+        )
+
+    def resolve(self, signature: Signature, status: SignatureStatus):
+        for future in self.pending.get(signature, []):
+            if not future.done():
+                future.set_result(status)
+        self.release(signature)
+
+    def release(self, signature: Signature):
+        """
+        Drops everything kept for a signature: polling and its subscription.
+        """
+        self.pending.pop(signature, None)
+        polled = self.polled.pop(signature, None)
+        if polled is not None and not polled.done():
+            self.poller.forget(signature, polled)
+        for subscription, subscribed in list(self.subscriptions.items()):
+            if subscribed == signature:
+                del self.subscriptions[subscription]
+                if self.websocket is not None:
+                    asyncio.get_running_loop().create_task(self.send("signatureUnsubscribe", [subscription]))
+        for request, requested in list(self.requests.items()):
+            if requested == signature:
+                del self.requests[request]
+
+    async def send(self, method: str, params: List) -> int:
+        request = next(self.ids)
+        try:
+            await self.websocket.send(json.dumps({"jsonrpc": "2.0", "id": request, "method": method, "params": params}))
+        except (websockets.exceptions.ConnectionClosed, AttributeError):
+            # The connection is gone, pending signatures are polled until it's back
+            return None
+        return request
+
+    async def subscribe(self, signature: Signature):
+        request = next(self.ids)
+        self.requests[request] = signature
+        payload = {
+            "jsonrpc": "2.0",
+            "id": request,
+            "method": "signatureSubscribe",
+            "params": [str(signature), {"commitment": self.commitment}]
+        }
+        try:
+            await self.websocket.send(json.dumps(payload))
+        except (websockets.exceptions.ConnectionClosed, AttributeError):
+            self.requests.pop(request, None)
+            self.fallback(signature)
+
+    def handle(self, message: Dict):
+        if "id" in message:
+            signature = self.requests.pop(message["id"], None)
+            if signature is None:
+                return
+            if "error" in message:
+                print("SignatureSubscriptions-> signatureSubscribe rejected: {}".format(message["error"]))
+                self.fallback(signature)
+            elif signature in self.pending:
+                self.subscriptions[message["result"]] = signature
+            return
+
+        if message.get("method") != "signatureNotification":
+            return
+        params = message["params"]
+        value = params["result"]["value"]
+        # Received notifications (value "receivedSignature") only tell the node has seen it
+        if not isinstance(value, dict):
+            return
+        signature = self.subscriptions.pop(params["subscription"], None)
+        if signature is None or signature not in self.pending:
+            return
+        self.pushed += 1
+        self.resolve(signature, SignatureStatus(
+            signature=signature,
+            slot=params["result"]["context"]["slot"],
+            err=value.get("err"),
+            confirmation_status=COMMITMENT_STATUS[self.commitment],
+            landed_at=time.monotonic()
+        ))
+
+    async def run(self):
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_size=None) as websocket:
+                    self.websocket = websocket
+                    # Signatures added while disconnected are being polled. Subscribing them too is faster
+                    for signature in list(self.pending):
+                        await self.subscribe(signature)
+                    async for message in websocket:
+                        self.handle(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except (websockets.exceptions.ConnectionClosed, OSError) as e:
+                print("SignatureSubscriptions-> Connection lost: {}. Reconnecting...".format(e))
+            except Exception as e:
+                print("SignatureSubscriptions-> Error: {}. Reconnecting...".format(e))
+            finally:
+                self.websocket = None
+                self.requests.clear()
+                self.subscriptions.clear()
+                for signature in list(self.pending):
+                    self.fallback(signature)
+            await asyncio.sleep(appconfig.RETRYING_SECONDS)
+
+    def start(self) -> asyncio.Task:
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    async def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.task = None
+
+    def metrics(self) -> Dict:
+        return {
+            "connected": self.websocket is not None,
+            "pending": len(self.pending),
+            "subscriptions": len(self.subscriptions),
+            "pushed": self.pushed,
+            "fallbacks": self.fallbacks
+        }
+
+
+signature_subscriptions = SignatureSubscriptions()
@@ -0,0 +1,231 @@
+import asyncio
+import httpx
+import random
+
+from datetime import datetime
+from enum import Enum
+from solders.commitment_config import CommitmentLevel
+from solders.keypair import Keypair
+from solders.rpc.config import RpcSendTransactionConfig
+from solders.rpc.requests import SendVersionedTransaction
+from solders.transaction import VersionedTransaction
+from typing import Dict, NamedTuple
+
+from bot.config import appconfig, AppMode
+from bot.domain.rpc_gateway import rpc_apost
+from bot.libs.utils import TxType
+
+
+class TradeStatus(Enum):
+    sent = "sent"
+    simulated = "simulated"
+    failed = "failed"
+    timeout = "timeout"
+
+
+class TradeResult(NamedTuple):
+    txtype: TxType
+    mint: str
+    status: TradeStatus
+    signature: str = None
+    attempts: int = 0
+    error: str = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (TradeStatus.sent, TradeStatus.simulated)
+
+
+class TradeError(Exception):
+    """
+    Failed trade attempt. Retryable errors are worth sending again.
+    """
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = appconfig.TRADING_BACKOFF_BASE_SECONDS,
+    cap: float = appconfig.TRADING_BACKOFF_MAX_SECONDS
+) -> float:
+    """
+    Exponential backoff with full jitter: a random wait up to base * 2^attempt seconds, never above cap.
+    Retries of many tokens failing at the same time don't hit the endpoints together.
+    :param attempt[int]: 0 for the first retry.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def error_message(response: httpx.Response) -> str:
+    """
+    Error returned by an RPC endpoint, whatever the shape of the response body.
+    """
+    try:
+        body = response.json()
+    except ValueError:
+        return "status code {}: {}".format(response.status_code, response.text[:200])
+
+    error = body.get("error") if isinstance(body, dict) else None
+    if isinstance(error, dict):
+        return error.get("message", str(error))
+    return str(error or body)
+
+
+def sign_transaction(content: bytes, keypair: Keypair) -> VersionedTransaction:
+    """
+    Signs the transaction serialized by PumpPortal.
+    """
+    message = VersionedTransaction.from_bytes(content).message
+    return VersionedTransaction(message, [keypair])
+
+
+class TradeExecutor:
+    """
+    Builds trades with PumpPortal and sends them through Jito without blocking the event loop.
+    Every attempt reuses the endpoints' pooled connections. Failed attempts are retried with
+    jittered exponential backoff until max_retries or deadline_seconds is reached.
+    """
+
+    def __init__(
+        self,
+        transaction_url: str = appconfig.PUMPFUN_TRANSACTION_URL,
+        rpc_url: str = appconfig.JITO_RPC_URL,
+        max_retries: int = None,
+        deadline_seconds: float = appconfig.TRADING_DEADLINE_SECONDS,
+        backoff_base_seconds: float = appconfig.TRADING_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = appconfig.TRADING_BACKOFF_MAX_SECONDS
+    ):
+        """
+        :param max_retries[int]: retries of a sell. None reads TRADING_RETRIES when trading.
+        :param deadline_seconds[float]: max time spent in a trade, retries included.
+        :param backoff_base_seconds[float]: max wait before the first retry. It doubles on each retry.
+        :param backoff_max_seconds[float]: max wait between retries.
+        """
+        self.transaction_url = transaction_url
+        self.rpc_url = rpc_url
+        self.max_retries = max_retries
+        self.deadline_seconds = deadline_seconds
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+    async def attempt(self, data: Dict, keypair: Keypair) -> str:
+        """
+        :return: signature of the transaction sent.
+        """
+        try:
+            response = await rpc_apost(self.transaction_url, data=data)
+        except httpx.HTTPError as e:
+            raise TradeError("{} request failed: {!r}".format(self.transaction_url, e))
+
+        if response.status_code != 200:
+            raise TradeError(
+                "{} returned a status code {}".format(self.transaction_url, response.status_code),
+                # Bad requests won't get better by retrying
+                retryable=response.status_code == 429 or response.status_code >= 500
+            )
+
+        try:
+            tx = sign_transaction(content=response.content, keypair=keypair)
+        except Exception as e:
+            raise TradeError("Invalid transaction returned: {}".format(e), retryable=False)
+
+        config = RpcSendTransactionConfig(
+            preflight_commitment=CommitmentLevel.Confirmed,
+            skip_preflight=True
+        )
+        try:
+            response = await rpc_apost(
+                self.rpc_url,
+                headers={"Content-Type": "application/json"},
+                content=SendVersionedTransaction(tx, config).to_json()
+            )
+        except httpx.HTTPError as e:
+            raise TradeError("{} request failed: {!r}".format(self.rpc_url, e))
+
+        try:
+            signature = response.json().get("result")
+        except (ValueError, AttributeError):
+            signature = None
+        if not signature:
+            raise TradeError("Transaction failed: {}".format(error_message(response)))
+        return signature
+
+    async def execute(self, data: Dict, keypair: Keypair, txtype: TxType, mint: str) -> TradeResult:
+        """
+        Trades until it's sent, retries are exhausted or the deadline is reached.
+        Buys aren't retried: the opportunity is gone by then.
+        :param data[dict]: PumpPortal trade-local body.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.deadline_seconds
+        max_retries = appconfig.TRADING_RETRIES if self.max_retries is None else self.max_retries
+        retries = max_retries if txtype.value == TxType.sell.value else 0
+
+        def result(status: TradeStatus, attempts: int, signature: str = None, error: str = None) -> TradeResult:
+            return TradeResult(
+                txtype=txtype,
+                mint=mint,
+                status=status,
+                signature=signature,
+                attempts=attempts,
+                error=error,
+                elapsed=round(loop.time() - start, 6)
+            )
+
+        if appconfig.APPMODE not in [AppMode.real.value]:
+            current_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
+            print("simulate trade -> {} MODE: returning dummy transaction at {}".format(
+                appconfig.APPMODE,
+                current_time
+            ))
+            return result(TradeStatus.simulated, attempts=0, signature="txn_dummy_{}".format(txtype.value))
+
+        attempt = 0
+        error = None
+        while True:
+            attempt += 1
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return result(TradeStatus.timeout, attempts=attempt - 1, error=error)
+            try:
+                signature = await asyncio.wait_for(
+                    self.attempt(data=data, keypair=keypair),
+                    timeout=remaining
+                )
+                current_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
+                print("Trade->{} Transaction: https://solscan.io/tx/{} at {}".format(
+                    txtype.value,
+                    signature,
+                    current_time
+                ))
+                return result(TradeStatus.sent, attempts=attempt, signature=signature)
+            except asyncio.TimeoutError:
+                print("Trade->{} Error: deadline of {}s reached. Exiting".format(txtype.value, self.deadline_seconds))
+                return result(TradeStatus.timeout, attempts=attempt, error=error or "Deadline reached")
+            except TradeError as e:
+                error = str(e)
+                if not e.retryable or attempt > retries:
+                    # TODO: send a telegram message notifying that a manual sell must be done
+                    print("Trade->{} Error: {}. Exiting after {} attempts".format(txtype.value, error, attempt))
+                    return result(TradeStatus.failed, attempts=attempt, error=error)
+
+            delay = min(
+                backoff_delay(attempt - 1, base=self.backoff_base_seconds, cap=self.backoff_max_seconds),
+                max(deadline - loop.time(), 0)
+            )
+            print("Trade->{} Error: {}. Retrying again in {:.2f}s ({}/{})".format(
+                txtype.value,
+                error,
+                delay,
+                attempt,
+                retries
+            ))
+            await asyncio.sleep(delay)
+
+
+trade_executor = TradeExecutor()
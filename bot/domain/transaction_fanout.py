@@ -0,0 +1,243 @@
+import asyncio
+import base64
+import threading
+import time
+
+from solders.signature import Signature
+from typing import Dict, List, NamedTuple
+
+from bot.config import appconfig
+from bot.domain.confirmations import SignatureStatus
+from bot.domain.rpc_gateway import rpc_apost
+from bot.domain.signature_subscriptions import SignatureSubscriptions, signature_subscriptions
+
+
+class SinkStats:
+    """
+    Counters of a sink. Landing latency is measured from the fan-out start for the transactions
+    the sink acknowledged first, which is the closest we can get to knowing who landed them.
+    """
+    __slots__ = ("sent", "errors", "wins", "ack_seconds", "landing_seconds", "lock")
+
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+        self.wins = 0
+        self.ack_seconds = 0.0
+        self.landing_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def ack(self, seconds: float):
+        with self.lock:
+            self.sent += 1
+            self.ack_seconds += seconds
+
+    def error(self):
+        with self.lock:
+            self.errors += 1
+
+    def win(self, seconds: float):
+        with self.lock:
+            self.wins += 1
+            self.landing_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        return {
+            "sent": self.sent,
+            "errors": self.errors,
+            "wins": self.wins,
+            "avg_ack_seconds": round(self.ack_seconds / self.sent, 6) if self.sent else 0.0,
+            "avg_landing_seconds": round(self.landing_seconds / self.wins, 6) if self.wins else 0.0
+        }
+
+
+class TransactionSink:
+    """
+    Endpoint accepting signed transactions through a JSON RPC method.
+    """
+    method = "sendTransaction"
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.stats = SinkStats()
+
+    def params(self, encoded: str) -> List:
+        return [encoded, {"encoding": "base64"}]
+
+    async def send(self, encoded: str):
+        """
+        :param encoded[str]: base64 signed transaction.
+        """
+        response = await rpc_apost(
+            self.url,
+            json={"jsonrpc": "2.0", "id": 1, "method": self.method, "params": self.params(encoded)}
+        )
+        response.raise_for_status()
+        body = response.json()
+        error = body.get("error")
+        if error:
+            raise ValueError(error.get("message", error) if isinstance(error, dict) else error)
+        return body.get("result")
+
+
+class JitoTransactionSink(TransactionSink):
+    def __init__(self, name: str = "jito", url: str = appconfig.JITO_RPC_URL + "/api/v1/transactions"):
+        super().__init__(name=name, url=url)
+
+
+class JitoBundleSink(TransactionSink):
+    """
+    Single transaction bundle. The transaction must pay a Jito tip.
+    """
+    method = "sendBundle"
+
+    def __init__(self, name: str = "jito_bundle", url: str = appconfig.JITO_RPC_URL + "/api/v1/bundles"):
+        super().__init__(name=name, url=url)
+
+    def params(self, encoded: str) -> List:
+        return [[encoded], {"encoding": "base64"}]
+
+
+class RpcSink(TransactionSink):
+    def params(self, encoded: str) -> List:
+        # Preflight was done when building it and the sinks are already retrying it
+        return [encoded, {"encoding": "base64", "skipPreflight": True, "maxRetries": 0}]
+
+
+def build_sinks(names: List[str]) -> List[TransactionSink]:
+    """
+    :param names[list]: jito, jito_bundle, helius or quicknode.
+    """
+    factories = {
+        "jito": JitoTransactionSink,
+        "jito_bundle": JitoBundleSink,
+        "helius": lambda: RpcSink(name="helius", url=appconfig.RPC_URL_HELIUS),
+        "quicknode": lambda: RpcSink(name="quicknode", url=appconfig.RPC_URL_QUICKNODE),
+    }
+    return [factories[name]() for name in names]
+
+
+class FanoutResult(NamedTuple):
+    signature: Signature
+    status: SignatureStatus     # None if it didn't land
+    first_sink: str             # Sink acknowledging the transaction first
+    elapsed: float
+    errors: Dict[str, str]      # Sink name -> error
+
+    @property
+    def landed(self) -> bool:
+        return self.status is not None
+
+    @property
+    def ok(self) -> bool:
+        return self.landed and self.status.ok
+
+    @property
+    def error(self) -> str:
+        if self.status is not None:
+            return None if self.status.ok else str(self.status.err)
+        if self.errors and self.first_sink is None:
+            return "; ".join("{}: {}".format(name, error) for name, error in self.errors.items())
+        return "Not landed after {}s".format(round(self.elapsed, 3))
+
+
+class TransactionFanout:
+    """
+    Sends the same signed transaction to every sink at the same time and keeps rebroadcasting it
+    until it lands. Landing is tracked by the signature subscriptions (or any confirmation service
+    with the same interface): the first status wins and the remaining sends are cancelled.
+    """
+
+    def __init__(
+        self,
+        sinks: List[TransactionSink],
+        poller: SignatureSubscriptions = signature_subscriptions,
+        rebroadcast_seconds: float = appconfig.TX_REBROADCAST_SECONDS,
+        timeout: float = appconfig.TX_LANDING_TIMEOUT_SECONDS
+    ):
+        """
+        :param rebroadcast_seconds[float]: seconds between sends to the same sink. 0 sends it once.
+        :param timeout[float]: max seconds waiting for the transaction to land.
+        """
+        self.sinks = sinks
+        self.poller = poller
+        self.rebroadcast_seconds = rebroadcast_seconds
+        self.timeout = timeout
+
+    async def broadcast(self, sink: TransactionSink, encoded: str, acks: List[str], errors: Dict[str, str]):
+        while True:
+            sent_at = time.monotonic()
+            try:
+                await sink.send(encoded)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A failing sink leaves the race, the others keep going
+                sink.stats.error()
+                errors[sink.name] = str(e) or repr(e)
+                return
+            sink.stats.ack(time.monotonic() - sent_at)
+            if sink.name not in acks:
+                acks.append(sink.name)
+            if not self.rebroadcast_seconds:
+                return
+            await asyncio.sleep(self.rebroadcast_seconds)
+
+    async def submit(self, transaction, timeout: float = None) -> FanoutResult:
+        """
+        :param transaction[Transaction | VersionedTransaction]: signed transaction.
+        :param timeout[float]: max seconds waiting for it to land. Defaults to the fan-out timeout.
+        """
+        loop = asyncio.get_running_loop()
+        signature = transaction.signatures[0]
+        encoded = base64.b64encode(bytes(transaction)).decode("ascii")
+        start = time.monotonic()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+        acks: List[str] = []
+        errors: Dict[str, str] = {}
+
+        landing = self.poller.watch(signature)
+        sends = [loop.create_task(self.broadcast(sink, encoded, acks, errors)) for sink in self.sinks]
+        status = None
+        try:
+            pending = {landing, *sends}
+            while landing in pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                # Nothing will land if every sink failed before taking it
+                if not acks and len(errors) == len(self.sinks):
+                    break
+                _, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if landing.done() and not landing.cancelled():
+                status = landing.result()
+        finally:
+            for send in sends:
+                send.cancel()
+            if not landing.done():
+                self.poller.forget(signature, landing)
+
+        first_sink = acks[0] if acks else None
+        if status is not None and first_sink is not None:
+            self.sink(first_sink).stats.win(status.landed_at - start)
+
+        return FanoutResult(
+            signature=signature,
+            status=status,
+            first_sink=first_sink,
+            elapsed=round(time.monotonic() - start, 6),
+            errors=errors
+        )
+
+    def sink(self, name: str) -> TransactionSink:
+        return next(sink for sink in self.sinks if sink.name == name)
+
+    def metrics(self) -> Dict:
+        """
+        :return: sends, errors, wins and latencies by sink.
+        """
+        return {sink.name: sink.stats.snapshot() for sink in self.sinks}
+
+
+transaction_fanout = TransactionFanout(sinks=build_sinks(appconfig.TX_SINKS))
@@ -0,0 +1,315 @@
+import asyncio
+import numpy as np
+import struct
+import threading
+import time
+
+from construct import Struct, Int64ul, Flag
+from solders.pubkey import Pubkey
+from typing import Dict, NamedTuple, Tuple
+
+from bot.config import appconfig
+from bot.libs.utils import get_account_information
+
+EXPECTED_DISCRIMINATOR = struct.pack("<Q", 6966180631402821399)
+
+# Reserves every Pump.fun bonding curve starts with (lamports and raw token units)
+INITIAL_VIRTUAL_SOL_RESERVES = 30_000_000_000
+INITIAL_VIRTUAL_TOKEN_RESERVES = 1_073_000_000_000_000
+INITIAL_REAL_TOKEN_RESERVES = 793_100_000_000_000
+TOKEN_TOTAL_SUPPLY = 1_000_000_000_000_000
+BASIS_POINTS = 10_000
+
+
+class BondingCurveState:
+    _STRUCT = Struct(
+        "virtual_token_reserves" / Int64ul,
+        "virtual_sol_reserves" / Int64ul,
+        "real_token_reserves" / Int64ul,
+        "real_sol_reserves" / Int64ul,
+        "token_total_supply" / Int64ul,
+        "complete" / Flag
+    )
+
+    def __init__(self, data: bytes) -> None:
+        parsed = self._STRUCT.parse(data[8:])
+        self.__dict__.update(parsed)
+
+    @classmethod
+    def from_virtual_reserves(
+        cls,
+        virtual_sol_reserves: int,
+        virtual_token_reserves: int,
+        complete: bool = False
+    ) -> "BondingCurveState":
+        """
+        Curve state rebuilt from its virtual reserves. Real reserves are what was added to or taken
+        from the initial virtual reserves.
+        :param virtual_sol_reserves[int]: lamports.
+        :param virtual_token_reserves[int]: raw token units.
+        """
+        state = cls.__new__(cls)
+        state.virtual_sol_reserves = int(virtual_sol_reserves)
+        state.virtual_token_reserves = int(virtual_token_reserves)
+        state.real_sol_reserves = max(state.virtual_sol_reserves - INITIAL_VIRTUAL_SOL_RESERVES, 0)
+        state.real_token_reserves = max(
+            state.virtual_token_reserves - (INITIAL_VIRTUAL_TOKEN_RESERVES - INITIAL_REAL_TOKEN_RESERVES),
+            0
+        )
+        state.token_total_supply = TOKEN_TOTAL_SUPPLY
+        state.complete = complete
+        return state
+
+
+def curve_from_block(token_data: Dict) -> BondingCurveState:
+    """
+    Curve of a token created in a block after the buys decoded from that same block.
+    Buys only carry the buyer's max SOL cost (slippage included), so the SOL reserves are derived
+    from the tokens bought keeping the curve's constant product.
+    :param token_data[dict]: token with its buyers from decode_token_bundles.
+    """
+    # Every buy instruction in the block, also the ones of repeated buyers
+    raw_tokens_bought = token_data.get("raw_tokens_bought")
+    if raw_tokens_bought is None:
+        raw_tokens_bought = sum(
+            round(buyer["tokens_bought"] * 10 ** appconfig.TOKEN_DECIMALS) for buyer in token_data.get("buyers", [])
+        )
+    virtual_token_reserves = INITIAL_VIRTUAL_TOKEN_RESERVES - raw_tokens_bought
+    virtual_sol_reserves = INITIAL_VIRTUAL_SOL_RESERVES * INITIAL_VIRTUAL_TOKEN_RESERVES // virtual_token_reserves
+
+    return BondingCurveState.from_virtual_reserves(
+        virtual_sol_reserves=virtual_sol_reserves,
+        virtual_token_reserves=virtual_token_reserves
+    )
+
+
+def get_pump_curve_state(curve_address: Pubkey) -> BondingCurveState:
+    response = get_account_information(curve_address)
+    if not response.value or not response.value.data:
+        raise ValueError("Invalid curve state: No data")
+
+    data = response.value.data
+    if data[:8] != EXPECTED_DISCRIMINATOR:
+        raise ValueError("Invalid curve state discriminator")
+
+    return BondingCurveState(data)
+
+
+class BondingCurveMirror:
+    """
+    Bonding curves of the tokens being traded, kept up to date from the trades we already receive
+    (PumpPortal trade messages and decoded block buys) so quoting a trade needs no RPC call.
+    Curves not updated for max_age_seconds are fetched again from the RPC node.
+    """
+
+    def __init__(self, max_age_seconds: float = appconfig.BONDING_CURVE_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self.curves: Dict[str, Tuple[BondingCurveState, float]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set(self, mint: str, state: BondingCurveState) -> BondingCurveState:
+        with self.lock:
+            self.curves[mint] = (state, time.monotonic())
+        return state
+
+    def update_from_trade(self, msg: Dict) -> BondingCurveState:
+        """
+        :param msg[dict]: PumpPortal trade message with vSolInBondingCurve (SOL) and vTokensInBondingCurve (tokens).
+        :return: updated curve or None if the message doesn't carry reserves.
+        """
+        if "vSolInBondingCurve" not in msg or "vTokensInBondingCurve" not in msg:
+            return None
+
+        return self.set(msg["mint"], BondingCurveState.from_virtual_reserves(
+            virtual_sol_reserves=round(msg["vSolInBondingCurve"] * appconfig.LAMPORTS_PER_SOL),
+            virtual_token_reserves=round(msg["vTokensInBondingCurve"] * 10 ** appconfig.TOKEN_DECIMALS)
+        ))
+
+    def update_from_block(self, token_data: Dict) -> BondingCurveState:
+        """
+        :param token_data[dict]: token with its buyers from decode_token_bundles.
+        """
+        return self.set(token_data["mint"], curve_from_block(token_data))
+
+    def get(self, mint: str) -> BondingCurveState:
+        """
+        :return: mirrored curve or None if it's unknown or stale.
+        """
+        entry = self.curves.get(mint)
+        if entry is None or time.monotonic() - entry[1] > self.max_age_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def state(self, mint: Pubkey, curve_address: Pubkey) -> BondingCurveState:
+        """
+        Mirrored curve falling back to fetching the bonding curve account (blocking).
+        """
+        state = self.get(str(mint))
+        if state is None:
+            state = self.set(str(mint), get_pump_curve_state(curve_address))
+        return state
+
+    async def astate(self, mint: Pubkey, curve_address: Pubkey) -> BondingCurveState:
+        state = self.get(str(mint))
+        if state is None:
+            state = self.set(str(mint), await asyncio.to_thread(get_pump_curve_state, curve_address))
+        return state
+
+    def remove(self, mint: str):
+        with self.lock:
+            self.curves.pop(mint, None)
+
+
+bonding_curves = BondingCurveMirror()
+
+
+class Quote(NamedTuple):
+    """
+    Integer quote: lamports and raw token units. Batched quotes hold NumPy arrays.
+    """
+    amount_in: int      # Lamports spent (fee included) or tokens sold
+    amount_out: int     # Tokens bought or lamports received (fee deducted)
+    fee: int            # Pump.fun fee in lamports
+    limit: int          # max_sol_cost for buys and min_sol_output for sells after slippage
+
+
+def _check_curve(state: BondingCurveState):
+    if state.complete:
+        raise ValueError("Curve is complete")
+    if state.virtual_token_reserves <= 0 or state.virtual_sol_reserves <= 0:
+        raise ValueError("Invalid reserve state")
+
+
+def _divmod_big(numerator: int, divisors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    divmod(numerator, divisors) for a numerator wider than 64 bits, exact and vectorised.
+    Long division in digits as wide as the divisors leave room for, so every intermediate value fits in int64.
+    """
+    bits = 62 - int(divisors.max(initial=1)).bit_length()
+    if bits < 1:
+        raise ValueError("Divisors are too big for int64 long division")
+
+    digits = []
+    while numerator:
+        numerator, digit = divmod(numerator, 1 << bits)
+        digits.append(digit)
+
+    quotient = np.zeros_like(divisors)
+    remainder = np.zeros_like(divisors)
+    for digit in reversed(digits):
+        remainder = (remainder << bits) + digit
+        quotient = (quotient << bits) + remainder // divisors
+        remainder = remainder % divisors
+    return quotient, remainder
+
+
+def quote_buy(
+    state: BondingCurveState,
+    lamports: int,
+    slippage_bps: int = 0,
+    fee_bps: int = appconfig.PUMP_FEE_BASIS_POINTS
+) -> Quote:
+    """
+    Tokens bought spending lamports, Pump.fun fee included, as the program computes them.
+    :param lamports[int]: total lamports to spend.
+    :param slippage_bps[int]: tolerance added to max_sol_cost.
+    :param fee_bps[int]: Pump.fun fee in basis points.
+    """
+    _check_curve(state)
+    if lamports <= 0:
+        return Quote(amount_in=0, amount_out=0, fee=0, limit=0)
+
+    # The fee is charged on top of the SOL going into the curve
+    sol_in = lamports * BASIS_POINTS // (BASIS_POINTS + fee_bps)
+    product = state.virtual_sol_reserves * state.virtual_token_reserves
+    tokens = state.virtual_token_reserves - (product // (state.virtual_sol_reserves + sol_in) + 1)
+    return Quote(
+        amount_in=lamports,
+        amount_out=max(min(tokens, state.real_token_reserves), 0),
+        fee=lamports - sol_in,
+        limit=lamports * (BASIS_POINTS + slippage_bps) // BASIS_POINTS
+    )
+
+
+def quote_sell(
+    state: BondingCurveState,
+    tokens: int,
+    slippage_bps: int = 0,
+    fee_bps: int = appconfig.PUMP_FEE_BASIS_POINTS
+) -> Quote:
+    """
+    Lamports received selling raw token units, Pump.fun fee deducted.
+    :param tokens[int]: raw token units to sell.
+    :param slippage_bps[int]: tolerance taken from min_sol_output.
+    :param fee_bps[int]: Pump.fun fee in basis points.
+    """
+    _check_curve(state)
+    if tokens <= 0:
+        return Quote(amount_in=0, amount_out=0, fee=0, limit=0)
+
+    sol_out = tokens * state.virtual_sol_reserves // (state.virtual_token_reserves + tokens)
+    fee = sol_out * fee_bps // BASIS_POINTS
+    lamports = sol_out - fee
+    return Quote(
+        amount_in=tokens,
+        amount_out=lamports,
+        fee=fee,
+        limit=lamports * (BASIS_POINTS - slippage_bps) // BASIS_POINTS
+    )
+
+
+def quote_buy_batch(
+    state: BondingCurveState,
+    lamports: np.ndarray,
+    slippage_bps: int = 0,
+    fee_bps: int = appconfig.PUMP_FEE_BASIS_POINTS
+) -> Quote:
+    """
+    quote_buy for an array of amounts (e.g. sizing or slippage sweeps). Same integer results.
+    :param lamports[np.ndarray]: total lamports to spend.
+    """
+    _check_curve(state)
+    lamports = np.maximum(np.asarray(lamports, dtype=np.int64), 0)
+    sol_in = lamports * BASIS_POINTS // (BASIS_POINTS + fee_bps)
+    # virtual_token_reserves - (product // (virtual_sol_reserves + sol_in) + 1) without overflowing int64
+    divisors = state.virtual_sol_reserves + sol_in
+    product = state.virtual_sol_reserves * state.virtual_token_reserves
+    quotient, _ = _divmod_big(product, divisors)
+    tokens = state.virtual_token_reserves - (quotient + 1)
+    tokens = np.where(lamports > 0, np.clip(tokens, 0, state.real_token_reserves), 0)
+    return Quote(
+        amount_in=lamports,
+        amount_out=tokens,
+        fee=lamports - sol_in,
+        limit=lamports * (BASIS_POINTS + slippage_bps) // BASIS_POINTS
+    )
+
+
+def quote_sell_batch(
+    state: BondingCurveState,
+    tokens: np.ndarray,
+    slippage_bps: int = 0,
+    fee_bps: int = appconfig.PUMP_FEE_BASIS_POINTS
+) -> Quote:
+    """
+    quote_sell for an array of raw token amounts. Same integer results.
+    :param tokens[np.ndarray]: raw token units to sell.
+    """
+    _check_curve(state)
+    tokens = np.maximum(np.asarray(tokens, dtype=np.int64), 0)
+    # tokens * vsol // (vtok + tokens) == vsol - ceil(vsol * vtok / (vtok + tokens))
+    product = state.virtual_sol_reserves * state.virtual_token_reserves
+    quotient, remainder = _divmod_big(product, state.virtual_token_reserves + tokens)
+    sol_out = state.virtual_sol_reserves - (quotient + (remainder > 0))
+    fee = sol_out * fee_bps // BASIS_POINTS
+    lamports = sol_out - fee
+    return Quote(
+        amount_in=tokens,
+        amount_out=lamports,
+        fee=fee,
+        limit=lamports * (BASIS_POINTS - slippage_bps) // BASIS_POINTS
+    )
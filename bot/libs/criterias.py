@@ -1,8 +1,9 @@
-import copy
+from collections import deque
 from datetime import datetime
-from typing import Dict, List
+from time import perf_counter
+from typing import Any, Callable, Dict, List
 from bot.config import appconfig
-from bot.libs.utils import stamp_time, TxType
+from bot.libs.utils import stamp_time, TimestampBuckets, TxType
 
 from solders.pubkey import Pubkey
 
@@ -15,193 +16,297 @@ def same_balance(amount: float, trades: List[Dict]) -> bool:
 def exit_on_first_sale(msg: Dict) -> bool:
     return msg["txType"].lower() == TxType.sell.value
 
-def trading_analytics(
+
+class TokenTradeState:
+    """
+    Rolling analytics of the trades of a token. Every trade is processed in constant time
+    and memory is bounded by fixed size ring buffers no matter how long the token is traded.
+    Enriched messages include the same attributes trading_analytics always produced.
+    """
+    __slots__ = (
+        "pubkey",
+        "traders_seen",
+        "trades",
+        "max_consecutive_buys",
+        "consecutive_buys_timestamps",
+        "first_timestamp",
+        "last_timestamp",
+        "last_tx_type",
+        "last_v_sol",
+        "v_sol_base",
+        "last_is_relevant_trade",
+        "non_relevant_trade_count",
+        "consecutive_buys",
+        "consecutive_sells"
+    )
+
+    def __init__(
+        self,
+        pubkey: Pubkey,
+        trades_size: int = appconfig.TRADING_TRADES_HISTORY_SIZE,
+        buys_size: int = appconfig.TRADING_CONSECUTIVE_BUYS_HISTORY_SIZE,
+        timestamps_size: int = appconfig.TRADING_BUYS_TIMESTAMPS_HISTORY_SIZE
+    ):
+        """
+        :param pubkey[Pubkey]: our wallet's public key used to detect our own trades.
+        :param trades_size[int]: how many enriched messages are kept.
+        :param buys_size[int]: how many consecutive buys records are kept.
+        :param timestamps_size[int]: how many seconds with buys are kept. The first one is never dropped.
+        """
+        self.pubkey = str(pubkey)
+        self.traders_seen = set()
+        self.trades = deque(maxlen=trades_size)
+        self.max_consecutive_buys = deque(maxlen=buys_size)
+        self.consecutive_buys_timestamps = TimestampBuckets(size=timestamps_size)
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.last_tx_type = None
+        self.last_v_sol = 0
+        self.v_sol_base = 0
+        self.last_is_relevant_trade = False
+        self.non_relevant_trade_count = 0
+        self.consecutive_buys = 0
+        self.consecutive_sells = 0
+
+    @classmethod
+    def from_trades(cls, previous_trades: List[Dict], pubkey: Pubkey) -> "TokenTradeState":
+        """
+        Builds the rolling state from a history of messages already enriched by trading_analytics
+        """
+        state = cls(pubkey=pubkey)
+        if not previous_trades:
+            return state
+
+        last_msg = previous_trades[-1]
+        state.first_timestamp = previous_trades[0]["timestamp"]
+        state.last_timestamp = last_msg["timestamp"]
+        state.last_tx_type = last_msg["txType"].lower()
+        state.last_v_sol = last_msg["vSolInBondingCurve"]
+        state.v_sol_base = last_msg["vSolInBondingCurve_Base"]
+        state.last_is_relevant_trade = last_msg["is_relevant_trade"]
+        state.non_relevant_trade_count = last_msg["is_non_relevant_trade_count"]
+        state.consecutive_buys = last_msg["consecutive_buys"]
+        state.consecutive_sells = last_msg["consecutive_sells"]
+        state.max_consecutive_buys.extend(dict(record) for record in last_msg["max_consecutive_buys"])
+        state.consecutive_buys_timestamps = TimestampBuckets.from_value(last_msg["consecutive_buys_timestamps"]).copy()
+        state.traders_seen = {trade["traderPublicKey"] for trade in previous_trades}
+        state.trades.extend(previous_trades)
+        return state
+
+    def update(
+        self,
         msg: Dict,
-        previous_trades: List,
         amount_traded: float,
-        pubkey: Pubkey,
         token_timestamps: Dict,
-        traders: List[str] = [],
+        traders: List[str] = []
     ) -> Dict:
-    """
-    This function compare incomming messages with previous trades and include in the msg
-    statistics new attributes that will help on deciding exit trading criteria
-    :param msg: Incomming message when listening to Pump.fun tokens.
-    :param previous_trades: history of incomming messages
-    :return: msg with more attributes
-    """
-    new_msg = copy.deepcopy(msg)
-
-    is_this_my_trade = new_msg["traderPublicKey"] == str(pubkey)
-
-    # Including timestamp in incomming message
-    current_time = datetime.now()
-    new_msg["timestamp"] = current_time.timestamp()
-    new_msg["trade_time_delta"] = 0
-    # Calculating timedelta between buy/sell and received message
-    if is_this_my_trade:
-        print("trading_analytics: *** THIS IS OUR TRADE ***")
-        timestamp_key = "{}_timestamp".format(new_msg["txType"].lower())
-        if timestamp_key in token_timestamps:
-            token_time = datetime.fromtimestamp(token_timestamps[timestamp_key])
-            message_time = datetime.fromtimestamp(new_msg["timestamp"])
-            new_msg["trade_time_delta"] = (message_time - token_time).total_seconds()
-            print("   *** trade_time_delta: {}".format(new_msg["trade_time_delta"]))
-            print("   *** message_time: {}".format(message_time.strftime(appconfig.TIME_FORMAT).lower()))
-            print("   *** token_time: {}".format(token_time.strftime(appconfig.TIME_FORMAT).lower()))
-
-    # Checking if the trade position is relevant enough to be considering for criteria
-    new_msg["is_relevant_trade"] = True
-
-    # Default values that might change
-    new_msg["consecutive_buys"] = 1 if msg["txType"].lower() == TxType.buy.value and not is_this_my_trade else 0
-    new_msg["consecutive_sells"] = 1 if msg["txType"].lower() == TxType.sell.value and not is_this_my_trade else 0
-
-    new_msg["seller_is_an_unknown_trader"] = False
-    if new_msg["txType"].lower() == TxType.sell.value:
-        new_msg["seller_is_an_unknown_trader"] = not any(
-            trade for trade in previous_trades if new_msg["traderPublicKey"] == trade["traderPublicKey"]
-        )
-
-    if not previous_trades:
-        aprox = 0
-        # Math calculation for Solana in Bonding Courve just before we bought
+        """
+        Enriches the incomming message with statistics for exit trading criteria and rolls the state
+        :param msg: Incomming message when listening to Pump.fun tokens.
+        :param amount_traded: Sols we traded.
+        :param token_timestamps: our buy/sell timestamps.
+        :param traders: traders being tracked.
+        :return: msg with more attributes
+        """
+        new_msg = dict(msg)
+        tx_type = new_msg["txType"].lower()
+        is_this_my_trade = new_msg["traderPublicKey"] == self.pubkey
+
+        # Including timestamp in incomming message
+        current_time = datetime.now()
+        new_msg["timestamp"] = current_time.timestamp()
+        new_msg["trade_time_delta"] = 0
+        # Calculating timedelta between buy/sell and received message
         if is_this_my_trade:
-            # We're the first recorded trade: we discount the amount to the current bonding curve
-            new_msg["vSolInBondingCurve_Base"] = new_msg["vSolInBondingCurve"] - amount_traded
-            
-            # Volume bot case: small trades might not be relevant. Starting counter
-            new_msg["is_relevant_trade"] = amount_traded >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
-            new_msg["is_non_relevant_trade_count"] = 0 if new_msg["is_relevant_trade"] else 1
-        else:
-            # The first recorded trade is not from us. So we can make an aproximation
-            aprox = new_msg["tokenAmount"] * new_msg["vSolInBondingCurve"]
-            # This is an aproximation of the Sols traded by the current trader
-            aprox = aprox / new_msg["vTokensInBondingCurve"]
-            # We discount the Sols traded by the current trader to the current Sols in Bonding Curve
-            new_msg["vSolInBondingCurve_Base"] = new_msg["vSolInBondingCurve"] - aprox
-            # Checking if this trade is relavant or not and starting counter for consecutives buys/sells
-            new_msg["is_relevant_trade"] = aprox >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
+            print("trading_analytics: *** THIS IS OUR TRADE ***")
+            timestamp_key = "{}_timestamp".format(tx_type)
+            if token_timestamps.get(timestamp_key) is not None:
+                token_time = datetime.fromtimestamp(token_timestamps[timestamp_key])
+                new_msg["trade_time_delta"] = (current_time - token_time).total_seconds()
+                print("   *** trade_time_delta: {}".format(new_msg["trade_time_delta"]))
+                print("   *** message_time: {}".format(current_time.strftime(appconfig.TIME_FORMAT).lower()))
+                print("   *** token_time: {}".format(token_time.strftime(appconfig.TIME_FORMAT).lower()))
+
+        # Checking if the trade position is relevant enough to be considering for criteria
+        new_msg["is_relevant_trade"] = True
+
+        # Default values that might change
+        new_msg["consecutive_buys"] = 1 if tx_type == TxType.buy.value and not is_this_my_trade else 0
+        new_msg["consecutive_sells"] = 1 if tx_type == TxType.sell.value and not is_this_my_trade else 0
+
+        new_msg["seller_is_an_unknown_trader"] = tx_type == TxType.sell.value and \
+            new_msg["traderPublicKey"] not in self.traders_seen
+
+        if self.last_timestamp is None:
+            aprox = 0
+            # Math calculation for Solana in Bonding Courve just before we bought
+            if is_this_my_trade:
+                # We're the first recorded trade: we discount the amount to the current bonding curve
+                new_msg["vSolInBondingCurve_Base"] = new_msg["vSolInBondingCurve"] - amount_traded
+
+                # Volume bot case: small trades might not be relevant. Starting counter
+                new_msg["is_relevant_trade"] = amount_traded >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
+            else:
+                # The first recorded trade is not from us. So we can make an aproximation
+                # of the Sols traded by the current trader
+                aprox = new_msg["tokenAmount"] * new_msg["vSolInBondingCurve"] / new_msg["vTokensInBondingCurve"]
+                # We discount the Sols traded by the current trader to the current Sols in Bonding Curve
+                new_msg["vSolInBondingCurve_Base"] = new_msg["vSolInBondingCurve"] - aprox
+                # Checking if this trade is relavant or not and starting counter for consecutives buys/sells
+                new_msg["is_relevant_trade"] = aprox >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
             new_msg["is_non_relevant_trade_count"] = 0 if new_msg["is_relevant_trade"] else 1
 
-        new_msg["seconds_between_buys"] = 0
-        new_msg["seconds_between_sells"] = 0
-        new_msg["market_inactivity"] = 0
-        new_msg["max_seconds_in_market"] = 0
-        new_msg["max_consecutive_buys"] = [
-            {
-                "quantity": new_msg["consecutive_buys"],
-                "sols": amount_traded if aprox == 0 else aprox if not is_this_my_trade else 0,
-                "stamp_times": stamp_time(time=current_time)
-            }
-        ]
-        # This'll be used to detect possible bots producing fake pumps
-        new_msg["consecutive_buys_timestamps"] = stamp_time(time=current_time)
-
-    else:
-        last_msg = copy.deepcopy(previous_trades[-1])
-
-        last_msg_timestamp = datetime.fromtimestamp(last_msg["timestamp"])
-        first_trade_timestamp = datetime.fromtimestamp(previous_trades[0]["timestamp"])
-
-        # Current solanas traded
-        sols = new_msg["vSolInBondingCurve"] - last_msg["vSolInBondingCurve"]
-        sols = sols if not is_this_my_trade else amount_traded
-
-        # Checking if this trade is relavant or not. Keeping counter for consecutives buys/sells
-        is_relevant_trade = sols >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
-
-        # Key: we're not considering our owns tradeS TO BE RELAVENT for criteria decision
-        new_msg["is_relevant_trade"] = False if is_this_my_trade else is_relevant_trade
-
-        # We just count non relevant trades with consecutives buys/sells
-        new_msg["is_non_relevant_trade_count"] = 0 if new_msg["is_relevant_trade"] else 1
-
-        # We always keep track of the consecutive buys and their time stamps
-        new_msg["max_consecutive_buys"] = last_msg["max_consecutive_buys"]
-        new_msg["consecutive_buys_timestamps"] = last_msg["consecutive_buys_timestamps"]
-
-        if new_msg["txType"].lower() == TxType.buy.value:
-            new_msg["consecutive_sells"] = 0
+            new_msg["seconds_between_buys"] = 0
             new_msg["seconds_between_sells"] = 0
-            new_msg["consecutive_buys_timestamps"] = stamp_time(
-                time=current_time,
-                time_stored=new_msg["consecutive_buys_timestamps"]
+            new_msg["market_inactivity"] = 0
+            new_msg["max_seconds_in_market"] = 0
+            self.max_consecutive_buys.append(
+                {
+                    "quantity": new_msg["consecutive_buys"],
+                    "sols": amount_traded if aprox == 0 else aprox if not is_this_my_trade else 0,
+                    "stamp_times": stamp_time(time=current_time)
+                }
             )
+            # This'll be used to detect possible bots producing fake pumps
+            self.consecutive_buys_timestamps = TimestampBuckets(size=self.consecutive_buys_timestamps.size)
+            self.consecutive_buys_timestamps.add(timestamp=new_msg["timestamp"])
+            self.first_timestamp = new_msg["timestamp"]
 
-            if last_msg["txType"].lower() == TxType.buy.value:
-                # Starting counter for non relevant trades with consecutives buys/sells
-                if not new_msg["is_relevant_trade"] and not last_msg["is_relevant_trade"]:
-                    new_msg["is_non_relevant_trade_count"] += last_msg["is_non_relevant_trade_count"]
-                
-                # Considering consecutives buys for relevan trades or for consecutives non relevant
-                # trades that have reached the accepted tolerance
-                tolerance = appconfig.TRADING_CRITERIA_CONSECUTIVES_NON_RELEVANT_TRADES_TOLERANCE
-                if new_msg["is_relevant_trade"] or \
-                    not new_msg["is_relevant_trade"] and new_msg["is_non_relevant_trade_count"] >= tolerance:
-        
-                    new_msg["is_non_relevant_trade_count"] = 0
-
-                    new_msg["consecutive_buys"] = 1 + last_msg["consecutive_buys"]
-                    new_msg["seconds_between_buys"] = (current_time - last_msg_timestamp).total_seconds()
-                    # Updating the last record
-                    if not is_this_my_trade:
-                        new_msg["max_consecutive_buys"][-1]["quantity"] = 1 + last_msg["consecutive_buys"]
-                        new_msg["max_consecutive_buys"][-1]["sols"] += sols
-
-            else:
-                new_msg["consecutive_buys"] = 1
-                new_msg["seconds_between_buys"] = 0
-                # Start again with a new record
-                new_msg["max_consecutive_buys"].append(
-                    {
-                        "quantity": 1,
-                        "sols": sols
-                    }
-                )
-
-        if new_msg["txType"].lower() == TxType.sell.value:
-            new_msg["consecutive_buys"] = 0
-            new_msg["seconds_between_buys"] = 0
+        else:
+            last_msg_timestamp = datetime.fromtimestamp(self.last_timestamp)
+            first_trade_timestamp = datetime.fromtimestamp(self.first_timestamp)
 
-            if last_msg["txType"].lower() == TxType.sell.value:
-                # Starting counter for non relevant trades with consecutives buys/sells
-                if not new_msg["is_relevant_trade"] and not last_msg["is_relevant_trade"]:
-                    new_msg["is_non_relevant_trade_count"] += last_msg["is_non_relevant_trade_count"]
+            # Current solanas traded
+            sols = new_msg["vSolInBondingCurve"] - self.last_v_sol
+            sols = sols if not is_this_my_trade else amount_traded
 
-                # Considering consecutives buys for relevan trades or for consecutives non relevant
-                # trades that have reached the accepted tolerance
-                tolerance = appconfig.TRADING_CRITERIA_CONSECUTIVES_NON_RELEVANT_TRADES_TOLERANCE
-                if new_msg["is_relevant_trade"] or \
-                    not new_msg["is_relevant_trade"] and new_msg["is_non_relevant_trade_count"] >= tolerance:
-        
-                    new_msg["is_non_relevant_trade_count"] = 0
+            # Key: we're not considering our owns tradeS TO BE RELAVENT for criteria decision
+            new_msg["is_relevant_trade"] = False if is_this_my_trade else \
+                sols >= appconfig.TRADING_CRITERIA_TRADE_RELEVANT_AMOUNT
 
-                    if not is_this_my_trade:
-                        new_msg["consecutive_sells"] = 1 + last_msg["consecutive_sells"]
-                        new_msg["seconds_between_sells"] = (datetime.now() - last_msg_timestamp).total_seconds()
+            # We just count non relevant trades with consecutives buys/sells
+            new_msg["is_non_relevant_trade_count"] = 0 if new_msg["is_relevant_trade"] else 1
+            tolerance = appconfig.TRADING_CRITERIA_CONSECUTIVES_NON_RELEVANT_TRADES_TOLERANCE
 
-            else:
-                new_msg["consecutive_sells"] = 1
+            if tx_type == TxType.buy.value:
+                new_msg["consecutive_sells"] = 0
                 new_msg["seconds_between_sells"] = 0
+                self.consecutive_buys_timestamps.add(timestamp=new_msg["timestamp"])
+
+                if self.last_tx_type == TxType.buy.value:
+                    # Starting counter for non relevant trades with consecutives buys/sells
+                    if not new_msg["is_relevant_trade"] and not self.last_is_relevant_trade:
+                        new_msg["is_non_relevant_trade_count"] += self.non_relevant_trade_count
+
+                    # Considering consecutives buys for relevan trades or for consecutives non relevant
+                    # trades that have reached the accepted tolerance
+                    if new_msg["is_relevant_trade"] or new_msg["is_non_relevant_trade_count"] >= tolerance:
+                        new_msg["is_non_relevant_trade_count"] = 0
+                        new_msg["consecutive_buys"] = 1 + self.consecutive_buys
+                        # Updating the last record. It's replaced so messages already sent are not modified
+                        if not is_this_my_trade:
+                            last_record = self.max_consecutive_buys[-1]
+                            self.max_consecutive_buys[-1] = dict(
+                                last_record,
+                                quantity=1 + self.consecutive_buys,
+                                sols=last_record["sols"] + sols
+                            )
+                else:
+                    new_msg["consecutive_buys"] = 1
+                    # Start again with a new record
+                    self.max_consecutive_buys.append({"quantity": 1, "sols": sols})
+
+                new_msg["seconds_between_buys"] = (current_time - last_msg_timestamp).total_seconds()
+
+            if tx_type == TxType.sell.value:
+                new_msg["consecutive_buys"] = 0
+                new_msg["seconds_between_buys"] = 0
 
-        new_msg["market_inactivity"] = (datetime.now() - last_msg_timestamp).total_seconds()
-        new_msg["max_seconds_in_market"] = (datetime.now() - first_trade_timestamp).total_seconds()
-
-        if msg["txType"].lower() == TxType.buy.value:
-            new_msg["seconds_between_buys"] = (datetime.now() - last_msg_timestamp).total_seconds()
-
-        # We'll keep track of the Solanas in Bounding courve since the first recorded trade
-        new_msg["vSolInBondingCurve_Base"] = last_msg["vSolInBondingCurve_Base"]
-
-
-    # Checking if the current trader is in the trader's list
-    new_msg["trader_has_sold"] = new_msg["traderPublicKey"] in traders
+                if self.last_tx_type == TxType.sell.value:
+                    # Starting counter for non relevant trades with consecutives buys/sells
+                    if not new_msg["is_relevant_trade"] and not self.last_is_relevant_trade:
+                        new_msg["is_non_relevant_trade_count"] += self.non_relevant_trade_count
+
+                    # Considering consecutives sells for relevan trades or for consecutives non relevant
+                    # trades that have reached the accepted tolerance
+                    if new_msg["is_relevant_trade"] or new_msg["is_non_relevant_trade_count"] >= tolerance:
+                        new_msg["is_non_relevant_trade_count"] = 0
+                        if not is_this_my_trade:
+                            new_msg["consecutive_sells"] = 1 + self.consecutive_sells
+                            new_msg["seconds_between_sells"] = (current_time - last_msg_timestamp).total_seconds()
+                else:
+                    new_msg["consecutive_sells"] = 1
+                    new_msg["seconds_between_sells"] = 0
+
+            new_msg["market_inactivity"] = (current_time - last_msg_timestamp).total_seconds()
+            new_msg["max_seconds_in_market"] = (current_time - first_trade_timestamp).total_seconds()
+
+            # We'll keep track of the Solanas in Bounding courve since the first recorded trade
+            new_msg["vSolInBondingCurve_Base"] = self.v_sol_base
+
+        # Bounded copies: messages already stored are not modified by next trades
+        new_msg["max_consecutive_buys"] = list(self.max_consecutive_buys)
+        new_msg["consecutive_buys_timestamps"] = self.consecutive_buys_timestamps.copy()
+
+        # Checking if the current trader is in the trader's list
+        new_msg["trader_has_sold"] = new_msg["traderPublicKey"] in traders
+
+        # Amount of Solana the token is holding after our buy
+        new_msg["sols_in_token_after_buying"] = new_msg["vSolInBondingCurve"] - new_msg["vSolInBondingCurve_Base"]
+
+        # Rolling the state
+        self.last_timestamp = new_msg["timestamp"]
+        self.last_tx_type = tx_type
+        self.last_v_sol = new_msg["vSolInBondingCurve"]
+        self.v_sol_base = new_msg["vSolInBondingCurve_Base"]
+        self.last_is_relevant_trade = new_msg["is_relevant_trade"]
+        self.non_relevant_trade_count = new_msg["is_non_relevant_trade_count"]
+        self.consecutive_buys = new_msg["consecutive_buys"]
+        self.consecutive_sells = new_msg["consecutive_sells"]
+        self.traders_seen.add(new_msg["traderPublicKey"])
+        self.trades.append(new_msg)
+
+        return new_msg
+
+
+def export_trades(trades: List[Dict]) -> List[Dict]:
+    """
+    Converts enriched messages into JSON ready records
+    :param trades: messages enriched by TokenTradeState or trading_analytics.
+    :return: list of trades with consecutive_buys_timestamps as stamp_time dictionaries.
+    """
+    records = []
+    for trade in trades:
+        stamps = trade.get("consecutive_buys_timestamps")
+        if isinstance(stamps, TimestampBuckets):
+            trade = dict(trade, consecutive_buys_timestamps=stamps.to_stamps())
+        records.append(trade)
+    return records
 
-    # Amount of Solana the token is holding after our buy
-    new_msg["sols_in_token_after_buying"] = new_msg["vSolInBondingCurve"] - new_msg["vSolInBondingCurve_Base"]
 
-    return new_msg
+def trading_analytics(
+        msg: Dict,
+        previous_trades: List,
+        amount_traded: float,
+        pubkey: Pubkey,
+        token_timestamps: Dict,
+        traders: List[str] = [],
+    ) -> Dict:
+    """
+    This function compare incomming messages with previous trades and include in the msg
+    statistics new attributes that will help on deciding exit trading criteria.
+    Tokens being traded keep a TokenTradeState instead of calling this function on every trade.
+    :param msg: Incomming message when listening to Pump.fun tokens.
+    :param previous_trades: history of incomming messages
+    :return: msg with more attributes
+    """
+    state = TokenTradeState.from_trades(previous_trades=previous_trades, pubkey=pubkey)
+    return state.update(
+        msg=msg,
+        amount_traded=amount_traded,
+        token_timestamps=token_timestamps,
+        traders=traders
+    )
 
 
 def max_consecutive_buys(buys: int, msg: dict, amount_traded: float = None) -> bool:
@@ -317,29 +422,31 @@ def market_inactivity(seconds: int, msg: dict = None, amount_traded: float = Non
     """
     return False
 
+
+def discard_market_inactivity(seconds: int, msg: dict = None, amount_traded: float = None) -> bool:
+    """
+    Dummy fuction as it retrieves False. Market inactivity is handled by websocket timeouts.
+    """
+    return False
+
+
 def buys_in_the_same_second(validations: dict, msg: dict, amount_traded: float = None) -> bool:
     """
     Check if any of the timestamp values are within a given range.
 
-    :param msg: dict, keys are timestamps, values are the counts of buy actions on each timestamp.
+    :param msg: dict, consecutive_buys_timestamps are the counts of buy actions on each second.
     :param validations: dict[str: int]. Validations to be done: min buys per each timestamp and min consecutive relevant timestamps.
     :return: bool, True if any value is within the range, False otherwise.
     """
     min_buys = False
-    cbt = msg["consecutive_buys_timestamps"]
+    cbt = TimestampBuckets.from_value(msg["consecutive_buys_timestamps"])
     token_age = validations["seconds_since_token_genesis"]
     if len(cbt) >= validations["min_consecutive_timestamps"]:
         # Checking if we're among the first expected seconds of a token genesis.
-        sorted_keys = sorted(cbt.keys())
-        first_timestamp = datetime.strptime(sorted_keys[0], "%Y%m%d%H%M%S")
-        last_timestamp = datetime.strptime(sorted_keys[-1], "%Y%m%d%H%M%S")
-        difference = (last_timestamp - first_timestamp).total_seconds()
-        if int(difference) <= token_age:
-            counter = 0
-            for tmstmp, times in cbt.items():
-                # We might have trades among the possible artifical pump genesis.
-                # If this happends then we'll not consider that timestamp
-                counter = counter + 1 if times  >= validations["min_buys_per_timestamp"] else counter
+        if cbt.last - cbt.first <= token_age:
+            # We might have trades among the possible artifical pump genesis.
+            # If this happends then we'll not consider that timestamp
+            counter = cbt.count_at_least(min_count=validations["min_buys_per_timestamp"])
             min_buys = counter >= validations["min_consecutive_timestamps"]
 
     return min_buys
@@ -357,10 +464,8 @@ def max_seconds_in_market(time_in_market: int, msg: dict, amount_traded: float =
     :param msg: dict, keys are timestamps, values are the counts of buy actions on each timestamp.
     :return: bool, True if any value is within the range, False otherwise.
     """
-    cbt = msg["consecutive_buys_timestamps"]
-    sorted_keys = sorted(cbt.keys())
-    first_timestamp = datetime.strptime(sorted_keys[0], "%Y%m%d%H%M%S")
-    current_time_in_market = (datetime.now() - first_timestamp).total_seconds()
+    cbt = TimestampBuckets.from_value(msg["consecutive_buys_timestamps"])
+    current_time_in_market = datetime.now().timestamp() - cbt.first
     return current_time_in_market >= time_in_market
 
 
@@ -370,6 +475,92 @@ def discard_max_seconds_in_market(time_in_market: int, msg: dict, amount_traded:
         msg=msg
     )
 
+
+# Criteria allowed in roadmap steps and their relative evaluation cost.
+# Cheap ones read already computed message attributes; expensive ones walk timestamps.
+CRITERIA_COSTS = {
+    "max_consecutive_buys": 0,
+    "max_consecutive_sells": 0,
+    "max_seconds_between_buys": 0,
+    "discard_token_max_seconds_between_buys": 0,
+    "trader_has_sold": 0,
+    "seller_is_an_unknown_trader": 0,
+    "validate_trade_timedelta_exceeded": 0,
+    "max_sols_in_token_after_buying_in_percentage": 1,
+    "market_inactivity": 1,
+    "discard_market_inactivity": 1,
+    "max_seconds_in_market": 2,
+    "discard_max_seconds_in_market": 2,
+    "buys_in_the_same_second": 3,
+}
+
+
+def bind_criteria(function: Callable, parameter: Any) -> Callable:
+    def predicate(msg: Dict, amount_traded: float) -> bool:
+        return function(parameter, msg, amount_traded)
+    return predicate
+
+
+class CompiledCriteria:
+    """
+    Criteria of a roadmap step compiled once into predicates ordered from the cheapest
+    to the most expensive one. The exit criteria reported is always the first one met
+    in the roadmap order, so cheap predicates short-circuit only the ones written after them.
+    """
+    __slots__ = ("names", "predicates", "calls", "hits", "seconds")
+
+    def __init__(self, criteria: Dict):
+        """
+        :param criteria[dict]: criteria function names and their parameters from a roadmap step.
+        :raises ValueError: if a criteria function doesn't exist.
+        """
+        unknown = [name for name in criteria if name not in CRITERIA_COSTS]
+        if unknown:
+            raise ValueError("Unknown criteria: {}".format(", ".join(unknown)))
+
+        self.names = tuple(criteria.keys())
+        self.predicates = tuple(
+            (position, bind_criteria(function=globals()[name], parameter=criteria[name]))
+            for position, name in sorted(
+                enumerate(self.names),
+                key=lambda item: (CRITERIA_COSTS[item[1]], item[0])
+            )
+        )
+        self.calls = [0] * len(self.names)
+        self.hits = [0] * len(self.names)
+        self.seconds = [0.0] * len(self.names)
+
+    def __call__(self, msg: Dict, amount_traded: float) -> tuple[bool, str]:
+        """
+        :return: is_valid[True|False] and the function name as an exit_criteria.
+        """
+        exit_position = None
+        for position, predicate in self.predicates:
+            # A criteria written before the one already met has priority
+            if exit_position is not None and position > exit_position:
+                continue
+            start = perf_counter()
+            is_valid = predicate(msg, amount_traded)
+            self.seconds[position] += perf_counter() - start
+            self.calls[position] += 1
+            if is_valid:
+                self.hits[position] += 1
+                exit_position = position
+
+        if exit_position is None:
+            return False, None
+        return True, self.names[exit_position]
+
+    def stats(self) -> Dict:
+        """
+        :return: per criteria calls, hits and total seconds spent
+        """
+        return {
+            name: {"calls": self.calls[position], "hits": self.hits[position], "seconds": self.seconds[position]}
+            for position, name in enumerate(self.names)
+        }
+
+
 def test():
     print("#######################")
     print(" TEST NON RELEVANT TRADES COUNT AND MODIFY MESSAGES IN THIS FUNCTION")
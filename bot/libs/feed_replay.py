@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import gzip
+import json
+import time
+import websockets
+import websockets.exceptions
+
+from typing import Dict, List, NamedTuple
+
+from bot.config import appconfig
+from bot.libs.solana_functions import PUMP_BLOCK_SUBSCRIPTION
+
+PUMPPORTAL = "pumpportal"
+BLOCKS = "blocks"
+
+FEED_URLS = {
+    PUMPPORTAL: appconfig.PUMPFUN_WEBSOCKET,
+    BLOCKS: appconfig.WSS_URL_QUICKNODE,
+}
+
+FEED_SUBSCRIPTIONS = {
+    PUMPPORTAL: [{"method": "subscribeNewToken"}],
+    BLOCKS: [PUMP_BLOCK_SUBSCRIPTION],
+}
+
+
+class Frame(NamedTuple):
+    offset: float       # Seconds since the recording started
+    feed: str           # pumpportal or blocks
+    data: str           # Raw websocket frame
+
+
+class FeedWriter:
+    """
+    Recording of websocket feeds: a gzip file with one [offset, feed, frame] JSON line per received frame.
+    Every feed written by the same writer shares the same clock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.started = None
+        self.frames = 0
+
+    def write(self, feed: str, data: str):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        self.file.write(json.dumps([round(now - self.started, 6), feed, data]) + "\n")
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_frames(path: str, feeds: List[str] = None) -> List[Frame]:
+    """
+    :param feeds[list]: feeds to be read. Every feed by default.
+    """
+    frames = []
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            frame = Frame(*json.loads(line))
+            if feeds is None or frame.feed in feeds:
+                frames.append(frame)
+    return frames
+
+
+async def record_feed(writer: FeedWriter, feed: str, seconds: float, url: str = None, subscriptions: List[Dict] = None):
+    """
+    Records a feed as received by a fresh connection.
+    :param seconds[float]: recording time.
+    :param url[str]: websocket url. The feed's default one if it's None.
+    :param subscriptions[list]: messages sent when connected. The feed's default ones if it's None.
+    """
+    url = url or FEED_URLS[feed]
+    subscriptions = FEED_SUBSCRIPTIONS[feed] if subscriptions is None else subscriptions
+    deadline = time.monotonic() + seconds
+    async with websockets.connect(url, ping_interval=20, max_size=None) as websocket:
+        for subscription in subscriptions:
+            await websocket.send(json.dumps(subscription))
+        while time.monotonic() < deadline:
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            writer.write(feed, message)
+
+
+class RecordingProxy:
+    """
+    Local websocket forwarding every connection to the feed's url and recording what it receives.
+    Pointing a Pump to it records exactly the frames its session got, subscriptions included.
+    """
+
+    def __init__(self, writer: FeedWriter, feed: str, url: str = None, host: str = "127.0.0.1", port: int = 0):
+        self.writer = writer
+        self.feed = feed
+        self.upstream_url = url or FEED_URLS[feed]
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self) -> str:
+        """
+        :return: url to connect to instead of the feed's one.
+        """
+        self.server = await websockets.serve(self.handle, self.host, self.port, max_size=None)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.url
+
+    @property
+    def url(self) -> str:
+        return "ws://{}:{}".format(self.host, self.port)
+
+    async def handle(self, websocket, *args):
+        async with websockets.connect(self.upstream_url, ping_interval=20, max_size=None) as upstream:
+            async def forward():
+                async for message in websocket:
+                    await upstream.send(message)
+                await upstream.close()
+
+            forwarding = asyncio.create_task(forward())
+            try:
+                async for message in upstream:
+                    self.writer.write(self.feed, message)
+                    await websocket.send(message)
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            finally:
+                forwarding.cancel()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+class ReplayServer:
+    """
+    Local websocket stand-in for the recorded feeds: one server per feed playing its frames back to every
+    connection, keeping the recorded gaps divided by speed. Messages sent by clients are read and ignored.
+    The connection is closed once every frame was sent.
+    """
+
+    def __init__(self, frames: List[Frame], speed: float = 1.0, host: str = "127.0.0.1"):
+        """
+        :param speed[float]: 1 plays in real time, N N times faster. 0 sends frames as fast as possible.
+        """
+        self.frames: Dict[str, List[Frame]] = {}
+        for frame in frames:
+            self.frames.setdefault(frame.feed, []).append(frame)
+        self.speed = speed
+        self.host = host
+        self.servers = {}
+        self.sent = {feed: 0 for feed in self.frames}
+        self.elapsed = {}
+
+    @classmethod
+    def from_file(cls, path: str, speed: float = 1.0, feeds: List[str] = None, **kwargs) -> "ReplayServer":
+        return cls(frames=read_frames(path, feeds=feeds), speed=speed, **kwargs)
+
+    async def start(self) -> Dict[str, str]:
+        """
+        :return: url of every feed.
+        """
+        for feed in self.frames:
+            self.servers[feed] = await websockets.serve(
+                lambda websocket, *args, feed=feed: self.play(websocket, feed),
+                self.host,
+                0,
+                max_size=None
+            )
+        return {feed: self.url(feed) for feed in self.servers}
+
+    def url(self, feed: str) -> str:
+        return "ws://{}:{}".format(self.host, self.servers[feed].sockets[0].getsockname()[1])
+
+    async def play(self, websocket, feed: str):
+        async def drain():
+            async for _ in websocket:
+                pass
+
+        draining = asyncio.create_task(drain())
+        frames = self.frames[feed]
+        started = time.monotonic()
+        try:
+            for index, frame in enumerate(frames):
+                if self.speed:
+                    delay = (frame.offset - frames[0].offset) / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                elif index % 100 == 0:
+                    # Max speed: other connections still get their turn
+                    await asyncio.sleep(0)
+                await websocket.send(frame.data)
+                self.sent[feed] += 1
+            await websocket.close()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            draining.cancel()
+            self.elapsed[feed] = time.monotonic() - started
+
+    async def stop(self):
+        for server in self.servers.values():
+            server.close()
+            await server.wait_closed()
+        self.servers = {}
+
+    def metrics(self) -> Dict:
+        return {
+            feed: {
+                "frames": len(self.frames[feed]),
+                "sent": self.sent[feed],
+                "seconds": round(self.elapsed.get(feed, 0), 3)
+            }
+            for feed in self.frames
+        }
+
+
+async def record(path: str, seconds: float, feeds: List[str]):
+    with FeedWriter(path) as writer:
+        await asyncio.gather(*[record_feed(writer=writer, feed=feed, seconds=seconds) for feed in feeds])
+        print("Recorded {} frames to {}".format(writer.frames, path))
+
+
+async def replay(path: str, speed: float, feeds: List[str] = None):
+    server = ReplayServer.from_file(path, speed=speed, feeds=feeds)
+    for feed, url in (await server.start()).items():
+        print("Replaying {} frames of {} at {}".format(len(server.frames[feed]), feed, url))
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop()
+        print(server.metrics())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Records and replays PumpPortal and blockSubscribe feeds")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--seconds", type=float, default=60)
+    record_parser.add_argument("--feeds", nargs="+", default=[PUMPPORTAL, BLOCKS], choices=[PUMPPORTAL, BLOCKS])
+    replay_parser = commands.add_parser("replay")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="0 replays as fast as possible")
+    replay_parser.add_argument("--feeds", nargs="+", choices=[PUMPPORTAL, BLOCKS])
+    arguments = parser.parse_args()
+
+    if arguments.command == "record":
+        asyncio.run(record(path=arguments.path, seconds=arguments.seconds, feeds=arguments.feeds))
+    else:
+        asyncio.run(replay(path=arguments.path, speed=arguments.speed, feeds=arguments.feeds))
@@ -0,0 +1,221 @@
+import hashlib
+import struct
+import time
+
+from collections import namedtuple
+from typing import Callable, Dict, List
+
+
+# Fixed width IDL types and their struct format
+FIXED_FORMATS = {
+    "bool": "?",
+    "u8": "B",
+    "i8": "b",
+    "u16": "H",
+    "i16": "h",
+    "u32": "I",
+    "i32": "i",
+    "u64": "Q",
+    "i64": "q",
+    "publicKey": "32s",
+}
+DISCRIMINATOR_SIZE = 8
+STRING_LENGTH = struct.Struct("<I")
+
+
+def instruction_discriminator(name: str) -> int:
+    """
+    Anchor discriminator: first 8 bytes of sha256("global:<instruction name>") as a little endian u64
+    """
+    return struct.unpack_from("<Q", hashlib.sha256("global:{}".format(name).encode()).digest())[0]
+
+
+def interpret_instruction(ix_data: bytes, ix_def: Dict) -> Dict:
+    """
+    Decodes the instruction arguments reading the IDL definition field by field.
+    Reference implementation for the generated decoders: same values, publicKey arguments as raw 32 bytes.
+    :param ix_data[bytes]: instruction data including the discriminator.
+    :param ix_def[dict]: instruction from the IDL.
+    :return: arguments by name.
+    """
+    args = {}
+    offset = DISCRIMINATOR_SIZE
+    for arg in ix_def["args"]:
+        arg_type = arg["type"]
+        if arg_type == "string":
+            length = struct.unpack_from("<I", ix_data, offset)[0]
+            offset += 4
+            value = ix_data[offset:offset + length].decode("utf-8")
+            offset += length
+        elif arg_type == "publicKey":
+            value = bytes(ix_data[offset:offset + 32])
+            offset += 32
+        elif arg_type in FIXED_FORMATS:
+            value = struct.unpack_from("<" + FIXED_FORMATS[arg_type], ix_data, offset)[0]
+            offset += struct.calcsize("<" + FIXED_FORMATS[arg_type])
+        else:
+            raise ValueError("Unsupported type: {}".format(arg_type))
+
+        args[arg["name"]] = value
+    return args
+
+
+def generate_decoder_source(ix_def: Dict) -> tuple[str, List[struct.Struct]]:
+    """
+    Generates the source of a decoder specialised for an IDL instruction.
+    Consecutive fixed width arguments are read with a single precompiled struct and
+    strings are sliced from a memoryview.
+    :param ix_def[dict]: instruction from the IDL.
+    :return: python source of a `decode(ix_data)` function returning the instruction record
+             and the structs it reads fixed width arguments with.
+    """
+    structs = []
+    if all(arg["type"] in FIXED_FORMATS for arg in ix_def["args"]):
+        # Only fixed width arguments: a single unpack builds the record
+        structs.append(struct.Struct("<" + "".join(FIXED_FORMATS[arg["type"]] for arg in ix_def["args"])))
+        source = "def decode(ix_data):\n    return RECORD._make(STRUCT_0.unpack_from(ix_data, {}))\n".format(
+            DISCRIMINATOR_SIZE
+        )
+        return source, structs
+
+    lines = [
+        "def decode(ix_data):",
+        "    view = memoryview(ix_data)",
+        "    offset = {}".format(DISCRIMINATOR_SIZE),
+    ]
+    fixed_names, fixed_format = [], ""
+
+    def flush_fixed():
+        nonlocal fixed_names, fixed_format
+        if not fixed_names:
+            return
+        index = len(structs)
+        structs.append(struct.Struct("<" + fixed_format))
+        lines.append("    {}, = STRUCT_{}.unpack_from(view, offset)".format(", ".join(fixed_names), index))
+        lines.append("    offset += {}".format(structs[index].size))
+        fixed_names, fixed_format = [], ""
+
+    for arg in ix_def["args"]:
+        name, arg_type = "arg_" + arg["name"], arg["type"]
+        if arg_type == "string":
+            flush_fixed()
+            lines.append("    length, = STRING_LENGTH.unpack_from(view, offset)")
+            lines.append("    offset += 4")
+            lines.append("    {} = str(view[offset:offset + length], 'utf-8')".format(name))
+            lines.append("    offset += length")
+        elif arg_type in FIXED_FORMATS:
+            fixed_names.append(name)
+            fixed_format += FIXED_FORMATS[arg_type]
+        else:
+            raise ValueError("Unsupported type: {} for argument {} of {}".format(arg_type, arg["name"], ix_def["name"]))
+    flush_fixed()
+
+    arg_names = ["arg_" + arg["name"] for arg in ix_def["args"]]
+    lines.append("    return RECORD({})".format(", ".join(arg_names)))
+    return "\n".join(lines) + "\n", structs
+
+
+class InstructionDecoder:
+    """
+    Decoder generated from an IDL instruction. Calling it returns a namedtuple with the
+    instruction arguments; publicKey arguments are kept as raw 32 bytes.
+    """
+    __slots__ = ("name", "discriminator", "record", "accounts", "source", "decode")
+
+    def __init__(self, ix_def: Dict):
+        self.name = ix_def["name"]
+        self.discriminator = instruction_discriminator(self.name)
+        self.record = namedtuple(
+            "{}{}Args".format(self.name[0].upper(), self.name[1:]),
+            [arg["name"] for arg in ix_def["args"]]
+        )
+        self.accounts = tuple(account["name"] for account in ix_def.get("accounts", []))
+        self.source, structs = generate_decoder_source(ix_def)
+
+        namespace = {"RECORD": self.record, "STRING_LENGTH": STRING_LENGTH}
+        namespace.update({"STRUCT_{}".format(index): compiled for index, compiled in enumerate(structs)})
+        exec(compile(self.source, "<idl:{}>".format(self.name), "exec"), namespace)
+        self.decode = namespace["decode"]
+
+    def __call__(self, ix_data: bytes):
+        return self.decode(ix_data)
+
+
+def load_instruction_decoders(idl: Dict) -> Dict[int, InstructionDecoder]:
+    """
+    :param idl[dict]: Anchor IDL.
+    :return: discriminator -> decoder table for every IDL instruction.
+    """
+    decoders = {}
+    for ix_def in idl["instructions"]:
+        decoder = InstructionDecoder(ix_def=ix_def)
+        decoders[decoder.discriminator] = decoder
+    return decoders
+
+
+def benchmark(
+    decoders: Dict[int, InstructionDecoder],
+    idl: Dict,
+    samples: List[bytes],
+    iterations: int = 10_000
+) -> Dict:
+    """
+    Compares the generated decoders against the IDL interpreter on recorded instruction bytes.
+    :param decoders[dict]: table from load_instruction_decoders.
+    :param idl[dict]: Anchor IDL the decoders were generated from.
+    :param samples[list]: instruction data, discriminator included.
+    :param iterations[int]: times every sample is decoded.
+    :return: total seconds and nanoseconds per instruction for both implementations.
+    """
+    definitions = {instruction_discriminator(ix_def["name"]): ix_def for ix_def in idl["instructions"]}
+    discriminator = struct.Struct("<Q")
+    work = [(decoders[discriminator.unpack_from(sample)[0]], sample) for sample in samples]
+    reference = [(definitions[decoder.discriminator], sample) for decoder, sample in work]
+
+    def measure(function: Callable) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return time.perf_counter() - start
+
+    def run_interpreted():
+        for ix_def, sample in reference:
+            interpret_instruction(sample, ix_def)
+
+    def run_generated():
+        for decoder, sample in work:
+            decoder.decode(sample)
+
+    decoded = iterations * len(samples)
+    interpreted = measure(run_interpreted)
+    generated = measure(run_generated)
+    return {
+        "instructions": decoded,
+        "interpreted_seconds": interpreted,
+        "generated_seconds": generated,
+        "interpreted_ns_per_instruction": interpreted * 1e9 / decoded,
+        "generated_ns_per_instruction": generated * 1e9 / decoded,
+        "speedup": interpreted / generated if generated else 0,
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import os
+
+    idl_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "idl", "pump_fun_idl.json")
+    with open(idl_path, "r") as f:
+        pump_idl = json.load(f)
+
+    def encode_string(value: str) -> bytes:
+        return STRING_LENGTH.pack(len(value.encode("utf-8"))) + value.encode("utf-8")
+
+    # Create and buy instructions as they're sent by Pump.fun's frontend
+    create = struct.pack("<Q", instruction_discriminator("create")) + encode_string("Some Day") + \
+        encode_string("SMD") + encode_string("https://ipfs.io/ipfs/QmSomeDayMetadataCid1234567890abcdefghijklmn")
+    buy = struct.pack("<QQQ", instruction_discriminator("buy"), 35_000_000_000_000, 1_010_000_000)
+    print(benchmark(
+        decoders=load_instruction_decoders(pump_idl),
+        idl=pump_idl,
+        samples=[create, buy, buy, buy, buy]
+    ))
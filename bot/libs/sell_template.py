@@ -0,0 +1,122 @@
+import struct
+import threading
+import time
+
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.system_program import transfer, TransferParams
+from solders.transaction import Transaction
+from spl.token.instructions import get_associated_token_address
+from typing import Dict, List
+
+from bot.config import appconfig
+
+SELL_DISCRIMINATOR = struct.pack("<Q", 12502976635542562355)
+
+
+class SellTemplate:
+    """
+    Sell transaction of a token assembled at buy time: accounts, compute budget and Jito tip.
+    Selling only patches the amount and min SOL output into the sell instruction and signs it
+    with a fresh blockhash.
+    """
+
+    def __init__(
+        self,
+        mint: Pubkey,
+        payer: Keypair,
+        bonding_curve: Pubkey,
+        associated_bonding_curve: Pubkey,
+        crator_vault: Pubkey,
+        token_amount: int = None,
+        compute_units: int = 81_000,
+        compute_unit_price: int = 80_000,
+        jito_tip_account: Pubkey = None,
+        jito_tip: int = 10_000
+    ):
+        """
+        :param token_amount[int]: raw token units bought. None if it's unknown.
+        :param compute_unit_price[int]: micro lamports per compute unit.
+        :param jito_tip[int]: lamports tipped to jito_tip_account. No tip without account.
+        """
+        self.mint = mint
+        self.payer = payer
+        self.token_amount = token_amount
+        self.associated_token_account = get_associated_token_address(owner=payer.pubkey(), mint=mint)
+        self.accounts = [
+            AccountMeta(pubkey=appconfig.PUMP_GLOBAL, is_signer=False, is_writable=False),
+            AccountMeta(pubkey=appconfig.PUMP_FEE, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=mint, is_signer=False, is_writable=False),
+            AccountMeta(pubkey=bonding_curve, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=associated_bonding_curve, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=self.associated_token_account, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=payer.pubkey(), is_signer=True, is_writable=True),
+            AccountMeta(pubkey=appconfig.SYSTEM_PROGRAM, is_signer=False, is_writable=False),
+            AccountMeta(pubkey=crator_vault, is_signer=False, is_writable=True),
+            AccountMeta(pubkey=appconfig.SYSTEM_TOKEN_PROGRAM, is_signer=False, is_writable=False),
+            AccountMeta(pubkey=appconfig.PUMP_EVENT_AUTHORITY, is_signer=False, is_writable=False),
+            AccountMeta(pubkey=appconfig.PUMP_PROGRAM, is_signer=False, is_writable=False),
+        ]
+        self.before: List[Instruction] = [
+            set_compute_unit_price(compute_unit_price),
+            set_compute_unit_limit(units=compute_units)
+        ]
+        self.after: List[Instruction] = []
+        if jito_tip_account is not None:
+            self.after.append(transfer(TransferParams(
+                from_pubkey=payer.pubkey(),
+                to_pubkey=jito_tip_account,
+                lamports=jito_tip
+            )))
+        self.created_at = time.monotonic()
+
+    def instruction(self, amount: int, min_sol_output: int) -> Instruction:
+        """
+        :param amount[int]: raw token units to sell.
+        :param min_sol_output[int]: lamports.
+        """
+        data = SELL_DISCRIMINATOR + struct.pack("<QQ", amount, min_sol_output)
+        return Instruction(appconfig.PUMP_PROGRAM, data, self.accounts)
+
+    def transaction(self, amount: int, min_sol_output: int, blockhash: Hash) -> Transaction:
+        """
+        Signed sell transaction.
+        """
+        message = Message(
+            instructions=self.before + [self.instruction(amount=amount, min_sol_output=min_sol_output)] + self.after,
+            payer=self.payer.pubkey()
+        )
+        return Transaction([self.payer], message, blockhash)
+
+
+class SellTemplates:
+    """
+    Sell templates by mint of the tokens being held.
+    """
+
+    def __init__(self):
+        self.templates: Dict[str, SellTemplate] = {}
+        self.lock = threading.Lock()
+
+    def prepare(self, **kwargs) -> SellTemplate:
+        """
+        Builds and keeps the template of a token. Same arguments as SellTemplate.
+        """
+        template = SellTemplate(**kwargs)
+        with self.lock:
+            self.templates[str(template.mint)] = template
+        return template
+
+    def get(self, mint: Pubkey) -> SellTemplate:
+        return self.templates.get(str(mint))
+
+    def remove(self, mint: Pubkey):
+        with self.lock:
+            self.templates.pop(str(mint), None)
+
+
+sell_templates = SellTemplates()
@@ -1,13 +1,38 @@
 import asyncio
+import base64
+import json
+import websockets
+import websockets.exceptions
+
 from datetime import datetime
-from solana.rpc.async_api import AsyncClient
 from solders.signature import Signature
+from solders.transaction import VersionedTransaction
+from typing import AsyncIterator, Dict
 
 from bot.config import appconfig
+from bot.domain.rpc_gateway import rpc_client
+from bot.libs.utils import decode_token_bundles, iter_raw_pump_instructions
+
+
+PUMP_BLOCK_SUBSCRIPTION = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "blockSubscribe",
+    "params": [
+        {"mentionsAccountOrProgram": str(appconfig.PUMP_PROGRAM)},
+        {
+            "commitment": "confirmed",
+            "encoding": "base64",
+            "showRewards": False,
+            "transactionDetails": "full",
+            "maxSupportedTransactionVersion": 0
+        }
+    ]
+}
 
 
 async def get_block_by_signature(signature_str: str):
-    async with AsyncClient(appconfig.RPC_URL_QUICKNODE) as client:
+    async with rpc_client(appconfig.RPC_URL_QUICKNODE) as client:
         try:
             signature = Signature.from_string(signature_str)
             # Fetch the transaction details
@@ -42,3 +67,77 @@ async def get_block_by_signature(signature_str: str):
         except Exception as e:
             print("Exception when getting block: {}".format(e))
             return None
+
+
+def iter_block_transactions(block: Dict):
+    """
+    Successful transactions of a base64 encoded block notification
+    :param block[dict]: block from a blockNotification.
+    :return: VersionedTransaction and the addresses it loaded from lookup tables.
+    """
+    for tx in block.get("transactions", []):
+        if not isinstance(tx, dict) or "transaction" not in tx:
+            continue
+        meta = tx.get("meta") or {}
+        if meta.get("err") is not None:
+            continue
+
+        loaded_addresses = meta.get("loadedAddresses") or {}
+        transaction = VersionedTransaction.from_bytes(base64.b64decode(tx["transaction"][0]))
+        yield transaction, loaded_addresses.get("writable", []) + loaded_addresses.get("readonly", [])
+
+
+def decode_block_notification(data: Dict) -> Dict:
+    """
+    :param data[dict]: message received from a blockSubscribe websocket.
+    :return: tokens created in the block and their buyers by mint address,
+             None if the message isn't a block notification.
+    """
+    if data.get("method") != "blockNotification":
+        return None
+
+    block = data.get("params", {}).get("result", {}).get("value", {}).get("block")
+    if not block:
+        return None
+
+    return decode_token_bundles(
+        instructions=iter_raw_pump_instructions(iter_block_transactions(block)),
+        block=block["parentSlot"] + 1,
+        block_time=block["blockTime"]
+    )
+
+
+async def read_pump_blocks(websocket) -> AsyncIterator[Dict]:
+    """
+    Subscribes an open websocket to the blocks mentioning Pump.fun program and yields,
+    for every block, the tokens created in it together with their first buyers.
+    Blocks without new tokens yield an empty dictionary so consumers can check on their stop criteria.
+    :param websocket: websocket connected to a RPC node supporting blockSubscribe.
+    """
+    await websocket.send(json.dumps(PUMP_BLOCK_SUBSCRIPTION))
+    print("Subscribed to blocks mentioning program: {}".format(appconfig.PUMP_PROGRAM))
+
+    async for message in websocket:
+        try:
+            token_data = decode_block_notification(json.loads(message))
+        except Exception as e:
+            print("read_pump_blocks-> Error decoding block: {}".format(e))
+            continue
+
+        if token_data is not None:
+            yield token_data
+
+
+async def stream_pump_blocks(websocket_url: str = appconfig.WSS_URL_QUICKNODE) -> AsyncIterator[Dict]:
+    """
+    read_pump_blocks reconnecting when the websocket connection is lost.
+    :param websocket_url[str]: RPC node websocket url.
+    """
+    while True:
+        try:
+            async with websockets.connect(websocket_url, ping_interval=20, max_size=None) as websocket:
+                async for token_data in read_pump_blocks(websocket=websocket):
+                    yield token_data
+        except (websockets.exceptions.ConnectionClosed, OSError) as e:
+            print("stream_pump_blocks-> Connection lost: {}. Reconnecting...".format(e))
+            await asyncio.sleep(appconfig.RETRYING_SECONDS)
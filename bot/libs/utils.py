@@ -1,6 +1,8 @@
 import base58
 import base64
 import json
+import numpy as np
+import os
 import random
 import requests
 import struct
@@ -8,9 +10,9 @@ import time
 
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
+from typing import Iterable, Iterator
 
-from solana.rpc.api import Client
-from solana.rpc.async_api import AsyncClient
 from solana.rpc.types import TxOpts
 from solana.rpc.commitment import Confirmed
 
@@ -32,6 +34,10 @@ from spl.token.instructions import (
 )
 
 from bot.config import appconfig
+from bot.domain.blockhash_cache import blockhash_cache
+from bot.domain.confirmations import signature_poller
+from bot.domain.rpc_gateway import rpc_client, rpc_post, rpc_sync_client
+from bot.libs.idl_decoder import InstructionDecoder, load_instruction_decoders
 
 
 class Path:
@@ -65,7 +71,7 @@ async def get_solana_balance(public_key: Pubkey) -> float:
     :param wallet_address: The public address of the Solana wallet.
     :return: Balance in SOL as a float.
     """
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             # Fetch the balance (in lamports)
             balance_response = await client.get_balance(public_key)
@@ -93,8 +99,10 @@ def decode_pump_fun_token(token: str) -> Pubkey:
 
 
 def initial_buy_calculator(sol_in_bonding_curve: float):
-    pump_dont_fun_initial_fund = appconfig.SCANNER_PUMPDONTFUN_INITIAL_FUND
-    sols = round(sol_in_bonding_curve - pump_dont_fun_initial_fund, 3)
+    # Lamports avoid float residues like 0.9999999999 when taking out the initial fund
+    lamports = round(sol_in_bonding_curve * appconfig.LAMPORTS_PER_SOL) - \
+        appconfig.SCANNER_PUMPDONTFUN_INITIAL_FUND * appconfig.LAMPORTS_PER_SOL
+    sols = round(lamports / appconfig.LAMPORTS_PER_SOL, 3)
     return sols
 
 
@@ -160,14 +168,13 @@ def include_instruction(msg: MessageV0):
     Under development
     """
     from solders.compute_budget import set_compute_unit_limit
-    from solana.rpc.api import Client
     from solders.instruction import CompiledInstruction
 
     # Step 1: Add ComputeBudgetInstruction
     compute_budget_ix = set_compute_unit_limit(1_000_000)  # Set compute unit limit to 1M
 
     # Step 2: Get a fresh recent ∫blockhash
-    client = Client(appconfig.JITO_RPC_URL)  # Assuming RpcClient is already imported and available
+    client = rpc_sync_client(appconfig.JITO_RPC_URL)  # Assuming RpcClient is already imported and available
     recent_blockhash = client.get_latest_blockhash().value.blockhash
 
     accountKeys = list(msg.account_keys)  # Convert to mutable list
@@ -216,6 +223,116 @@ def stamp_time(time: datetime, time_stored: dict = None) -> dict:
     return time_stored
 
 
+class TimestampBuckets:
+    """
+    Buys per second keyed by integer epoch seconds. Seconds are stored in insertion order
+    in fixed size arrays, so first/last seconds are O(1) and counts can be thresholded with numpy.
+    When the buffer is full the second oldest bucket is dropped: the first one is always kept.
+    """
+    __slots__ = ("seconds", "counts", "length", "size")
+
+    STAMP_FORMAT = "%Y%m%d%H%M%S"
+
+    def __init__(self, size: int = appconfig.TRADING_BUYS_TIMESTAMPS_HISTORY_SIZE):
+        self.size = max(size, 2)
+        self.seconds = np.zeros(self.size, dtype=np.int64)
+        self.counts = np.zeros(self.size, dtype=np.int64)
+        self.length = 0
+
+    @classmethod
+    def from_stamps(
+        cls,
+        stamps: dict,
+        size: int = appconfig.TRADING_BUYS_TIMESTAMPS_HISTORY_SIZE
+    ) -> "TimestampBuckets":
+        """
+        Builds the buckets from a stamp_time dictionary
+        """
+        buckets = cls(size=max(size, len(stamps)))
+        for stamp in sorted(stamps):
+            second = datetime.strptime(stamp, cls.STAMP_FORMAT).timestamp()
+            buckets.add(timestamp=second, count=stamps[stamp])
+        return buckets
+
+    @classmethod
+    def from_value(cls, value) -> "TimestampBuckets":
+        """
+        :param value[TimestampBuckets|dict]: buckets or a stamp_time dictionary from previous versions
+        """
+        if isinstance(value, cls):
+            return value
+        return cls.from_stamps(stamps=value)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TimestampBuckets):
+            return NotImplemented
+        return self.length == other.length and \
+            np.array_equal(self.seconds[:self.length], other.seconds[:other.length]) and \
+            np.array_equal(self.counts[:self.length], other.counts[:other.length])
+
+    @property
+    def first(self) -> int:
+        return int(self.seconds[0])
+
+    @property
+    def last(self) -> int:
+        return int(self.seconds[self.length - 1])
+
+    def add(self, timestamp: float, count: int = 1):
+        second = int(timestamp)
+        length = self.length
+        # Most of the buys happen in the last second seen
+        if length and self.seconds[length - 1] == second:
+            self.counts[length - 1] += count
+            return
+
+        index = length
+        if length and second < self.seconds[length - 1]:
+            index = int(np.searchsorted(self.seconds[:length], second))
+            if self.seconds[index] == second:
+                self.counts[index] += count
+                return
+
+        if length == self.size:
+            # Dropping the second oldest bucket
+            self.seconds[1:length - 1] = self.seconds[2:length]
+            self.counts[1:length - 1] = self.counts[2:length]
+            length -= 1
+            if index > 1:
+                index -= 1
+
+        self.seconds[index + 1:length + 1] = self.seconds[index:length]
+        self.counts[index + 1:length + 1] = self.counts[index:length]
+        self.seconds[index] = second
+        self.counts[index] = count
+        self.length = length + 1
+
+    def count_at_least(self, min_count: int) -> int:
+        """
+        :return: how many seconds have at least min_count buys
+        """
+        return int(np.count_nonzero(self.counts[:self.length] >= min_count))
+
+    def copy(self) -> "TimestampBuckets":
+        buckets = TimestampBuckets(size=self.size)
+        buckets.seconds[:] = self.seconds
+        buckets.counts[:] = self.counts
+        buckets.length = self.length
+        return buckets
+
+    def to_stamps(self) -> dict:
+        """
+        :return: stamp_time like dictionary ready to be stored as JSON
+        """
+        return {
+            datetime.fromtimestamp(int(second)).strftime(self.STAMP_FORMAT): int(count)
+            for second, count in zip(self.seconds[:self.length], self.counts[:self.length])
+        }
+
+
 def get_solana_price() -> float:
     """
     Retrieves the current Solana price in USD using a public API.
@@ -257,7 +374,7 @@ def get_token_mint_decimals(mint_address: str) -> int:
     Returns:
         int: The number of decimals for the token.
     """
-    client = Client(appconfig.RPC_URL_QUICKNODE)
+    client = rpc_sync_client(appconfig.RPC_URL_QUICKNODE)
 
     mint_pubkey = Pubkey.from_string(mint_address)
 
@@ -289,7 +406,7 @@ async def get_token_accounts_by_owner(wallet_address=str) -> dict:
         ]
     }
     try:
-        response = requests.post(
+        response = rpc_post(
             url=appconfig.RPC_URL_HELIUS,
             json=data,
             headers={"Content-Type": "application/json"}
@@ -328,7 +445,7 @@ def get_token_metadata(token_address: str) -> dict:
             break
 
         try:
-            response = requests.post(
+            response = rpc_post(
                 url=appconfig.RPC_URL_HELIUS,
                 json=data,
                 headers={"Content-Type": "application/json"}
@@ -567,7 +684,7 @@ async def burn_associated_token_account(
     :return: [str] transaction signature.
     """
     txn = None
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             token_programm = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")  # SPL Token program ID
             # Get associated token account
@@ -625,8 +742,7 @@ async def burn_associated_token_account(
             burn_ix = burn_checked(params=params)
 
             # Create and sign transaction
-            blockhash = await client.get_latest_blockhash()
-            recent_blockhash = blockhash.value.blockhash
+            recent_blockhash = (await blockhash_cache.latest()).blockhash
 
             msg = Message(
                 instructions=[set_compute_unit_price(1_000), burn_ix],
@@ -642,8 +758,8 @@ async def burn_associated_token_account(
                 tx_signature.value,
                 current_time
             ))
-            await client.confirm_transaction(tx_signature.value, commitment="confirmed")
-            print("Transaction confirmed")
+            status = await signature_poller.confirm(tx_signature.value, timeout=appconfig.TX_LANDING_TIMEOUT_SECONDS)
+            print("Transaction confirmed" if status is not None and status.ok else "Transaction not confirmed")
 
         except Exception as e:
             print("burn_associated_token_account Error: {}".format(e))
@@ -666,7 +782,7 @@ async def burn_and_close_associated_token_account(
     :return: [str] transaction signature.
     """
     txn_signature = None
-    async with AsyncClient(appconfig.RPC_URL_HELIUS) as client:
+    async with rpc_client(appconfig.RPC_URL_HELIUS) as client:
         try:
             response = await client.get_account_info(associated_token_account)
             account_info = response.value
@@ -726,8 +842,7 @@ async def burn_and_close_associated_token_account(
                 )
             )
 
-            blockhash = await client.get_latest_blockhash()
-            recent_blockhash = blockhash.value.blockhash
+            recent_blockhash = (await blockhash_cache.latest()).blockhash
             tx = Transaction.new_signed_with_payer(
                 instructions=[set_compute_unit_price(1_000), burn_ix, close_ix],
                 payer=keypair.pubkey(),
@@ -745,8 +860,8 @@ async def burn_and_close_associated_token_account(
                 tx_signature.value,
                 current_time
             ))
-            await client.confirm_transaction(tx_signature.value, commitment="confirmed")
-            print("Transaction confirmed")
+            status = await signature_poller.confirm(tx_signature.value, timeout=appconfig.TX_LANDING_TIMEOUT_SECONDS)
+            print("Transaction confirmed" if status is not None and status.ok else "Transaction not confirmed")
 
         except Exception as e:
             print("transfer_solanas Error: {}".format(e))
@@ -806,7 +921,7 @@ def get_account_information(account: Pubkey) -> GetAccountInfoResp:
     while loop_counter < appconfig.TRADING_RETRIES:
         try:
             # Send the POST request
-            response = requests.post(
+            response = rpc_post(
                 appconfig.RPC_URL_HELIUS,
                 headers={"Content-Type": "application/json"},
                 json=json_body
@@ -883,28 +998,35 @@ def derive_creator_vault(mint: Pubkey, program_id: Pubkey) -> Pubkey:
     return vault_pda
 
 
+PUMP_IDL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "idl", "pump_fun_idl.json")
+
+
 def load_idl(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
 
 
-def decode_create_instruction(ix_data, ix_def, accounts):
+@lru_cache(maxsize=None)
+def get_pump_instruction_decoders() -> dict:
+    """
+    Loads the Pump.fun IDL once into a discriminator -> (name, generated decoder, args decoder) table
+    """
+    handlers = {
+        "create": decode_create_instruction,
+        "buy": decode_buy_instruction
+    }
+    decoders = load_instruction_decoders(idl=load_idl(PUMP_IDL_PATH))
+    return {
+        discriminator: (decoder.name, decoder, handlers[decoder.name])
+        for discriminator, decoder in decoders.items()
+        if decoder.name in handlers
+    }
+
+
+def decode_create_instruction(ix_data: bytes, ix_decoder: InstructionDecoder, accounts: list) -> dict:
     args = {}
-    offset = 8  # Skip 8-byte discriminator
     try:
-        for arg in ix_def['args']:
-            if arg['type'] == 'string':
-                length = struct.unpack_from('<I', ix_data, offset)[0]
-                offset += 4
-                value = ix_data[offset:offset + length].decode('utf-8')
-                offset += length
-            elif arg['type'] == 'publicKey':
-                value = base64.b64encode(ix_data[offset:offset + 32]).decode('utf-8')
-                offset += 32
-            else:
-                raise ValueError(f"Unsupported type: {arg['type']}")
-
-            args[arg['name']] = value
+        args = ix_decoder(ix_data)._asdict()
 
         # Add accounts
         args['mint'] = str(accounts[0])
@@ -918,36 +1040,12 @@ def decode_create_instruction(ix_data, ix_def, accounts):
     return args
 
 
-def decode_buy_instruction(ix_data, ix_def, accounts):
+def decode_buy_instruction(ix_data: bytes, ix_decoder: InstructionDecoder, accounts: list) -> dict:
     args = {}
-    offset = 8  # Skip 8-byte discriminator
-
     try:
-        for arg in ix_def['args']:
-            arg_type = arg['type']
-            arg_name = arg['name']
-
-            if arg_type == 'string':
-                length = struct.unpack_from('<I', ix_data, offset)[0]
-                offset += 4
-                value = ix_data[offset:offset + length].decode('utf-8')
-                offset += length
-            elif arg_type == 'publicKey':
-                value = base64.b64encode(ix_data[offset:offset + 32]).decode('utf-8')
-                offset += 32
-            elif arg_type == 'u64':
-                value = struct.unpack_from('<Q', ix_data, offset)[0]
-                offset += 8
-            elif arg_type == 'bool':
-                value = struct.unpack_from('<?', ix_data, offset)[0]
-                offset += 1
-            else:
-                raise ValueError(f"Unsupported type: {arg_type}")
-
-            args[arg_name] = value
+        args = ix_decoder(ix_data)._asdict()
 
         # Map accounts to argument names
-
         args['pump_fee_account'] = str(accounts[1])
         args['mint'] = str(accounts[2])
         args['pump_bunding_curve'] = str(accounts[3])
@@ -958,117 +1056,125 @@ def decode_buy_instruction(ix_data, ix_def, accounts):
 
     except Exception as e:
         print("decode_buy_instruction-> Error: {}".format(e))
-    # args['token_account'] = str(accounts[2])
 
     return args
 
 
-def get_token_data_from_block(block, threshold, min_scam_buyers) -> dict:
-    token_data = {}
-    decoded_args = {}
-    idl = load_idl('bot/idl/pump_fun_idl.json')
-    create_discriminator = 8576854823835016728
-    buy_discriminator = 16927863322537952870
-    tradable_tokens = []
-    buyers = []
+def iter_parsed_pump_instructions(transactions) -> Iterator[tuple[bytes, list]]:
+    """
+    Pump.fun instructions of a block fetched with jsonParsed encoding
+    :param transactions: block.value.transactions.
+    :return: instruction data and account addresses of every Pump.fun instruction.
+    """
+    pump_program = str(appconfig.PUMP_PROGRAM)
+    for tx_with_meta in transactions:
+        meta = getattr(tx_with_meta, "meta", None)
+        if meta is not None and meta.err is not None:
+            continue
 
-    for tx_with_meta in block.value.transactions:
         encoded_tx = tx_with_meta.transaction
-        if encoded_tx.message:
-            instructions = encoded_tx.message.instructions
-            for ix in instructions:
-                program_id = str(ix.program_id)
-                if program_id == str(appconfig.PUMP_PROGRAM):
-                    ix_data = base58.b58decode(ix.data)
-                    discriminator = struct.unpack('<Q', ix_data[:8])[0]
-
-                    account_keys = []
-                    if discriminator == create_discriminator:
-                        create_ix = next(
-                            instr for instr in idl['instructions'] if instr['name'] == 'create'
-                        )
-                        try:
-                            for index in ix.accounts:
-                                for account_key in tx_with_meta.transaction.message.account_keys:
-                                    if str(index) == str(account_key.pubkey):
-                                        account_keys.append(str(account_key.pubkey))
-                                        continue
-                        except Exception:
-                            print("Create Error: Mismatch between ix.accounts(${}) and account_keys".format(
-                                len(ix.accounts)),
-                                len(tx_with_meta.transaction.message.account_keys)
-                            )
-                            continue
-
-                        decoded_args = decode_create_instruction(
-                            ix_data,
-                            create_ix,
-                            account_keys
-                        )
-                        if not decoded_args:
-                            break
-
-                        if "mint" not in decoded_args:
-                            break
-
-                        decoded_args["block"] = block.value.parent_slot + 1
-                        decoded_args["blockTime"] = block.value.block_time
-                        decoded_args["buyers"] = []
-                        decoded_args["seen_buyers"] = set()
-
-                        token_data = {
-                            decoded_args["mint"]: decoded_args.copy(),
-                        }
-                        continue
-
-                    # We'll check on BUYs after having a new token created
-                    if decoded_args and discriminator == buy_discriminator:
-                        buy_ix = next(
-                            instr for instr in idl['instructions'] if instr['name'] == 'buy'
-                        )
-                        try:
-                            for index in ix.accounts:
-                                for account_key in tx_with_meta.transaction.message.account_keys:
-                                    if str(index) == str(account_key.pubkey):
-                                        account_keys.append(str(account_key.pubkey))
-                                        continue
-                        except Exception:
-                            print("Buy Error: Mismatch between ix.accounts(${}) and account_keys".format(
-                                len(ix.accounts)),
-                                len(tx_with_meta.transaction.message.account_keys)
-                            )
-                            continue
-
-                        decoded_buy_args = decode_buy_instruction(
-                            ix_data,
-                            buy_ix,
-                            account_keys
-                        )
-
-                        if decoded_buy_args.get('mint', '') in token_data:
-                            buyer = decoded_buy_args.get('buyer')
-                            tokens_bought = decoded_buy_args.get('amount')
-                            sol_traded = decoded_buy_args.get('maxSolCost')
-                            creator_vault = decoded_buy_args.get('creator_vault')
-
-                            developer = decoded_args.get("developer")
-                            trader = "developer" if developer == buyer else "sniper"
-                            if buyer not in token_data[decoded_buy_args.get('mint')]["seen_buyers"]:  # noqa: E501
-                                # Add the buyer to the set
-                                token_data[decoded_buy_args.get('mint')]["seen_buyers"].add(buyer)  # noqa: E501
-                                token_data[decoded_buy_args.get('mint')]["buyers"].append({
-                                    'buyer': buyer,
-                                    'trader': trader,
-                                    'tokens_bought': tokens_bought / 10**6,
-                                    'sol_traded': (sol_traded / 10**9) / 1.01,  # taking out Pump.fun fee  # noqa: E501
-                                    'creator_vault': creator_vault
-                                })
-
-                        continue
+        if not encoded_tx.message:
+            continue
+
+        # Transaction's account keys are indexed once and only if there're Pump instructions
+        known_accounts = None
+        for ix in encoded_tx.message.instructions:
+            if str(ix.program_id) != pump_program:
+                continue
+            if known_accounts is None:
+                known_accounts = {str(account_key.pubkey) for account_key in encoded_tx.message.account_keys}
+            yield base58.b58decode(ix.data), [str(account) for account in ix.accounts if str(account) in known_accounts]
+
 
+def iter_raw_pump_instructions(transactions) -> Iterator[tuple[bytes, list]]:
+    """
+    Pump.fun instructions of transactions pushed in binary format
+    :param transactions: VersionedTransaction and addresses loaded from lookup tables pairs.
+    :return: instruction data and account addresses of every Pump.fun instruction.
+    """
+    for transaction, loaded_addresses in transactions:
+        message = transaction.message
+        account_keys = None
+        for ix in message.instructions:
+            if message.account_keys[ix.program_id_index] != appconfig.PUMP_PROGRAM:
+                continue
+            if account_keys is None:
+                account_keys = [str(account_key) for account_key in message.account_keys] + loaded_addresses
+            try:
+                yield bytes(ix.data), [account_keys[index] for index in ix.accounts]
+            except IndexError:
+                print("Error: Mismatch between ix.accounts({}) and account_keys({})".format(
+                    len(ix.accounts),
+                    len(account_keys)
+                ))
+
+
+def decode_token_bundles(instructions: Iterable[tuple[bytes, list]], block: int, block_time: int) -> dict:
+    """
+    Decodes the tokens created in a block together with their buyers in the same block
+    :param instructions: instruction data and account addresses of the block's Pump.fun instructions.
+    :param block[int]: block's slot.
+    :param block_time[int]: block's timestamp.
+    :return: create instruction args plus buyers by mint address.
+    """
+    decoders = get_pump_instruction_decoders()
+    token_data = {}
+    for ix_data, account_keys in instructions:
+        if len(ix_data) < 8:
+            continue
+        decoder_entry = decoders.get(struct.unpack_from('<Q', ix_data)[0])
+        if decoder_entry is None:
+            continue
+        ix_name, ix_decoder, decoder = decoder_entry
+
+        if ix_name == "create":
+            decoded_args = decoder(ix_data, ix_decoder, account_keys)
+            if "mint" not in decoded_args:
+                continue
+
+            decoded_args["block"] = block
+            decoded_args["blockTime"] = block_time
+            decoded_args["buyers"] = []
+            decoded_args["seen_buyers"] = set()
+            decoded_args["raw_tokens_bought"] = 0     # Raw token units bought by every buy instruction
+            token_data[decoded_args["mint"]] = decoded_args
+            continue
+
+        # We'll check on BUYs after having a new token created
+        if ix_name == "buy" and token_data:
+            decoded_buy_args = decoder(ix_data, ix_decoder, account_keys)
+            token = token_data.get(decoded_buy_args.get('mint', ''))
+            if token is None:
+                continue
+            # Repeated buyers aren't listed again but their buys still move the curve
+            token["raw_tokens_bought"] += decoded_buy_args.get('amount')
+
+            buyer = decoded_buy_args.get('buyer')
+            if buyer in token["seen_buyers"]:
+                continue
+            # Add the buyer to the set
+            token["seen_buyers"].add(buyer)
+            token["buyers"].append({
+                'buyer': buyer,
+                'trader': "developer" if token.get("developer") == buyer else "sniper",
+                'tokens_bought': decoded_buy_args.get('amount') / 10**6,
+                'sol_traded': (decoded_buy_args.get('maxSolCost') / 10**9) / 1.01,  # taking out Pump.fun fee
+                'creator_vault': decoded_buy_args.get('creator_vault')
+            })
+
+    return token_data
+
+
+def select_tradable_tokens(token_data: dict, threshold: float, min_scam_buyers: int) -> list:
+    """
+    Tokens whose first buyers bought at least threshold tokens: either many scam bots or a whale
+    :param token_data[dict]: tokens by mint address from decode_token_bundles.
+    :return: tradable tokens.
+    """
+    tradable_tokens = []
     if token_data:
-        if len(list(token_data.keys())) > 1:
-            print("-> Tokens: {}".format(len(list(token_data.keys()))))
+        if len(token_data) > 1:
+            print("-> Tokens: {}".format(len(token_data)))
 
         for token, data in token_data.items():
             print("-> Checking on token {}".format(token))
@@ -1091,13 +1197,23 @@ def get_token_data_from_block(block, threshold, min_scam_buyers) -> dict:
                     tradable_tokens.append(data)
                 else:
                     print(" Mix found: developer plus some sniper bots. Discarting token...")
-            # else:
-            #     print("*** TESTING token...")
-            #     tradable_tokens.append(data)
 
     return tradable_tokens
 
 
+def get_token_data_from_block(block, threshold, min_scam_buyers) -> list:
+    token_data = decode_token_bundles(
+        instructions=iter_parsed_pump_instructions(block.value.transactions),
+        block=block.value.parent_slot + 1,
+        block_time=block.value.block_time
+    )
+    return select_tradable_tokens(
+        token_data=token_data,
+        threshold=threshold,
+        min_scam_buyers=min_scam_buyers
+    )
+
+
 # 👇 Sample re-derivation (this is illustrative, your actual seeds may vary)
 def get_associated_bonding_curve(bonding_curve: Pubkey, mint: Pubkey, program_id: Pubkey):
     seed1 = b"bonding"
@@ -7,7 +7,18 @@ from config import appconfig
 from bot.libs.pump_buy import main as tax_collector_main
 
 
-async def main():
+async def run(tasks: list):
+    start_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
+    # TODO: implement trader execution from input parameters
+    print("Starting {} program at {}".format(Trader.sniper.value, start_time))
+
+    await asyncio.gather(*tasks)
+    stop_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
+    print("Stoping {} program at {}".format(Trader.scanner.value, stop_time))
+
+
+def main():
+    # Pump objects fetch the wallet's balance when created: they must be created before the event loop starts
     pump = Pump(
         executor_name="sniper2",
         trader_type=Trader.sniper
@@ -20,17 +31,12 @@ async def main():
 
     tasks = [
         # pump.subscribe(steps=TradeRoadmap.sniper_3_sell_artifical_pump),
+        # pump.run_positions(steps=TradeRoadmap.sniper_1),
         scanner.subscribe(steps=TradeRoadmap.scanner),
         # tax_collector_main(trades=1)
     ]
-    start_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
-    # TODO: implement trader execution from input parameters
-    print("Starting {} program at {}".format(Trader.sniper.value, start_time))
-
-    await asyncio.gather(*tasks)
-    stop_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
-    print("Stoping {} program at {}".format(Trader.scanner.value, stop_time))
+    asyncio.run(run(tasks=tasks))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -1,5 +1,7 @@
 from bot.config import appconfig
 from bot.domain.jito_rpc import JitoJsonRpcSDK
+from bot.domain.blockhash_cache import blockhash_cache
+from bot.domain.confirmations import signature_poller
 
 import asyncio
 import base64
@@ -17,49 +19,31 @@ from solana.rpc.async_api import AsyncClient
 
 
 async def check_transaction_status(client: AsyncClient, signature_str: str):
+    """
+    Waits for the transaction to be finalized through the shared confirmation service.
+    :param client[AsyncClient]: unused, statuses are polled together with every other pending signature.
+    """
     print("Checking transaction status...")
-    max_attempts = 60  # 60 seconds
-    attempt = 0
+    max_seconds = 60
 
     signature = Signature.from_string(signature_str)
+    status = await signature_poller.confirm(
+        signature,
+        timeout=max_seconds,
+        commitment=TransactionConfirmationStatus.Finalized
+    )
+    if status is None:
+        print(f"Transaction not finalized after {max_seconds} seconds.")
+        return False
 
-    while attempt < max_attempts:
-        try:
-            response = await client.get_signature_statuses([signature])
-
-            if response.value[0] is not None:
-                status = response.value[0]
-                slot = status.slot
-                confirmations = status.confirmations
-                err = status.err
-                confirmation_status = status.confirmation_status
-
-                print(f"Slot: {slot}")
-                print(f"Confirmations: {confirmations}")
-                print(f"Confirmation status: {confirmation_status}")
-
-                if err:
-                    print(f"Transaction failed with error: {err}")
-                    return False
-                elif confirmation_status == TransactionConfirmationStatus.Finalized:
-                    print("Transaction is finalized.")
-                    return True
-                elif confirmation_status == TransactionConfirmationStatus.Confirmed:
-                    print("Transaction is confirmed but not yet finalized.")
-                elif confirmation_status == TransactionConfirmationStatus.Processed:
-                    print("Transaction is processed but not yet confirmed or finalized.")
-            else:
-                print("Transaction status not available yet.")
-
-            await asyncio.sleep(1)
-            attempt += 1
-        except Exception as e:
-            print(f"Error checking transaction status: {e}")
-            await asyncio.sleep(1)
-            attempt += 1
+    print(f"Slot: {status.slot}")
+    print(f"Confirmation status: {status.confirmation_status}")
+    if status.err:
+        print(f"Transaction failed with error: {status.err}")
+        return False
 
-    print(f"Transaction not finalized after {max_attempts} attempts.")
-    return False
+    print("Transaction is finalized.")
+    return True
 
 
 async def send_transaction_with_priority_fee(
@@ -73,7 +57,7 @@ async def send_transaction_with_priority_fee(
     compute_unit_limit=100_000
 ):
     try:
-        recent_blockhash = await solana_client.get_latest_blockhash()
+        recent_blockhash = await blockhash_cache.latest()
 
         # Transfer to the known receiver
         transfer_ix = transfer(TransferParams(from_pubkey=sender.pubkey(), to_pubkey=receiver, lamports=amount))
@@ -89,7 +73,7 @@ async def send_transaction_with_priority_fee(
             [priority_fee_ix, transfer_ix, jito_tip_ix],
             sender.pubkey(),
             [sender],
-            recent_blockhash.value.blockhash
+            recent_blockhash.blockhash
         )
 
         serialized_transaction = base64.b64encode(bytes(transaction)).decode('ascii')
@@ -304,18 +288,18 @@ async def basic_bundle():
     )
 
     # Get recent blockhash
-    recent_blockhash = await solana_client.get_latest_blockhash()
+    recent_blockhash = await blockhash_cache.latest()
 
     # Create the transaction
     message = Message.new_with_blockhash(
         [transfer_ix, tip_ix, memo_ix],
         wallet_keypair.pubkey(),
-        recent_blockhash.value.blockhash
+        recent_blockhash.blockhash
     )
     transaction = Transaction.new_unsigned(message)
 
     # Sign the transaction
-    transaction.sign([wallet_keypair], recent_blockhash.value.blockhash)
+    transaction.sign([wallet_keypair], recent_blockhash.blockhash)
 
     # Serialize and base58 encode the entire signed transaction
     serialized_transaction = base64.b64encode(bytes(transaction)).decode('ascii')
@@ -1,8 +1,6 @@
 import asyncio
-import nest_asyncio
 import json
 import requests
-import time
 import websockets
 import ssl
 import certifi
@@ -10,7 +8,9 @@ import websockets.connection
 import websockets.exceptions
 
 from bot.libs.criterias import (
-    trading_analytics,
+    TokenTradeState,
+    CompiledCriteria,
+    export_trades,
     max_consecutive_buys,
     max_consecutive_sells,
     max_seconds_between_buys,
@@ -23,27 +23,36 @@ from bot.libs.criterias import (
     max_seconds_in_market,
     discard_max_seconds_in_market
 )
-from bot.libs import criterias as criteria_functions
 from bot.libs.utils import (
     get_solana_balance,
+    get_token_data_from_block,
+    select_tradable_tokens,
     Trader,
     TxType,
     Celebrimborg,
     initial_buy_calculator
 )
+from bot.libs.bonding_curve import bonding_curves
+from bot.libs.solana_functions import get_block_by_signature, stream_pump_blocks
+from bot.libs.pump_buy import (
+    calculate_pump_curve_price_local,
+    buy_token,
+    sell_token
+)
 from bot.config import appconfig, AppMode
-from bot.domain.redis_db import RedisDB
+from bot.domain.blockhash_cache import blockhash_cache
+from bot.domain.jito_rpc import tip_accounts
+from bot.domain.redis_db import AsyncRedisDB
+from bot.domain.signature_subscriptions import signature_subscriptions
+from bot.domain.trade_executor import TradeResult, trade_executor
 
 from datetime import datetime, timedelta
 from enum import Enum
 from solders.pubkey import Pubkey
 from solders.transaction import VersionedTransaction
 from solders.keypair import Keypair
-from solders.commitment_config import CommitmentLevel
-from solders.rpc.requests import SendVersionedTransaction
-from solders.rpc.config import RpcSendTransactionConfig
 
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 
 
 class Suscription(Enum):
@@ -51,6 +60,7 @@ class Suscription(Enum):
     subscribeAccountTrade = "subscribeAccountTrade"
     subscribeTokenTrade = "subscribeTokenTrade"
     unsubscribeTokenTrade = "unsubscribeTokenTrade"
+    blockSubscribe = "blockSubscribe"
 
 
 class Redis(Enum):
@@ -132,6 +142,27 @@ class TradeRoadmap:
         },
         {"step": 3, "name": "exit", "system_action": Celebrimborg.exit},
     ]
+    scanner_blocks = [
+        {
+            "step": 0,
+            "name": "START_SCANNER",
+            "system_action": Celebrimborg.start,
+            "criteria": {
+                "scanner_activity_time": -1,    # How much time the scanner will be working. -1 is always
+                "max_trades": 1
+            },
+        },
+        {
+            "step": 1,
+            "name": "BLOCK_SCANNER",
+            "subscription": Suscription.blockSubscribe,
+            "criteria": {
+                "threshold": 500_000_000,       # Amount of tokens bough by developer and snipers
+                "min_scam_buyers": 3            # Min scam buying bots for a token scam to be considered
+            }
+        },
+        {"step": 2, "name": "exit", "system_action": Celebrimborg.exit},
+    ]
     sniper_1 = [
         {
             "step": 0,
@@ -251,10 +282,6 @@ class TradeRoadmap:
     ]
 
 
-# Patch the running event loop. Required to get wallet's balance
-nest_asyncio.apply()
-
-
 class Pump:
     sniping_token_list = []
 
@@ -268,6 +295,8 @@ class Pump:
         self.uri_data = appconfig.PUMPFUN_WEBSOCKET
         self.accounts = []
         self.tokens = {}
+        self.trade_states = {}     # Rolling trades analytics per token being traded
+        self.criteria_evaluators = {}   # Compiled criteria per roadmap step number
         self.traders = []
         self.executor_name = executor_name
         self.trader_type = trader_type
@@ -289,6 +318,16 @@ class Pump:
         self.trade_fees = appconfig.FEES
         self.halt_trade = 0
 
+        # Tokens being checked and positions being bought, held and sold in background
+        # while the websocket keeps being read
+        self.detection_tasks = set()
+        self.trading_tasks = set()
+        self.roadmap_executor = None
+
+    def websocket_ssl(self):
+        # Local feeds (e.g. a ReplayServer) are plain ws://
+        return self.ssl_context if self.uri_data.startswith("wss://") else None
+
     def start_scanner(self):
         self.scanner_start_time = datetime.now()
 
@@ -296,6 +335,13 @@ class Pump:
         balance = asyncio.run(get_solana_balance(public_key=public_key))
         return balance
 
+    async def update_balance(self) -> float:
+        """
+        Refreshes the wallet's balance from inside the event loop
+        """
+        self.balance = await get_solana_balance(public_key=self.keypair.pubkey())
+        return self.balance
+
     def get_tkn_balance(self, wallet_pubkey, token_account):
         token_balance = 0
         if appconfig.APPMODE not in [AppMode.dummy.value, AppMode.simulation.value]:
@@ -353,9 +399,12 @@ class Pump:
 
     def remove_token(self, token: Dict):
         del self.tokens[token["mint"]]
+        self.trade_states.pop(token["mint"], None)
+        bonding_curves.remove(token["mint"])
 
     def clear_tokens(self):
         self.tokens = {}
+        self.trade_states = {}
 
     def log_trade_token_timestamp(self, mint: str, txtype: TxType, trade_timestamp: int):
         token = self.tokens[mint]
@@ -371,12 +420,95 @@ class Pump:
         if trader in self.traders:
             self.traders.pop(self.traders.index(trader))
 
+    async def check_token_for_trading(self, token: Dict, step: Dict, redisdb: AsyncRedisDB) -> Dict:
+        """
+        Applies WAIT_FOR_TOKEN step criteria to a fresh token read from redis, marks it as
+        checked and adds it to the tokens being traded.
+        :param token[dict]: fresh token from redis.
+        :param step[dict]: Redis.readToken step in trade roadmap list of steps.
+        :param redisdb[AsyncRedisDB]: redis connection used to update the token.
+        :return: the checked token including its trading_amount or None if it's too old for trading.
+        """
+        mint = token["mint"]
+        amount = token["amount"]
+        criteria = step.get("criteria", {})
+
+        # FILTERING BY TOKEN'S CREATION TIME
+        token_creation_time = datetime.fromtimestamp(token["timestamp"])
+        token_age = (datetime.now() - token_creation_time).total_seconds()
+
+        age_tolerance = criteria.get("age_tolerance", appconfig.TRADING_TOKEN_TOO_OLD_SECONDS)
+
+        if token_age >= age_tolerance and appconfig.APPMODE not in [AppMode.dummy.value]:
+            print("Warning: susbscribe -> Token {} is too old for trading. Checking it and moving on".format(
+                token["name"]
+            ))
+            await redisdb.update_token(
+                token=token,
+                is_checked=True,
+                is_closed=True
+            )
+            return None
+
+        trading_amount = amount
+        enough_balance = self.balance >= amount
+        # Checking wallet's balance before trading
+        if not enough_balance:
+            # Checking if we are allowed to use all balance
+            if criteria.get("use_all_balance", False):
+                trading_amount = self.balance
+                enough_balance = True
+
+            print("{}: Warning: susbscribe -> Not enough balance for Token {} and amount {}. Balance is {}".format(
+                self.executor_name,
+                mint,
+                amount,
+                self.balance
+            ))
+            if appconfig.APPMODE in [AppMode.dummy.value, AppMode.simulation.value]:
+                trading_amount = amount
+            else:
+                # TODO: send an alert message to redis notifying having not enough balance
+                print("{}: Sending message notifying that there's not enough balance for trading".format(
+                    self.executor_name
+                ))
+
+        # - move to next step and update the token as being checked
+        # Also closing the token if there's not enough balance for trading
+        token = await redisdb.update_token(
+            token=token,
+            is_checked=True,
+            is_closed=not enough_balance
+        )
+        token["trading_amount"] = trading_amount
+        self.add_update_token(token=token)
+
+        print("Token {}:{} assigned to {} to trade {}Sols".format(
+            token["name"],
+            token["mint"],
+            self.executor_name,
+            trading_amount
+        ))
+        return token
+
+    def compile_roadmap(self, steps: list):
+        """
+        Compiles the criteria of every token trade subscription step once, before trading.
+        :param steps[list]: trade roadmap.
+        :raises ValueError: if a step uses a criteria function that doesn't exist.
+        """
+        self.criteria_evaluators = {
+            step["step"]: CompiledCriteria(criteria=step.get("criteria", {}))
+            for step in steps
+            if step.get("subscription") == Suscription.subscribeTokenTrade
+        }
+
     async def subscribe(self, steps: list):
         step_index = 0
         print("Subscribe is working in {} mode.".format(appconfig.APPMODE))
+        self.compile_roadmap(steps=steps)
 
-        redisdb = RedisDB()
-        await asyncio.sleep(2)  # Wait 2 seconds for the redis connection to start
+        redisdb = await AsyncRedisDB().connect()
 
         # Keepalive main loop
         while not self.stop_app:
@@ -384,7 +516,7 @@ class Pump:
                 # SSL context is required on Mac and not on windows
                 async with websockets.connect(
                     self.uri_data,
-                    ssl=self.ssl_context,
+                    ssl=self.websocket_ssl(),
                     ping_interval=5
                 ) as websocket:
                     # Handle WebSocket communication
@@ -433,6 +565,12 @@ class Pump:
 
                             if step["system_action"] == Celebrimborg.exit:
                                 self.stop_app = True
+                                if self.detection_tasks or self.trading_tasks:
+                                    print("Waiting for {} open positions to be closed before exiting.".format(
+                                        len(self.trading_tasks)
+                                    ))
+                                    await asyncio.gather(*self.detection_tasks, return_exceptions=True)
+                                    await asyncio.gather(*self.trading_tasks, return_exceptions=True)
                                 print("Exiting Celebrimborg as expected after reaching timeout.")
                                 break
 
@@ -442,106 +580,40 @@ class Pump:
                                 if "criteria" in step:
                                     if "delete_unchecked_tokens" in step["criteria"]:
                                         if step["criteria"]["delete_unchecked_tokens"]:
-                                            deletions = redisdb.delete_unchecked_tokens()
+                                            deletions = await redisdb.delete_unchecked_tokens()
                                             print("Deleted unchecked tokens from redis db: {}".format(
                                                 deletions
                                             ))
                                 step_index += 1
                                 continue
 
-                            # Listen to redis change
-                            redisdb.subscribe()
+                            # Wait for tokens handed by the scanners
                             if step["redis"] == Redis.readToken:
-                                for message in redisdb.pubsub.listen():
-                                    if message["type"] == "psubscribe":
-                                        print("Subscribed to redis")
-
-                                    if message["type"] == "pmessage":
-                                        # Parse the message
-                                        key = ":".join(message["channel"].split(":")[1:])
-                                        # Get token information: Take key and retrieve token from redis
-                                        tokens = redisdb.get_fresh_tokens(
-                                            trader=Trader.sniper,
-                                            mint_address=key
-                                        )
-                                        # - Ignore token that are not fresh or for not the current trader type
-                                        if not tokens:
-                                            continue
-                                        # Snipe against many tokens
-                                        how_many = appconfig.TRADING_TOKENS_AT_THE_SAME_TIME
-                                        if len(tokens) < appconfig.TRADING_TOKENS_AT_THE_SAME_TIME:
-                                            how_many = len(tokens)
-
-                                        for token in tokens[0: how_many]:
-                                            mint = token["mint"]
-                                            amount = token["amount"]
-
-                                            # FILTERING BY TOKEN'S CREATION TIME
-                                            token_creation_time = datetime.fromtimestamp(token["timestamp"])
-                                            token_age = (datetime.now() - token_creation_time).total_seconds()
-
-                                            age_tolerance = appconfig.TRADING_TOKEN_TOO_OLD_SECONDS
-                                            if "age_tolerance" in step["criteria"]:
-                                                age_tolerance = step["criteria"]["age_tolerance"]
-
-                                            if token_age >= age_tolerance and appconfig.APPMODE not in [AppMode.dummy.value]:
-                                                print("Warning: susbscribe -> Token {} is too old for trading. Checking it and moving on".format(
-                                                    token["name"]
-                                                ))
-                                                redisdb.update_token(
-                                                    token=token,
-                                                    is_checked=True,
-                                                    is_closed=True
-                                                )
-                                                continue
-
-                                            enough_balance = self.balance >= amount
-                                            # Checking wallet's balance before trading                  
-                                            if enough_balance:
-                                                self.trading_amount = amount
-                                            else:
-                                                # Checking if we are allowed to use all balance
-                                                if "criteria" in step and "use_all_balance" in step["criteria"]:
-                                                    if step["criteria"]["use_all_balance"]:
-                                                        self.trading_amount = self.balance
-                                                        enough_balance = True
-
-                                                print("{}: Warning: susbscribe -> Not enough balance for Token {} and amount {}. Balance is {}".format(
-                                                    self.executor_name,
-                                                    mint,
-                                                    amount,
-                                                    self.balance
-                                                ))
-                                                if appconfig.APPMODE in [AppMode.dummy.value, AppMode.simulation.value]:
-                                                    self.trading_amount = amount
-                                                else:
-                                                    # TODO: send an alert message to redis notifying having not enough balance
-                                                    print("{}: Sending message notifying that there's not enough balance for trading".format(
-                                                        self.executor_name
-                                                    ))
-
-                                            # - move to next step and update the token as being checked
-                                            # Also closing the token if there's not enough balance for trading
-                                            token = redisdb.update_token(
-                                                token=token,
-                                                is_checked=True,
-                                                is_closed=not enough_balance
-                                            )
-                                            self.add_update_token(token=token)
+                                while not self.stop_app:
+                                    # Snipe against many tokens
+                                    tokens = await redisdb.read_tokens(
+                                        trader=Trader.sniper,
+                                        count=appconfig.TRADING_TOKENS_AT_THE_SAME_TIME
+                                    )
+                                    if not tokens:
+                                        continue
 
-                                            print("Token {}:{} assigned to {} to trade {}Sols".format(
-                                                token["name"],
-                                                token["mint"],
-                                                self.executor_name,
-                                                self.trading_amount
-                                            ))
-                                        
-                                        tokens_to_trade = any(token for token in tokens if token["is_checked"])
+                                    for token in tokens:
+                                        token = await self.check_token_for_trading(
+                                            token=token,
+                                            step=step,
+                                            redisdb=redisdb
+                                        )
+                                        if token is not None:
+                                            self.trading_amount = token["trading_amount"]
+                                    await redisdb.ack_tokens(
+                                        trader=Trader.sniper,
+                                        stream_ids=[token["stream_id"] for token in tokens]
+                                    )
 
-                                        # Safely unsubscribing from current channel listening
-                                        if tokens_to_trade:
-                                            redisdb.unsubscribe()
-                                            break
+                                    tokens_to_trade = any(token for token in tokens if token["is_checked"])
+                                    if tokens_to_trade:
+                                        break
 
                                 step_index += 1
                                 continue
@@ -563,14 +635,15 @@ class Pump:
 
                                     print("Attempting to buy token {}".format(mint_address))
             
-                                    txn = self.trade(
+                                    result = await self.trade(
                                         txtype=TxType.buy,
                                         token=mint_address,
                                         keypair=self.keypair,
                                         amount=self.trading_amount
                                     )
+                                    txn = result.signature
 
-                                    if txn is None:
+                                    if not result.ok:
                                         if "on_error_go_to_step" in step:
                                             # Need to point to previous step
                                             step_index = step["on_error_go_to_step"] - 1
@@ -598,7 +671,7 @@ class Pump:
                                     self.tokens[mint_address]["token_balance"] = token_balance
 
                                     # Update token record in redis
-                                    token_updated = redisdb.update_token(
+                                    token_updated = await redisdb.update_token(
                                         token=token_data,
                                         txn=txn,
                                         action=TxType.buy,
@@ -613,18 +686,25 @@ class Pump:
                                 step_index += 1
 
                             if step["action"] == TxType.sell:
-                                for mint_address, token_data in self.tokens.items():
-                                    if token_data["is_closed"]:
-                                        continue
-
-                                    # TODO: If trade_time_delta > tolerance then check if the buy txn has been done
-
-                                    txn = self.trade(
+                                # TODO: If trade_time_delta > tolerance then check if the buy txn has been done
+                                # Tokens are sold at the same time: a sell being retried doesn't hold the others
+                                open_tokens = [
+                                    mint_address for mint_address, token_data in self.tokens.items()
+                                    if not token_data["is_closed"]
+                                ]
+                                results = await asyncio.gather(*[
+                                    self.trade(
                                         txtype=TxType.sell,
                                         token=mint_address,
                                         keypair=self.keypair,
                                         amount=None             # Amount will be handled buy trade function
                                     )
+                                    for mint_address in open_tokens
+                                ])
+
+                                for mint_address, result in zip(open_tokens, results):
+                                    token_data = self.tokens[mint_address]
+                                    txn = result.signature
 
                                     sell_time = datetime.now()
                                     print("Sell {} at {}".format(
@@ -639,7 +719,7 @@ class Pump:
                                         trade_timestamp=buy_time.timestamp()
                                     )
                                     # Update wallet balance after selling
-                                    self.get_balance(public_key=self.keypair.pubkey())
+                                    await self.update_balance()
 
                                     # Get the token balance in wallet
                                     # Note: although we're selling 100% of tokens we might sell a % of tokens
@@ -649,7 +729,7 @@ class Pump:
                                         token_account=mint_address
                                     )
                                     # Update token record in redis
-                                    token_updated = redisdb.update_token(
+                                    token_updated = await redisdb.update_token(
                                         token=token_data,
                                         txn=txn,
                                         action=TxType.sell,
@@ -658,7 +738,7 @@ class Pump:
                                         is_closed=True,
                                         balance=self.balance,
                                         token_balance=token_balance,
-                                        trades=self.tokens[mint_address]["trades"]
+                                        trades=export_trades(self.tokens[mint_address]["trades"])
                                     )
 
                                     # Update token
@@ -666,6 +746,12 @@ class Pump:
 
                                 step_index += 1
 
+                        if "subscription" in step and step["subscription"] == Suscription.blockSubscribe:
+                            # Blocks are streamed from the RPC node: Pump.fun websocket isn't used by this step
+                            await self.block_suscription(step=step)
+                            step_index += 1
+                            continue
+
                         if "subscription" in step:
                             try:
                                 suscription = step["subscription"]
@@ -801,12 +887,129 @@ class Pump:
                 print(f"Unexpected error: {e}. Exiting program abruptly.")
                 break  # Exit on non-recoverable errors
 
-    def new_token_suscription(self, msg: str, step: Dict, redisdb=RedisDB) -> bool:
+    async def run_positions(self, steps: list, max_positions: int = None):
+        """
+        Trades many tokens at the same time following the same roadmap. Every token has its own
+        position in the roadmap and a single websocket connection streams the trades of all of them.
+        :param steps[list]: trade roadmap starting with a Redis.readToken step.
+        :param max_positions[int]: max tokens being traded at the same time.
+        """
+        from bot.module.roadmap import RoadmapExecutor
+
+        print("run_positions is working in {} mode.".format(appconfig.APPMODE))
+        self.compile_roadmap(steps=steps)
+        redisdb = await AsyncRedisDB().connect()
+        websocket = None
+
+        async def send(payload: Dict):
+            if websocket is not None:
+                await websocket.send(json.dumps(payload))
+
+        executor = RoadmapExecutor(
+            pump=self,
+            steps=steps,
+            redisdb=redisdb,
+            send=send,
+            max_positions=max_positions
+        )
+        self.roadmap_executor = executor
+        feeder = asyncio.create_task(self.feed_positions(executor=executor, step=steps[0], redisdb=redisdb))
 
+        try:
+            while not self.stop_app:
+                try:
+                    async with websockets.connect(
+                        self.uri_data,
+                        ssl=self.websocket_ssl(),
+                        ping_interval=5
+                    ) as websocket:
+                        await executor.resubscribe()
+                        while not self.stop_app:
+                            try:
+                                message = await asyncio.wait_for(websocket.recv(), timeout=0.25)
+                                msg = json.loads(message)
+                                if "message" in msg:
+                                    print(msg["message"])
+                                elif "mint" in msg and "txType" in msg:
+                                    executor.dispatch(msg)
+                            except asyncio.TimeoutError:
+                                pass
+                            executor.expire()
+
+                except websockets.exceptions.ConnectionClosedError:
+                    print("Connection lost, reconnecting...")
+                    websocket = None
+                    await asyncio.sleep(5)  # Wait before reconnecting
+                except websockets.exceptions.ConnectionClosedOK:
+                    print("Closing connection as expected")
+                    break
+        finally:
+            feeder.cancel()
+            await executor.close_all()
+            await redisdb.close()
+            print("run_positions -> step latencies: {}".format(executor.histogram.snapshot()))
+            print("run_positions -> criteria stats: {}".format(self.criteria_stats()))
+
+    async def feed_positions(self, executor, step: Dict, redisdb: AsyncRedisDB):
+        """
+        Opens a position for every token handed by the scanners while there're free slots.
+        :param executor[RoadmapExecutor]: executor trading the tokens.
+        :param step[dict]: Redis.readToken step in trade roadmap list of steps.
+        :param redisdb[AsyncRedisDB]: redis connection.
+        """
+        while not self.stop_app:
+            if executor.free_slots <= 0:
+                await asyncio.sleep(appconfig.REDIS_STREAM_BLOCK_SECONDS)
+                continue
+
+            try:
+                # Only as many tokens as free slots are taken. The rest are left for other snipers
+                tokens = await redisdb.read_tokens(
+                    trader=Trader.sniper,
+                    count=executor.free_slots
+                )
+                for token in tokens:
+                    if token["mint"] in executor.positions:
+                        continue
+                    token = await self.check_token_for_trading(
+                        token=token,
+                        step=step,
+                        redisdb=redisdb
+                    )
+                    if token is None:
+                        continue
+                    if token["is_closed"]:
+                        self.tokens.pop(token["mint"], None)
+                        continue
+                    executor.open_position(token)
+                if tokens:
+                    await redisdb.ack_tokens(
+                        trader=Trader.sniper,
+                        stream_ids=[token["stream_id"] for token in tokens]
+                    )
+            except Exception as e:
+                # Unacked tokens are claimed again by read_tokens once they're idle
+                print("feed_positions-> Error: {}. Retrying...".format(e))
+                await asyncio.sleep(appconfig.RETRYING_SECONDS)
+
+    def new_token_suscription(self, msg: str, step: Dict, redisdb: AsyncRedisDB) -> bool:
+        """
+        Evaluates stop criteria for every new token and schedules its detection in background.
+        Detection, buying, holding and selling never block the websocket reading loop.
+        :param msg[dict]: new token message from Pump.fun.
+        :param step[dict]: current step in trade roadmap list of steps.
+        :param redisdb[AsyncRedisDB]: redis connection used to save scanned tokens.
+        :return: move_to_next_step[bool]
+        """
         move_to_next_step = False
 
         if self.scanner_start_time is None:
             self.start_scanner()
+            # Buys will be built with the blockhash and tip accounts refreshed in background
+            blockhash_cache.start()
+            tip_accounts.start()
+            # Confirmations websocket is connected before the first buy
+            signature_subscriptions.start()
 
         # Check if scanner needs to be torned off. scanner_activity_time == -1 -> runs forever.
         if (datetime.now() - self.scanner_start_time).total_seconds() >= self.scanner_activity_time and \
@@ -814,13 +1017,128 @@ class Pump:
             move_to_next_step = True
             return move_to_next_step
 
-        if self.trade_counter >= self.max_trades:
+        # Open positions are already counted as trades
+        if self.trade_counter >= self.max_trades and self.max_trades != -1:
             self.add_update_token(token=msg)
             print("Max trades reached: {}".format(self.trade_counter))
             self.tokens[msg["mint"]]["exit_criteria"] = "MAX_TRADES_REACHED"
             move_to_next_step = True
             return move_to_next_step
 
+        # New tokens are only worth a few seconds: we skip them instead of queueing when we're busy
+        if len(self.detection_tasks) >= appconfig.SCANNER_MAX_CONCURRENT_DETECTIONS:
+            print("** Skipping {}: {} tokens are already being checked".format(
+                msg["mint"],
+                len(self.detection_tasks)
+            ))
+            return move_to_next_step
+
+        self.run_in_background(
+            coroutine=self.detect_token(msg=msg, step=step, redisdb=redisdb),
+            tasks=self.detection_tasks
+        )
+        return move_to_next_step
+
+    def run_in_background(self, coroutine, tasks: set) -> asyncio.Task:
+        """
+        Schedules a coroutine as an independent task and keeps a reference to it until it's done
+        :param coroutine: coroutine to be scheduled in the running event loop.
+        :param tasks[set]: set of tasks the new task belongs to.
+        :return: the scheduled task.
+        """
+        task = asyncio.create_task(coroutine)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def open_scanned_position(self, token_data: Dict) -> bool:
+        """
+        Trades a scanned token in background unless max trades or max open positions were reached
+        :param token_data[dict]: token decoded from its creation block.
+        :return: True if the position was opened.
+        """
+        # Max trades might have been reached by other positions while we were scanning
+        if self.trade_counter >= self.max_trades and self.max_trades != -1:
+            print("** Skipping {}: max trades reached".format(token_data["mint"]))
+            return False
+
+        if len(self.trading_tasks) >= self.tokens_to_be_traded:
+            print("** Skipping {}: {} positions are already open".format(
+                token_data["mint"],
+                len(self.trading_tasks)
+            ))
+            return False
+
+        # Curve after the buys in its creation block
+        bonding_curves.update_from_block(token_data)
+        # The trade is counted when the position is opened and released by trade_position if the buy fails
+        self.trade_counter += 1
+        self.run_in_background(
+            coroutine=self.trade_position(token_data=token_data),
+            tasks=self.trading_tasks
+        )
+        return True
+
+    async def block_suscription(self, step: Dict, blocks: AsyncIterator[Dict] = None) -> None:
+        """
+        Scanner fed by blockSubscribe: every block brings the tokens created in it together with
+        their first buyers, so tokens are checked without fetching their creation block.
+        Returns when the scanner activity time is over or max trades were reached.
+        :param step[dict]: current step in trade roadmap list of steps.
+        :param blocks: decoded blocks source. stream_pump_blocks by default.
+        """
+        if self.scanner_start_time is None:
+            self.start_scanner()
+            # Buys will be built with the blockhash and tip accounts refreshed in background
+            blockhash_cache.start()
+            tip_accounts.start()
+            # Confirmations websocket is connected before the first buy
+            signature_subscriptions.start()
+
+        criteria = step.get("criteria", {})
+        threshold = criteria.get("threshold", appconfig.SCANNER_THRESHOLD)
+        min_scam_buyers = criteria.get("min_scam_buyers", appconfig.SCANNER_MIN_SCAM_BUYERS)
+
+        if blocks is None:
+            blocks = stream_pump_blocks()
+        try:
+            async for token_data in blocks:
+                # Check if scanner needs to be torned off. scanner_activity_time == -1 -> runs forever.
+                if (datetime.now() - self.scanner_start_time).total_seconds() >= self.scanner_activity_time and \
+                        self.scanner_activity_time != -1:
+                    return
+
+                if self.trade_counter >= self.max_trades and self.max_trades != -1:
+                    print("Max trades reached: {}".format(self.trade_counter))
+                    return
+
+                if not token_data:
+                    continue
+
+                tradable_tokens = select_tradable_tokens(
+                    token_data=token_data,
+                    threshold=threshold,
+                    min_scam_buyers=min_scam_buyers
+                )
+                for tradable_token in tradable_tokens:
+                    self.open_scanned_position(token_data=tradable_token)
+        finally:
+            await blocks.aclose()
+
+    async def detect_token(self, msg: Dict, step: Dict, redisdb: AsyncRedisDB) -> None:
+        """
+        Retrieves the creation block of a new token, checks if it's a scam token and
+        opens a position on it when it's tradable.
+        :param msg[dict]: new token message from Pump.fun.
+        :param step[dict]: current step in trade roadmap list of steps.
+        :param redisdb[AsyncRedisDB]: redis connection used to save scanned tokens.
+        """
+        try:
+            await self._detect_token(msg=msg, step=step, redisdb=redisdb)
+        except Exception as e:
+            print("detect_token-> Error checking token {}: {}".format(msg.get("mint"), e))
+
+    async def _detect_token(self, msg: Dict, step: Dict, redisdb: AsyncRedisDB) -> None:
         min_initial_buy = self.min_initial_buy
         if "min_initial_buy" in step["criteria"]:
             min_initial_buy = step["criteria"]["min_initial_buy"]
@@ -846,25 +1164,13 @@ class Pump:
         #         initial_buy_sols,
         #         min_initial_buy
         #     ))
-        #     move_to_next_step = False
-        #     return move_to_next_step
-
+        #     return
 
         # TODO: retrieve block and check if this is a scamm token
-        from bot.libs.solana_functions import get_block_by_signature
-        from bot.libs.utils import get_token_data_from_block
-        from bot.libs.pump_buy import (
-            calculate_pump_curve_price_local,
-            buy_token,
-            sell_token
-        )
-        import asyncio
-
-        block = asyncio.run(get_block_by_signature(signature_str=msg["signature"]))
+        block = await get_block_by_signature(signature_str=msg["signature"])
 
         if block is None:
-            move_to_next_step = False
-            return move_to_next_step
+            return
 
         # Checking if the block is two old (fetching blocks produces a delay over time)
         block_time = datetime.fromtimestamp(block.value.block_time)
@@ -873,8 +1179,7 @@ class Pump:
             # Block is too old and trade will be halted for X new token received.
             print("Block age is {}".format(block_age))
             self.halt_trade = int(block_age / 5) + 1
-            move_to_next_step = False
-            return move_to_next_step
+            return
 
         threshold = appconfig.SCANNER_THRESHOLD
         if "threshold" in step["criteria"]:
@@ -888,86 +1193,29 @@ class Pump:
             min_scam_buyers=min_scam_buyers
         )
         if not token_data_list:
-            # if initial_buy_sols < min_initial_buy:
-            #     print("Discarting token {}: initial buy {} is lower than expected {}".format(
-            #         msg["mint"],
-            #         initial_buy_sols,
-            #         min_initial_buy
-            #     ))
-            move_to_next_step = False
-            return move_to_next_step
+            return
 
         token_data = token_data_list[0]  # Note: As we're trading only one token at the time
 
-        # Buy token immediately
-        mint = Pubkey.from_string(token_data['mint'])
-        bonding_curve = Pubkey.from_string(token_data['bondingCurve'])
-        associated_bonding_curve = Pubkey.from_string(token_data['associatedBondingCurve'])
+        if not self.open_scanned_position(token_data=token_data):
+            return
         crator_vault = Pubkey.from_string(token_data['buyers'][0]['creator_vault'])
 
-        token_price_sol_local = calculate_pump_curve_price_local(token_data=token_data)
-
-        buy_tx_hash, confirmation_stamp, token_amount = asyncio.run(
-            buy_token(
-                mint=mint,
-                bonding_curve=bonding_curve,
-                associated_bonding_curve=associated_bonding_curve,
-                amount=appconfig.TRADING_DEFAULT_AMOUNT,
-                slippage=appconfig.BUY_SLIPPAGE,
-                token_price_sol_local=token_price_sol_local,
-                crator_vault=crator_vault
-            )
-        )
-        if buy_tx_hash:
-            self.trade_counter += 1
-            print("Trade #{}:  https://pump.fun/coin/{}".format(self.trade_counter, mint))
-            print("** Token amount local: {}".format(token_price_sol_local))
-            print("** Bought {:.6f} SOL worth of the new token with {:.1f}% slippage tolerance...".format(
-                appconfig.TRADING_DEFAULT_AMOUNT,
-                appconfig.BUY_SLIPPAGE * 100
-            ))
-        else:
-            print("** Failed to buy {}. Looking for another new token".format(mint))
-            move_to_next_step = True
-            return move_to_next_step
-
-        # ###############################################
-        # MVP: awaiting and selling here at scanner level
-        time_delta = abs(confirmation_stamp - token_data["blockTime"])
-        sleep_time = 0 if appconfig.TRADING_TIME - time_delta < 0 else appconfig.TRADING_TIME - time_delta
-
-        print("Trading-> Sleeping for {} seconds".format(sleep_time))
-        time.sleep(sleep_time)
-
-        # Sell
-        print("Sell-> Time to sell it all")
-        _ = asyncio.run(
-            sell_token(
-                mint=mint,
-                token_balance=token_amount,
-                bonding_curve=bonding_curve,
-                associated_bonding_curve=associated_bonding_curve,
-                crator_vault=crator_vault,
-                slippage=appconfig.BUY_SLIPPAGE
-            )
-        )
-
         initial_buy_sols = 0  # Forcing not to write to redis
-        print("\n")
         # ###############################################
 
         if initial_buy_sols >= min_initial_buy:
             if "action" in step and "redis" in step["action"]:
                 if step["action"]["redis"] == Redis.saveToken:
                     # Read if there's any unchecked token based on reading capacity
-                    tokens = redisdb.get_fresh_tokens(
+                    tokens = await redisdb.get_fresh_tokens(
                         trader=Trader.sniper
                     )
 
                     unchecked_tokens = [token for token in tokens if not token["is_checked"]]
                     # capacity reached: no more tokens will be added to redis
                     if len(unchecked_tokens) >= capacity:
-                        return move_to_next_step
+                        return
                     # Scanner has capacity to add more tokens to readis
                     for _ in range(capacity - len(unchecked_tokens)):
                         # Rule of thumb: never buy more than the token's initial buy
@@ -997,10 +1245,71 @@ class Pump:
                             token_data["mint"],
                             initial_buy_sols
                         ))
-                        redisdb.set_token(token=msg["mint"], token_data=token_data)
+                        await redisdb.set_token(token=msg["mint"], token_data=token_data)
 
         # TODO: relase tokens to snipers with redis recods. At this moment we're listening to one token only
-        return move_to_next_step
+
+    async def trade_position(self, token_data: Dict) -> None:
+        """
+        Buys a scanned token, holds it until appconfig.TRADING_TIME seconds have passed
+        since its creation block and sells it all.
+        :param token_data[dict]: token decoded from its creation block by get_token_data_from_block.
+        """
+        bought = False
+        try:
+            mint = Pubkey.from_string(token_data['mint'])
+            bonding_curve = Pubkey.from_string(token_data['bondingCurve'])
+            associated_bonding_curve = Pubkey.from_string(token_data['associatedBondingCurve'])
+            crator_vault = Pubkey.from_string(token_data['buyers'][0]['creator_vault'])
+
+            token_price_sol_local = calculate_pump_curve_price_local(token_data=token_data)
+
+            buy_tx_hash, confirmation_stamp, token_amount = await buy_token(
+                mint=mint,
+                bonding_curve=bonding_curve,
+                associated_bonding_curve=associated_bonding_curve,
+                amount=appconfig.TRADING_DEFAULT_AMOUNT,
+                slippage=appconfig.BUY_SLIPPAGE,
+                crator_vault=crator_vault
+            )
+            if not buy_tx_hash:
+                print("** Failed to buy {}. Looking for another new token".format(mint))
+                return
+            bought = True
+
+            print("Trade #{}:  https://pump.fun/coin/{}".format(self.trade_counter, mint))
+            print("** Token price local: {}".format(token_price_sol_local))
+            print("** Bought {:.6f} SOL worth of the new token with {:.1f}% slippage tolerance...".format(
+                appconfig.TRADING_DEFAULT_AMOUNT,
+                appconfig.BUY_SLIPPAGE * 100
+            ))
+
+            # Holding the position without blocking the event loop
+            time_delta = abs(confirmation_stamp - token_data["blockTime"])
+            sleep_time = 0 if appconfig.TRADING_TIME - time_delta < 0 else appconfig.TRADING_TIME - time_delta
+
+            print("Trading-> Holding {} for {} seconds".format(mint, sleep_time))
+            await asyncio.sleep(sleep_time)
+
+            # Sell
+            print("Sell-> Time to sell it all")
+            await sell_token(
+                mint=mint,
+                token_balance=token_amount,
+                bonding_curve=bonding_curve,
+                associated_bonding_curve=associated_bonding_curve,
+                crator_vault=crator_vault,
+                slippage=appconfig.BUY_SLIPPAGE
+            )
+            print("\n")
+        except Exception as e:
+            print("trade_position-> Error trading token {}: {}".format(token_data.get("mint"), e))
+        finally:
+            # Trade counted by open_scanned_position is released when the buy didn't go through
+            if not bought:
+                self.trade_counter -= 1
+            # Mirrored curve isn't needed once the position is closed
+            bonding_curves.remove(token_data.get("mint"))
 
     def token_trade_subscription(self, token: dict,  msg: dict, step: dict) -> tuple[bool, str]:
         """
@@ -1025,56 +1334,59 @@ class Pump:
                 current_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
                 print("  First trade received at: {}".format(current_time))
 
+        # Every trade carries the curve reserves: selling won't need to fetch the bonding curve
+        bonding_curves.update_from_trade(msg)
+
         # Doing some analytics like how many continuous buys have happend, etc
-        new_msg = trading_analytics(
+        # The rolling state keeps the last trades so every trade costs the same
+        state = self.trade_states.get(token["mint"])
+        if state is None:
+            state = TokenTradeState.from_trades(
+                previous_trades=token.get("trades", []),
+                pubkey=self.keypair.pubkey()
+            )
+            self.trade_states[token["mint"]] = state
+
+        new_msg = state.update(
             msg=msg,
-            previous_trades=token["trades"],
-            amount_traded=self.trading_amount,
-            pubkey=self.keypair.pubkey(),
+            amount_traded=token.get("trading_amount", self.trading_amount),
             traders=traders,
             token_timestamps=time_stamps
         )
         # Including last message with new metadata into trades list
-        if not token["trades"]:
-            token["trades"] = [new_msg]
-        else:
-            token["trades"].append(new_msg)
+        token["trades"] = state.trades
         self.add_update_token(token=token)
 
+        criteria = self.criteria_evaluators.get(step["step"])
+        if criteria is None:
+            criteria = self.criteria_evaluators[step["step"]] = CompiledCriteria(criteria=step["criteria"])
+
         move_to_next_step, criteria = self.validate_criteria(
             msg=new_msg,
-            amount_traded=self.trading_amount,
-            criteria=step["criteria"]
+            amount_traded=token.get("trading_amount", self.trading_amount),
+            criteria=criteria
         )
         return move_to_next_step, criteria
 
-    def validate_criteria(self, msg: Dict, amount_traded: float, criteria: Dict) -> bool:
+    def validate_criteria(self, msg: Dict, amount_traded: float, criteria: CompiledCriteria | Dict) -> bool:
         """
         This function takes the incomming trading message from Pump.fun previouly
         trated by trading_analytics function and apply all criteria functions for the
         current step.
         :param msg: message from Pump.fun when listening to trading tokens and modified by trading_analytics funciton.
-        :param criteria: list of functions and values for evaluation on exiting or not the trading position.
+        :param criteria: compiled criteria or the list of functions and values for evaluation on exiting or not
+            the trading position.
         :return: is_valid[True|False] and the function name as an exit_criteria .
         """
-        is_valid = False
-        exit_criteria = None
-        for function_name, parameter in criteria.items():
-            # Dynamically get the function reference
-            function = getattr(criteria_functions, function_name, None)
-            if callable(function):
-                # Call the function with the parameter and msg
-                is_valid = function(parameter, msg, amount_traded)
-                # print(f"validate_criteria-> Function {function_name} returned: {is_valid}")
-            else:
-                if appconfig.APPMODE in [AppMode.dummy.value and AppMode.simulation.value]:
-                    print(f"validate_criteria-> WARNING: {function_name} function was not found.")
-
-            if is_valid:
-                exit_criteria = function_name
-                break
+        if not isinstance(criteria, CompiledCriteria):
+            criteria = CompiledCriteria(criteria=criteria)
+        return criteria(msg=msg, amount_traded=amount_traded)
 
-        return is_valid, exit_criteria
+    def criteria_stats(self) -> Dict:
+        """
+        :return: calls, hits and seconds spent by every criteria per roadmap step number
+        """
+        return {step: criteria.stats() for step, criteria in self.criteria_evaluators.items()}
 
     def prepare_data(
         self,
@@ -1104,13 +1416,15 @@ class Pump:
 
         return data
 
-    def trade(self, txtype: TxType, token: str, keypair: Keypair, amount: float = None) -> str:
+    async def trade(self, txtype: TxType, token: str, keypair: Keypair, amount: float = None) -> TradeResult:
         """
             This function allows to BUY or SELL tokens.
             When BUYING
             - Amount of SOLs must be specified.
             When selling, we sell tokens and not solanas.
             For this MVP version, we're selling 100% of tokens.
+            Sells are retried with backoff until TRADING_RETRIES or TRADING_DEADLINE_SECONDS is reached,
+            without blocking the event loop.
 
             Parameters:
                 tx_type (TxType): The type of transaction (e.g., buy, sell, transfer).
@@ -1119,10 +1433,8 @@ class Pump:
                 keypair (Keypair): The user's Solana keypair for signing the transaction.
 
             Returns:
-                str: The transaction signature or identifier.
+                TradeResult: status, transaction signature, attempts and error of the trade.
         """
-        txSignature = None
-
         # Increase fees validation
         if "exit_criteria" in self.tokens[token]:
             if self.tokens[token]["exit_criteria"] == "validate_trade_timedelta_exceeded":
@@ -1136,117 +1448,7 @@ class Pump:
             amount=amount
         )
 
-        response = None
-        retries = 0
-        while True:
-            # Faking transaction for none real modes
-            if appconfig.APPMODE not in [AppMode.real.value]:
-                current_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
-                print("simulate trade -> {} MODE: returning dummy transaction at {}".format(
-                    appconfig.APPMODE,
-                    current_time
-                ))
-                txSignature = "txn_dummy_{}".format(txtype.value)
-                break
-
-            if retries == appconfig.TRADING_RETRIES and txtype.value == TxType.sell.value:
-                # TODO: send a telegram message notifying that a manual sell must be done
-                print("Trade->{} Error: Max retries reached. Exiting".format(txtype.value))
-                break
-
-            try:
-                response = requests.post(
-                    url=appconfig.PUMPFUN_TRANSACTION_URL,
-                    data=data
-                )
-                if response.status_code != 200:
-                    if txtype.value == TxType.buy.value:
-                        print("Trade->{} Failed getting quote. Exiting trade function. Error: {} returned a status code {}.  Response: {}".format(
-                            txtype.value,
-                            appconfig.PUMPFUN_TRANSACTION_URL,
-                            response.status_code,
-                            response
-                        ))
-                        break
-
-                    retries += 1
-
-                    print("Trade->{} Error: {} returned a status code {}. Retrying again {} times. Response: {}".format(
-                        txtype.value,
-                        appconfig.PUMPFUN_TRANSACTION_URL,
-                        response.status_code,
-                        retries,
-                        response
-                    ))
-                    time.sleep(appconfig.RETRYING_SECONDS)
-                    continue
-            except Exception as e:
-                if txtype.value == TxType.buy.value:
-                    print("Trade->{} Exception: {}. Exiting trade function. Message: {}".format(
-                        txtype.value,
-                        appconfig.PUMPFUN_TRANSACTION_URL,
-                        e
-                    ))
-                    break
-
-                retries += 1
-                print("Trade->{} Exception: {}. Retrying again {} times. Message: {}".format(
-                    txtype.value,
-                    appconfig.PUMPFUN_TRANSACTION_URL,
-                    retries,
-                    e
-                ))
-                time.sleep(appconfig.RETRYING_SECONDS)
-                continue
-
-            vst = VersionedTransaction.from_bytes(response.content)
-            msg = vst.message
-
-            tx = VersionedTransaction(
-                msg,
-                [keypair]
-            )
-
-            config = RpcSendTransactionConfig(
-                preflight_commitment=CommitmentLevel.Confirmed,
-                skip_preflight=True
-            )
-            txPayload = SendVersionedTransaction(tx, config)
-
-            try:
-                response = requests.post(
-                    url=appconfig.JITO_RPC_URL,
-                    headers={"Content-Type": "application/json"},
-                    data=txPayload.to_json()
-                )
-
-                current_time = datetime.now().strftime(appconfig.TIME_FORMAT).lower()
-
-                txSignature = response.json()['result']
-                print("Trade->{} Transaction: https://solscan.io/tx/{} at {}".format(
-                    txtype.value,
-                    txSignature,
-                    current_time
-                ))
-                break
-
-            except Exception:
-                retries += 1
-                if txtype.value == TxType.buy.value:
-                    print("Trade->{} Transaction failed. Exiting trade function. Error: {}".format(
-                        txtype.value,
-                        response.json()["error"]["message"]
-                    ))
-                    break
-                print("Trade->{} Transaction failed. Retrying again {} times: {}".format(
-                    txtype.value,
-                    retries,
-                    response.json()["error"]["message"]
-                ))
-
-                time.sleep(appconfig.RETRYING_SECONDS)
-
-        return txSignature
+        return await trade_executor.execute(data=data, keypair=keypair, txtype=txtype, mint=token)
 
     def nuke(self, token: str, keypair: Keypair, amount: float = appconfig.TRADING_DEFAULT_AMOUNT) -> List[str]:
         import base58
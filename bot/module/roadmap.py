@@ -0,0 +1,342 @@
+import asyncio
+import bisect
+import time
+
+from bot.config import appconfig
+from bot.libs.criterias import export_trades
+from bot.libs.utils import TxType
+from bot.module.pump import Suscription, Redis
+
+from datetime import datetime
+from typing import Callable, Dict
+
+
+class StepLatencyHistogram:
+    """
+    Fixed buckets histogram of the seconds positions spend in every roadmap step.
+    Memory doesn't grow with the amount of positions being traded.
+    """
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    def __init__(self):
+        self.counts = {}
+        self.totals = {}
+
+    def observe(self, step: str, seconds: float):
+        counts = self.counts.get(step)
+        if counts is None:
+            # Last bucket holds everything above the greatest limit
+            counts = self.counts[step] = [0] * (len(self.BUCKETS) + 1)
+            self.totals[step] = 0.0
+        counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.totals[step] += seconds
+
+    def snapshot(self) -> Dict:
+        """
+        :return: per step dictionary with the amount of observations in every bucket, how many and total seconds
+        """
+        limits = [str(limit) for limit in self.BUCKETS] + ["inf"]
+        return {
+            step: {
+                "buckets": dict(zip(limits, counts)),
+                "count": sum(counts),
+                "sum": round(self.totals[step], 6)
+            }
+            for step, counts in self.counts.items()
+        }
+
+
+class TokenPosition:
+    """
+    Where a token is in the roadmap. Trades and exit criteria stay in Pump.tokens.
+    """
+    __slots__ = ("mint", "step_index", "step_started_at", "deadline", "is_busy")
+
+    def __init__(self, mint: str, step_index: int):
+        self.mint = mint
+        self.step_index = step_index
+        self.step_started_at = time.monotonic()
+        self.deadline = None    # monotonic time when a subscription or a wait step expires
+        self.is_busy = False    # True while its steps are being run in background
+
+
+class RoadmapExecutor:
+    """
+    Runs the same trade roadmap for many tokens at the same time.
+    Every token has its own position moving through the steps while a single
+    websocket stream of trades is dispatched to them by mint address.
+    """
+
+    def __init__(self, pump, steps: list, redisdb, send: Callable, max_positions: int = None):
+        """
+        :param pump[Pump]: object owning the wallet and the tokens being traded.
+        :param steps[list]: trade roadmap. First step is expected to be a Redis.readToken step.
+        :param redisdb[AsyncRedisDB]: redis connection used to update traded tokens.
+        :param send[Callable]: coroutine function sending a payload to the trading websocket.
+        :param max_positions[int]: max tokens being traded at the same time.
+        """
+        self.pump = pump
+        self.steps = steps
+        self.redisdb = redisdb
+        self.send = send
+        self.max_positions = max_positions or appconfig.TRADING_TOKENS_AT_THE_SAME_TIME
+        self.positions: Dict[str, TokenPosition] = {}
+        self.tasks = set()
+        self.histogram = StepLatencyHistogram()
+        self.first_step = 1 if steps and steps[0].get("redis") == Redis.readToken else 0
+
+    @property
+    def free_slots(self) -> int:
+        return self.max_positions - len(self.positions)
+
+    def step_key(self, step_index: int) -> str:
+        return "{}:{}".format(step_index, self.steps[step_index]["name"])
+
+    def open_position(self, token: Dict) -> bool:
+        """
+        Starts trading a token already checked and stored in Pump.tokens.
+        :return: False if the token is already being traded or there're no free slots.
+        """
+        mint = token["mint"]
+        if mint in self.positions or self.free_slots <= 0:
+            return False
+
+        position = TokenPosition(mint=mint, step_index=self.first_step)
+        self.positions[mint] = position
+        self.schedule(position)
+        return True
+
+    def schedule(self, position: TokenPosition):
+        position.is_busy = True
+        task = asyncio.create_task(self.advance(position))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def move(self, position: TokenPosition, step_index: int):
+        now = time.monotonic()
+        self.histogram.observe(self.step_key(position.step_index), now - position.step_started_at)
+        position.step_index = step_index
+        position.step_started_at = now
+        position.deadline = None
+
+    def close(self, position: TokenPosition):
+        if position.step_index < len(self.steps):
+            self.histogram.observe(self.step_key(position.step_index), time.monotonic() - position.step_started_at)
+        self.positions.pop(position.mint, None)
+        if position.mint in self.pump.tokens:
+            self.pump.remove_token(token=self.pump.tokens[position.mint])
+
+    async def advance(self, position: TokenPosition):
+        """
+        Runs the position's steps until it has to wait for trades or for a timer, or the roadmap ends.
+        """
+        try:
+            while position.step_index < len(self.steps):
+                next_step = await self.run_step(position=position, step=self.steps[position.step_index])
+                if next_step is None:
+                    return
+                self.move(position=position, step_index=next_step)
+            self.close(position)
+        except Exception as e:
+            print("RoadmapExecutor -> Error running step {} for token {}: {}".format(
+                position.step_index,
+                position.mint,
+                e
+            ))
+            self.close(position)
+        finally:
+            position.is_busy = False
+
+    async def run_step(self, position: TokenPosition, step: Dict) -> int:
+        """
+        :return: index of the next step or None when the position has to wait.
+        """
+        mint = position.mint
+        next_step = position.step_index + 1
+
+        if "redis" in step:
+            if step["redis"] == Redis.closeToken:
+                return len(self.steps)
+            return next_step
+
+        if "action" in step:
+            token = self.pump.tokens[mint]
+            if token["is_closed"]:
+                return next_step
+
+            if step["action"] == TxType.buy:
+                return await self.buy(token=token, step=step, next_step=next_step)
+            if step["action"] == TxType.sell:
+                return await self.sell(token=token, step=step, next_step=next_step)
+            return next_step
+
+        if "subscription" in step:
+            payload = {"method": step["subscription"].value, "keys": [mint]}
+            await self.send(payload)
+            if step["subscription"] == Suscription.subscribeTokenTrade:
+                position.deadline = time.monotonic() + self.subscription_timeout(step)
+                return None
+            return next_step
+
+        if "WAITING_SECONDS" in step:
+            position.deadline = time.monotonic() + step["WAITING_SECONDS"]
+            return None
+
+        return next_step
+
+    async def buy(self, token: Dict, step: Dict, next_step: int) -> int:
+        mint = token["mint"]
+        amount = token.get("trading_amount", self.pump.trading_amount)
+        result = await self.pump.trade(
+            txtype=TxType.buy,
+            token=mint,
+            keypair=self.pump.keypair,
+            amount=amount
+        )
+        txn = result.signature
+        if not result.ok:
+            return step.get("on_error_go_to_step", next_step)
+
+        buy_time = datetime.now()
+        print("Buy https://pump.fun/coin/{} at {}".format(
+            mint,
+            buy_time.strftime(appconfig.TIME_FORMAT).lower()
+        ))
+        self.pump.log_trade_token_timestamp(mint=mint, txtype=TxType.buy, trade_timestamp=buy_time.timestamp())
+
+        token_balance = self.pump.get_tkn_balance(wallet_pubkey=self.pump.keypair.pubkey(), token_account=mint)
+        token["token_balance"] = token_balance
+        token_updated = await self.redisdb.update_token(
+            token=token,
+            txn=txn,
+            action=TxType.buy,
+            amount=amount,
+            trader=self.pump.trader_type,
+            balance=self.pump.balance,
+            token_balance=token_balance
+        )
+        self.pump.add_update_token(token=token_updated)
+        return next_step
+
+    async def sell(self, token: Dict, step: Dict, next_step: int) -> int:
+        mint = token["mint"]
+        result = await self.pump.trade(
+            txtype=TxType.sell,
+            token=mint,
+            keypair=self.pump.keypair,
+            amount=None     # Amount will be handled by trade function
+        )
+        txn = result.signature
+        if not result.ok and "on_error_go_to_step" in step:
+            return step["on_error_go_to_step"]
+
+        sell_time = datetime.now()
+        print("Sell https://pump.fun/coin/{} at {}".format(
+            mint,
+            sell_time.strftime(appconfig.TIME_FORMAT).lower()
+        ))
+        self.pump.log_trade_token_timestamp(mint=mint, txtype=TxType.sell, trade_timestamp=sell_time.timestamp())
+        await self.pump.update_balance()
+
+        token_balance = self.pump.get_tkn_balance(wallet_pubkey=self.pump.keypair.pubkey(), token_account=mint)
+        token_updated = await self.redisdb.update_token(
+            token=token,
+            txn=txn,
+            action=TxType.sell,
+            amount=token.get("trading_amount", self.pump.trading_amount),
+            trader=self.pump.trader_type,
+            is_closed=True,
+            balance=self.pump.balance,
+            token_balance=token_balance,
+            trades=export_trades(token["trades"])
+        )
+        self.pump.add_update_token(token=token_updated)
+        return next_step
+
+    @staticmethod
+    def subscription_timeout(step: Dict) -> float:
+        websocket_timeout = appconfig.TRADING_MARKETING_INACTIVITY_TIMEOUT
+        if "criteria" in step:
+            if "market_inactivity" in step["criteria"]:
+                websocket_timeout = step["criteria"]["market_inactivity"]
+            if "discard_market_inactivity" in step["criteria"]:
+                websocket_timeout = step["criteria"]["discard_market_inactivity"]
+        return websocket_timeout
+
+    def exit_subscription(self, position: TokenPosition, step: Dict, exit_criteria: str):
+        next_step = position.step_index + 1
+        if exit_criteria and "discard_" in exit_criteria and "on_discard_token_go_to_step" in step:
+            next_step = step["on_discard_token_go_to_step"]
+
+        print("{}: exiting subscription criteria: {} at {}".format(
+            position.mint,
+            exit_criteria,
+            datetime.now().strftime(appconfig.TIME_FORMAT).lower()
+        ))
+        self.move(position=position, step_index=next_step)
+        self.schedule(position)
+
+    def dispatch(self, msg: Dict):
+        """
+        Routes a token trade from the websocket to the position waiting for it.
+        Trades for tokens not being traded or whose steps are running are ignored.
+        """
+        position = self.positions.get(msg.get("mint"))
+        if position is None or position.is_busy:
+            return
+
+        step = self.steps[position.step_index]
+        if step.get("subscription") != Suscription.subscribeTokenTrade:
+            return
+
+        token = self.pump.tokens[position.mint]
+        if token["is_closed"]:
+            return
+
+        # Key point: need to copy the token
+        move_to_next_step, exit_criteria = self.pump.token_trade_subscription(
+            token=token.copy(),
+            msg=msg,
+            step=step
+        )
+        self.pump.tokens[position.mint]["exit_criteria"] = exit_criteria
+        # Inactivity is measured since the last trade
+        position.deadline = time.monotonic() + self.subscription_timeout(step)
+
+        if move_to_next_step:
+            self.exit_subscription(position=position, step=step, exit_criteria=exit_criteria)
+
+    def expire(self):
+        """
+        Moves on positions whose market inactivity or waiting time is over.
+        """
+        now = time.monotonic()
+        for position in list(self.positions.values()):
+            if position.is_busy or position.deadline is None or position.deadline > now:
+                continue
+
+            step = self.steps[position.step_index]
+            if "subscription" in step:
+                exit_criteria = "market_inactivity"
+                if "discard_market_inactivity" in step.get("criteria", {}):
+                    exit_criteria = "discard_market_inactivity"
+                if position.mint in self.pump.tokens:
+                    self.pump.tokens[position.mint]["exit_criteria"] = exit_criteria
+                self.exit_subscription(position=position, step=step, exit_criteria=exit_criteria)
+            else:
+                self.move(position=position, step_index=position.step_index + 1)
+                self.schedule(position)
+
+    async def resubscribe(self):
+        """
+        Subscribes again to the trades of the tokens being traded after reconnecting the websocket
+        """
+        mints = [
+            mint for mint, position in self.positions.items()
+            if self.steps[position.step_index].get("subscription") == Suscription.subscribeTokenTrade
+        ]
+        if mints:
+            await self.send({"method": Suscription.subscribeTokenTrade.value, "keys": mints})
+
+    async def close_all(self):
+        await asyncio.gather(*self.tasks, return_exceptions=True)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from solders.hash import Hash
+
+from bot.domain.blockhash_cache import BlockhashCache, CachedBlockhash
+
+
+class FakeBlockhashCache(BlockhashCache):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fetches = 0
+
+    async def fetch(self) -> CachedBlockhash:
+        self.fetches += 1
+        return CachedBlockhash(
+            blockhash=Hash.new_unique(),
+            last_valid_block_height=1_000 + self.fetches,
+            slot=900 + self.fetches,
+            fetched_at=time.monotonic()
+        )
+
+
+def test_blockhash_cache():
+    cache = FakeBlockhashCache(refresh_seconds=0.01, max_age_seconds=5)
+    assert cache.current() is None
+
+    async def run():
+        first = await cache.latest()
+        # Cold cache: the first blockhash is fetched right away
+        assert first.last_valid_block_height >= 1_001
+        await asyncio.sleep(0.05)
+        assert cache.is_running
+        latest = cache.current()
+        assert latest.last_valid_block_height > first.last_valid_block_height
+        fetches = cache.fetches
+        assert (await cache.latest()).blockhash == cache.current().blockhash
+        await cache.stop()
+        assert not cache.is_running
+        return fetches
+
+    fetches = asyncio.run(run())
+    assert fetches >= 3
+
+    # Stale blockhashes aren't handed out
+    cache.cached = cache.cached._replace(fetched_at=time.monotonic() - 10)
+    assert cache.current() is None
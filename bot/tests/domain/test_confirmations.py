@@ -0,0 +1,70 @@
+import asyncio
+
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from types import SimpleNamespace
+
+from bot.domain.confirmations import SignatureStatusPoller
+
+
+class FakePoller(SignatureStatusPoller):
+    def __init__(self, statuses=None, **kwargs):
+        """
+        :param statuses[list]: confirmation status returned by each poll, None while not found.
+        """
+        super().__init__(min_interval=0.005, max_interval=0.02, **kwargs)
+        self.statuses = list(statuses or [])
+        self.calls = []
+        self.intervals = []
+
+    async def fetch(self, signatures):
+        self.calls.append(list(signatures))
+        self.intervals.append(self.interval)
+        # Chunks of the same tick get the same answer
+        confirmation_status = self.statuses[min(self.polls, len(self.statuses) - 1)] if self.statuses else None
+        if confirmation_status is None:
+            return [None] * len(signatures)
+        return [SimpleNamespace(slot=100, err=None, confirmation_status=confirmation_status) for _ in signatures]
+
+
+def test_signature_poller():
+    poller = FakePoller(statuses=[None, TransactionConfirmationStatus.Confirmed])
+    signatures = [Signature.new_unique() for _ in range(600)]
+
+    async def run():
+        futures = [poller.watch(signature) for signature in signatures]
+        return await asyncio.gather(*futures)
+
+    statuses = asyncio.run(run())
+    assert [status.signature for status in statuses] == signatures
+    assert all(status.ok and status.slot == 100 for status in statuses)
+    # Every pending signature is checked on each tick, 256 at most per request
+    assert poller.polls == 2
+    assert [len(call) for call in poller.calls] == [256, 256, 88] * 2
+    assert poller.metrics()["requests"] == 6
+    assert poller.pending == {}
+
+
+def test_signature_poller_commitment():
+    Processed = TransactionConfirmationStatus.Processed
+    Confirmed = TransactionConfirmationStatus.Confirmed
+    Finalized = TransactionConfirmationStatus.Finalized
+    poller = FakePoller(statuses=[None, None, None, Processed, Confirmed, Confirmed, Finalized])
+    signature = Signature.new_unique()
+
+    async def run():
+        finalized = poller.watch(signature, commitment=Finalized)
+        confirmed = await poller.confirm(signature, timeout=5)
+        assert not finalized.done()
+        return confirmed, await finalized
+
+    confirmed, finalized = asyncio.run(run())
+    assert confirmed.confirmation_status == Confirmed
+    assert finalized.confirmation_status == Finalized
+    # Polling slows down while nothing lands
+    assert poller.intervals[0] < poller.intervals[2] <= poller.max_interval
+
+    # Signatures not landing in time aren't polled anymore
+    poller = FakePoller()
+    assert asyncio.run(poller.confirm(signature, timeout=0.02)) is None
+    assert poller.pending == {}
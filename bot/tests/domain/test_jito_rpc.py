@@ -0,0 +1,28 @@
+from solders.pubkey import Pubkey
+from unittest.mock import Mock
+
+from bot.config import appconfig
+from bot.domain.jito_rpc import TipAccountsDirectory
+
+
+def test_tip_accounts_directory():
+    sdk = Mock()
+    directory = TipAccountsDirectory(sdk=sdk, ttl_seconds=60)
+    assert directory.is_stale
+
+    # Well known accounts are used until the directory is loaded
+    first = directory.pick()
+    assert str(first) == appconfig.JITO_TIP_ACCOUNTS[0]
+    assert str(directory.pick()) == appconfig.JITO_TIP_ACCOUNTS[1]
+
+    remote_accounts = [str(Pubkey.new_unique()) for _ in range(2)] + appconfig.JITO_TIP_ACCOUNTS[:1]
+    sdk.get_tip_accounts.return_value = {"success": True, "data": {"result": remote_accounts}}
+    assert directory.refresh()
+    assert not directory.is_stale
+
+    # Least recently used accounts first: the one already used goes last
+    assert [str(directory.pick()) for _ in range(3)] == remote_accounts
+
+    sdk.get_tip_accounts.return_value = {"success": False, "error": "HTTP Error"}
+    assert not directory.refresh()
+    assert len(directory.accounts) == 3
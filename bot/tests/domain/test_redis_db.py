@@ -0,0 +1,296 @@
+import asyncio
+import json
+import redis
+import redis.asyncio
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.config import appconfig
+from bot.domain.redis_db import AsyncRedisDB, RedisDB
+from bot.libs.utils import Trader, TxType
+
+
+def token_document(name: str, is_checked: bool = False, trader: str = Trader.sniper.value) -> dict:
+    return {
+        "name": name,
+        "symbol": name.upper(),
+        "amount": 0.5,
+        "is_checked": is_checked,
+        "timestamp": 1732830811.3,
+        "trader": trader,
+        "traderPublicKey": "dev"
+    }
+
+
+def recording_execute(executed: list, result: list):
+    """
+    Pipeline.execute stand-in keeping the commands of every execution
+    """
+    def execute(pipeline, **kwargs):
+        executed.append(list(pipeline.command_stack))
+        return list(result)
+    return execute
+
+
+def redis_db(search_enabled: bool = True) -> RedisDB:
+    redisdb = RedisDB.__new__(RedisDB)
+    redisdb.client = MagicMock()
+    redisdb.search_client = MagicMock()
+    redisdb.search_enabled = search_enabled
+    return redisdb
+
+
+def test_get_fresh_tokens_search(monkeypatch):
+    monkeypatch.setattr(RedisDB, "batch_size", 2)
+    redisdb = redis_db()
+    documents = [("token:mint{}".format(index), token_document("t{}".format(index))) for index in range(3)]
+    pages = [documents[0:2], documents[2:]]
+    redisdb.search_client.search.side_effect = [
+        SimpleNamespace(total=3, docs=[SimpleNamespace(id=key, json=json.dumps(data)) for key, data in page])
+        for page in pages
+    ]
+
+    tokens = redisdb.get_fresh_tokens(trader=Trader.sniper)
+    assert [token["mint"] for token in tokens] == ["mint0", "mint1", "mint2"]
+    assert tokens[0]["track_traders"] == ["dev"] and tokens[0]["amount"] == 0.5
+    # One query per page of matches, no keyspace scan nor per key reads
+    queries = [call.args[0] for call in redisdb.search_client.search.call_args_list]
+    assert [query.query_string() for query in queries] == ["@trader:{sniper} @is_checked:{false}"] * 2
+    redisdb.client.scan_iter.assert_not_called()
+    redisdb.client.json().get.assert_not_called()
+
+
+def test_get_fresh_tokens_scan(monkeypatch):
+    monkeypatch.setattr(RedisDB, "batch_size", 2)
+    redisdb = redis_db(search_enabled=False)
+    documents = {
+        "token:fresh": token_document("fresh"),
+        "token:checked": token_document("checked", is_checked=True),
+        "token:other": token_document("other", trader="scanner"),
+        "token:gone": None
+    }
+    redisdb.client.scan_iter.return_value = iter(documents)
+    redisdb.client.json().mget.side_effect = lambda keys, path: [
+        [documents[key]] if documents[key] else None for key in keys
+    ]
+
+    tokens = redisdb.get_fresh_tokens(trader=Trader.sniper)
+    assert [token["key"] for token in tokens] == ["token:fresh"]
+    # Keys are read in batches
+    assert redisdb.client.json().mget.call_count == 2
+
+    redisdb.client.json().get.return_value = token_document("notified")
+    tokens = redisdb.get_fresh_tokens(trader=Trader.sniper, mint_address="token:notified")
+    assert [token["name"] for token in tokens] == ["notified"]
+    redisdb.client.json().get.assert_called_with("token:notified")
+
+
+def test_update_token(monkeypatch):
+    redisdb = redis_db()
+    # Commands are queued by a real pipeline and captured instead of sent
+    redisdb.client = redis.StrictRedis(decode_responses=True)
+    executed = []
+    monkeypatch.setattr(redis.client.Pipeline, "execute", recording_execute(executed=executed, result=[]))
+
+    token = {"key": "token:mint", "mint": "mint", "name": "t", "trades": [{"txType": "buy"}] * 50}
+    token = redisdb.update_token(token=token, is_checked=True)
+    assert token["is_checked"] and token["trades"] == []
+    commands = [command for command, _ in executed[0]]
+    assert {command[0] for command in commands} == {"JSON.SET", "PERSIST"}
+    assert ("JSON.SET", "token:mint", "$.trades", "[]") in commands
+    # Checked tokens being traded don't expire
+    assert commands[-1] == ("PERSIST", "token:mint")
+
+    trades = [{"txType": "buy", "tokenAmount": 1}, {"txType": "sell", "tokenAmount": 1}]
+    token = redisdb.update_token(
+        token=token,
+        txn="txn",
+        action=TxType.buy,
+        amount=0.5,
+        trader=Trader.sniper,
+        trades=trades
+    )
+    assert not token["is_closed"] and token["trades"] == trades and token["buy_txn"] == "txn"
+    # One pipeline per transition, fields are set by path and trades are appended
+    assert len(executed) == 2
+    commands = [command for command, _ in executed[1]]
+    assert ("JSON.SET", "token:mint", "$.buy_txn", '"txn"') in commands
+    assert ("JSON.SET", "token:mint", "$.trades", "[]", "NX") in commands
+    assert commands[-1] == ("JSON.ARRAPPEND", "token:mint", "$.trades") + tuple(json.dumps(trade) for trade in trades)
+    assert all(command[2] != "$" for command in commands)
+
+
+def test_close_token_archive(monkeypatch):
+    stored = [{"txType": "buy", "tokenAmount": index} for index in range(300)]
+    redisdb = redis_db()
+    redisdb.client.json().get.return_value = [stored]
+    redisdb.client.pipeline = redis.StrictRedis(decode_responses=True).pipeline
+    executed = []
+    monkeypatch.setattr(redis.client.Pipeline, "execute", recording_execute(executed=executed, result=[]))
+
+    token = {"key": "token:mint", "mint": "mint", "name": "t"}
+    sell = {"txType": "sell", "tokenAmount": 300}
+    token = redisdb.update_token(
+        token=token,
+        txn="txn",
+        action=TxType.sell,
+        amount=0.5,
+        trader=Trader.sniper,
+        is_closed=True,
+        trades=[sell]
+    )
+    assert token["is_closed"] and token["trades"] == [sell]
+    redisdb.client.json().get.assert_called_once_with("token:mint", "$.trades")
+    commands = [command for command, _ in executed[0]]
+    archive = [command for command in commands if command[0] == "SET"]
+    assert archive[0][1] == "archive:token:mint"
+    # The token keeps a summary, the trades are compressed in the archive key
+    assert ("JSON.SET", "token:mint", "$.trades", "[]") in commands
+    assert ("JSON.SET", "token:mint", "$.trades_count", "301") in commands
+    assert ("JSON.SET", "token:mint", "$.trades_archive", '"archive:token:mint"') in commands
+    assert "JSON.ARRAPPEND" not in [command[0] for command in commands]
+    assert len(archive[0][2]) < len(json.dumps(stored + [sell])) / 4
+
+    redisdb.client.get.return_value = archive[0][2]
+    assert redisdb.get_archived_trades("token:mint") == stored + [sell]
+    redisdb.client.get.assert_called_with("archive:token:mint")
+
+
+def test_token_stream(monkeypatch):
+    redisdb = redis_db()
+    redisdb.client = redis.StrictRedis(decode_responses=True)
+    redisdb.consumer = "sniper-1"
+    redisdb.stream_groups = set()
+    executed = []
+    monkeypatch.setattr(
+        redis.client.Pipeline,
+        "execute",
+        recording_execute(executed=executed, result=[True, True, "1-0"])
+    )
+
+    # The scanner saves the token and hands a compact record in the same transaction
+    token_data = dict(token_document("fresh"), trades=[{"txType": "buy"}] * 10, initial_buy_sols=1.5)
+    assert redisdb.set_token(token="mint", token_data=token_data)
+    (json_set, _), (expire, _), (xadd, _) = executed[0]
+    assert json_set[:3] == ("JSON.SET", "token:mint", "$")
+    # Tokens no sniper checks are deleted by redis
+    assert expire == ("EXPIRE", "token:mint", appconfig.REDIS_UNCHECKED_TOKEN_TTL_SECONDS)
+    assert xadd[:2] == ("XADD", RedisDB.stream_name)
+    record = json.loads(xadd[xadd.index("token") + 1])
+    assert set(record) == {"amount", "trader", "is_checked", "timestamp", "name", "symbol", "traderPublicKey"}
+
+    client = redisdb.client = MagicMock()
+    client.xautoclaim.return_value = []
+    client.xreadgroup.return_value = [[RedisDB.stream_name, [
+        ("1-0", {"key": "token:mint", "token": json.dumps(record)}),
+        ("2-0", {"key": "token:other", "token": json.dumps(token_document("other", trader="scanner"))})
+    ]]]
+    tokens = redisdb.read_tokens(trader=Trader.sniper, count=2)
+    assert [(token["mint"], token["stream_id"]) for token in tokens] == [("mint", "1-0")]
+    assert tokens[0]["track_traders"] == ["dev"]
+    client.xgroup_create.assert_called_once_with(RedisDB.stream_name, "sniper", id="$", mkstream=True)
+    client.xreadgroup.assert_called_once_with("sniper", "sniper-1", {RedisDB.stream_name: ">"}, count=2, block=1000)
+    # Tokens of other traders are acknowledged right away, the document isn't read
+    client.xack.assert_called_once_with(RedisDB.stream_name, "sniper", "2-0")
+    client.json().get.assert_not_called()
+
+    # Tokens left pending by another sniper are claimed before reading new ones
+    client.reset_mock()
+    client.xautoclaim.return_value = [("1-0", {"key": "token:mint", "token": json.dumps(record)}), (None, None)]
+    tokens = redisdb.read_tokens(trader=Trader.sniper)
+    assert [token["stream_id"] for token in tokens] == ["1-0"]
+    client.xreadgroup.assert_not_called()
+    client.xgroup_create.assert_not_called()
+
+
+def test_async_redis_db(monkeypatch):
+    monkeypatch.setattr(appconfig, "RETRYING_SECONDS", 0.001)
+    redisdb = AsyncRedisDB()
+    assert redisdb.client.connection_pool is AsyncRedisDB().client.connection_pool
+    client = redisdb.client = MagicMock()
+    # Redis is still starting on the first ping
+    client.ping = AsyncMock(side_effect=[redis.exceptions.ConnectionError("refused"), True])
+    client.execute_command = AsyncMock(side_effect=lambda *args: {
+        "FT._LIST": ["token_idx"],
+        "FT.INFO": ["index_name", "token_idx", "attributes", [
+            ["identifier", "$.{}".format(tag), "attribute", tag, "type", "TAG"] for tag in RedisDB.index_tags
+        ]],
+        "FT.SEARCH": [1, "token:mint", ["$", json.dumps(token_document("fresh"))]]
+    }[args[0]])
+    executed = []
+
+    async def execute(pipeline, **kwargs):
+        executed.append(list(pipeline.command_stack))
+        return [True]
+
+    monkeypatch.setattr(redis.asyncio.client.Pipeline, "execute", execute)
+    client.pipeline = redis.asyncio.StrictRedis(decode_responses=True).pipeline
+
+    async def run():
+        reading = asyncio.create_task(redisdb.get_fresh_tokens(trader=Trader.sniper))
+        await asyncio.sleep(0)
+        # Calls wait for the connection to be ready
+        assert not reading.done() and not await redisdb.wait_ready(timeout=0)
+        await redisdb.connect(timeout=1)
+        tokens = await reading
+        token = await redisdb.update_token(token=tokens[0], is_checked=True)
+        return tokens, token
+
+    tokens, token = asyncio.run(run())
+    assert redisdb.ready.is_set() and redisdb.search_enabled
+    assert client.ping.await_count == 2
+    assert [token["mint"] for token in tokens] == ["mint"]
+    assert token["is_checked"]
+    assert ("JSON.SET", "token:mint", "$.is_checked", "true") in [command for command, _ in executed[0]]
+
+
+def test_delete_unchecked_tokens(monkeypatch):
+    monkeypatch.setattr(RedisDB, "batch_size", 2)
+    documents = {
+        "token:{}".format(index): token_document(str(index), is_checked=index % 3 == 0) for index in range(7)
+    }
+    checked_meanwhile = "token:4"
+
+    being_updated = set()
+
+    def unlink_unchecked(keys, args):
+        # Stand-in for the script: it only deletes the tokens still unchecked
+        documents[checked_meanwhile]["is_checked"] = True
+        deleted = [
+            key for key in keys
+            if not documents[key]["is_checked"] and documents[key]["timestamp"] <= args[0] and key not in being_updated
+        ]
+        for key in deleted:
+            del documents[key]
+        return len(deleted)
+
+    def search(query):
+        offset, limit = query.get_args()[-2:]
+        keys = [key for key, data in documents.items() if not data["is_checked"]][offset: offset + limit]
+        return SimpleNamespace(total=len(keys), docs=[SimpleNamespace(id=key) for key in keys])
+
+    redisdb = redis_db()
+    redisdb.client.register_script.return_value = unlink_unchecked
+    redisdb.search_client.search.side_effect = search
+    assert redisdb.delete_unchecked_tokens() == 3
+    assert sorted(documents) == ["token:0", "token:3", "token:4", "token:6"]
+    query = redisdb.search_client.search.call_args.args[0]
+    assert query.get_args()[1:] == ["NOCONTENT", "LIMIT", 0, 2]
+    redisdb.client.scan.assert_not_called()
+
+    # A page whose tokens are all kept doesn't end the cleanup: the next pages are deleted
+    documents.update({"token:{}".format(index): token_document(str(index)) for index in range(10, 15)})
+    being_updated.update({"token:10", "token:11"})
+    assert redisdb.delete_unchecked_tokens() == 3
+    assert sorted(documents) == ["token:0", "token:10", "token:11", "token:3", "token:4", "token:6"]
+    query = redisdb.search_client.search.call_args.args[0]
+    assert query.get_args()[-2:] == [2, 2]
+
+    # Without RediSearch scanned keys are handed to the script
+    documents["token:7"] = token_document("7")
+    redisdb = redis_db(search_enabled=False)
+    redisdb.client.register_script.return_value = unlink_unchecked
+    redisdb.client.scan.side_effect = [(5, ["token:0", "token:3"]), (0, ["token:6", "token:7"])]
+    assert redisdb.delete_unchecked_tokens() == 1
+    assert "token:7" not in documents and redisdb.client.scan.call_count == 2
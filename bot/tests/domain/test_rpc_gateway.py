@@ -0,0 +1,80 @@
+import asyncio
+import json
+import threading
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from solders.pubkey import Pubkey
+
+from bot.config import appconfig
+from bot.domain.rpc_gateway import RpcGateway, rpc_gateway, rpc_client, rpc_post, rpc_metrics, endpoint_url
+
+
+class RpcHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive connections
+    connections = set()
+
+    def do_POST(self):
+        RpcHandler.connections.add(self.client_address)
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "id": request["id"],
+            "result": {"context": {"slot": 1}, "value": 5_000_000_000}
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def rpc_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RpcHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    RpcHandler.connections = set()
+    yield "http://127.0.0.1:{}".format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def test_rpc_gateway_pools_connections(rpc_server):
+    for index in range(3):
+        response = rpc_post(rpc_server + "/?api-key=test", json={"jsonrpc": "2.0", "id": index, "method": "getBalance"})
+        assert response.json()["result"]["value"] == 5_000_000_000
+    # Every request went through the same kept alive connection
+    assert len(RpcHandler.connections) == 1
+
+    async def get_balances():
+        async with rpc_client(rpc_server) as client:
+            balances = await asyncio.gather(*[client.get_balance(Pubkey.default()) for _ in range(4)])
+        return [balance.value for balance in balances]
+
+    assert asyncio.run(get_balances()) == [5_000_000_000] * 4
+
+    metrics = rpc_metrics()["127.0.0.1"]
+    assert metrics["requests"] == 7
+    assert metrics["errors"] == 0
+    assert metrics["in_flight"] == 0
+    assert metrics["max_in_flight"] <= metrics["max_concurrency"]
+    asyncio.run(rpc_gateway.aclose())
+
+
+def test_rpc_gateway_endpoints():
+    gateway = RpcGateway(names={"https://rpc.test/?api-key=1": "test"}, concurrency={"test": 2}, timeout=3)
+    endpoint = gateway.endpoint("https://rpc.test/?api-key=1")
+    assert endpoint is gateway.endpoint("https://rpc.test/?api-key=1")
+    assert endpoint.name == "test"
+    assert endpoint.max_concurrency == 2
+    assert endpoint.timeout == 3
+    assert gateway.endpoint("https://other.test").max_concurrency == gateway.max_concurrency
+
+    # The bot's gateway is configured from appconfig
+    assert rpc_gateway.timeout == appconfig.RPC_TIMEOUT_SECONDS
+    assert rpc_gateway.max_concurrency == appconfig.RPC_MAX_CONCURRENT_REQUESTS
+    assert endpoint_url("https://other.test/api/v1/bundles?uuid=1") == "https://other.test"
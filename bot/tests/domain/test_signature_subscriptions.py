@@ -0,0 +1,110 @@
+import asyncio
+import json
+import websockets
+
+from solders.signature import Signature
+from solders.transaction_status import TransactionConfirmationStatus
+from types import SimpleNamespace
+
+from bot.domain.confirmations import SignatureStatusPoller
+from bot.domain.signature_subscriptions import SignatureSubscriptions
+
+
+class FakePoller(SignatureStatusPoller):
+    def __init__(self, landed: set = None):
+        """
+        :param landed[set]: signatures confirmed by the RPC node.
+        """
+        super().__init__(min_interval=0.005, max_interval=0.01)
+        self.landed = landed or set()
+        self.polled = set()
+
+    async def fetch(self, signatures):
+        self.polled.update(signatures)
+        return [
+            SimpleNamespace(slot=7, err=None, confirmation_status=TransactionConfirmationStatus.Confirmed)
+            if signature in self.landed else None
+            for signature in signatures
+        ]
+
+
+async def rpc_node(websocket, rejected: set, silent: set):
+    """
+    Stand-in RPC websocket: notifies every subscribed signature unless it's rejected or silent.
+    """
+    subscription = 100
+    async for message in websocket:
+        request = json.loads(message)
+        if request["method"] != "signatureSubscribe":
+            continue
+        signature = request["params"][0]
+        if signature in rejected:
+            await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32602}}))
+            continue
+        subscription += 1
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": subscription}))
+        if signature in silent:
+            continue
+        await websocket.send(json.dumps({
+            "jsonrpc": "2.0",
+            "method": "signatureNotification",
+            "params": {
+                "result": {"context": {"slot": 42}, "value": {"err": None}},
+                "subscription": subscription
+            }
+        }))
+
+
+def test_signature_subscriptions():
+    pushed = [Signature.new_unique() for _ in range(5)]
+    rejected, silent = Signature.new_unique(), Signature.new_unique()
+    poller = FakePoller(landed={rejected, silent})
+
+    async def run():
+        server = await websockets.serve(
+            lambda websocket, *args: rpc_node(websocket, rejected={str(rejected)}, silent={str(silent)}),
+            "127.0.0.1",
+            0
+        )
+        port = server.sockets[0].getsockname()[1]
+        subscriptions = SignatureSubscriptions(
+            url="ws://127.0.0.1:{}".format(port),
+            poller=poller,
+            fallback_seconds=0.1
+        )
+        subscriptions.start()
+        while subscriptions.websocket is None:
+            await asyncio.sleep(0.005)
+
+        statuses = await asyncio.gather(*[
+            subscriptions.confirm(signature, timeout=5) for signature in pushed + [rejected, silent]
+        ])
+        metrics = subscriptions.metrics()
+        await subscriptions.stop()
+        server.close()
+        await server.wait_closed()
+        return statuses, metrics
+
+    statuses, metrics = asyncio.run(run())
+    assert all(status is not None and status.ok for status in statuses)
+    # Notified signatures are confirmed by the websocket without polling
+    assert [status.slot for status in statuses] == [42] * 5 + [7, 7]
+    assert poller.polled == {rejected, silent}
+    assert metrics["pushed"] == 5 and metrics["fallbacks"] == 2
+    assert metrics["pending"] == 0 and metrics["subscriptions"] == 0
+
+
+def test_signature_subscriptions_disconnected():
+    signature = Signature.new_unique()
+    poller = FakePoller(landed={signature})
+    # Nothing listening: signatures are polled while it keeps reconnecting
+    subscriptions = SignatureSubscriptions(url="ws://127.0.0.1:9", poller=poller, fallback_seconds=5)
+
+    async def run():
+        status = await subscriptions.confirm(signature, timeout=5)
+        await subscriptions.stop()
+        return status
+
+    status = asyncio.run(run())
+    assert status.slot == 7
+    assert subscriptions.pending == {}
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from solders.keypair import Keypair
+
+from bot.config import appconfig, AppMode
+from bot.domain.trade_executor import TradeError, TradeExecutor, TradeStatus, backoff_delay
+from bot.libs.utils import TxType
+
+
+class FakeTradeExecutor(TradeExecutor):
+    def __init__(self, outcomes, seconds: float = 0, **kwargs):
+        """
+        :param outcomes[list]: signatures or TradeErrors returned by each attempt.
+        """
+        super().__init__(backoff_base_seconds=0.001, backoff_max_seconds=0.01, **kwargs)
+        self.outcomes = list(outcomes)
+        self.seconds = seconds
+        self.attempts = 0
+
+    async def attempt(self, data, keypair) -> str:
+        self.attempts += 1
+        await asyncio.sleep(self.seconds)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def execute(executor: TradeExecutor, txtype: TxType):
+    return executor.execute(data={}, keypair=Keypair(), txtype=txtype, mint="mint")
+
+
+def test_backoff_delay():
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=0.1, cap=1)
+        assert 0 <= delay <= min(1, 0.1 * 2 ** attempt)
+
+
+def test_trade_executor(monkeypatch):
+    monkeypatch.setattr(appconfig, "APPMODE", AppMode.real.value)
+
+    # Sells are retried until they're sent
+    executor = FakeTradeExecutor(
+        outcomes=[TradeError("busy"), TradeError("busy"), "signature"],
+        max_retries=3
+    )
+    result = asyncio.run(execute(executor, TxType.sell))
+    assert result.ok and result.status == TradeStatus.sent
+    assert result.signature == "signature"
+    assert result.attempts == 3
+
+    # Buys aren't retried
+    executor = FakeTradeExecutor(outcomes=[TradeError("busy"), "signature"], max_retries=3)
+    result = asyncio.run(execute(executor, TxType.buy))
+    assert result.status == TradeStatus.failed and result.error == "busy"
+    assert executor.attempts == 1
+
+    # Non retryable errors and exhausted retries give up
+    executor = FakeTradeExecutor(outcomes=[TradeError("bad request", retryable=False)], max_retries=3)
+    assert asyncio.run(execute(executor, TxType.sell)).attempts == 1
+    executor = FakeTradeExecutor(outcomes=[TradeError("busy")] * 3, max_retries=2)
+    result = asyncio.run(execute(executor, TxType.sell))
+    assert result.status == TradeStatus.failed and result.attempts == 3
+
+
+def test_trade_executor_deadline(monkeypatch):
+    monkeypatch.setattr(appconfig, "APPMODE", AppMode.real.value)
+    executor = FakeTradeExecutor(outcomes=["signature"], seconds=5, max_retries=3, deadline_seconds=0.05)
+
+    async def run():
+        # A stuck sell doesn't hold the event loop
+        ticks = 0
+        trade = asyncio.ensure_future(execute(executor, TxType.sell))
+        while not trade.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return trade.result(), ticks
+
+    start = time.perf_counter()
+    result, ticks = asyncio.run(run())
+    assert result.status == TradeStatus.timeout and not result.ok
+    assert time.perf_counter() - start < 1
+    assert ticks >= 3
@@ -0,0 +1,83 @@
+import asyncio
+
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.message import Message
+from solders.transaction import Transaction
+from solders.transaction_status import TransactionConfirmationStatus
+from types import SimpleNamespace
+
+from bot.domain.confirmations import SignatureStatusPoller
+from bot.domain.transaction_fanout import TransactionFanout, TransactionSink
+
+
+class FakePoller(SignatureStatusPoller):
+    def __init__(self, landed_after: int = 2, **kwargs):
+        """
+        :param landed_after[int]: polls before signatures are confirmed.
+        """
+        super().__init__(min_interval=0.005, max_interval=0.01, **kwargs)
+        self.landed_after = landed_after
+        self.calls = []
+
+    async def fetch(self, signatures):
+        self.calls.append(list(signatures))
+        if len(self.calls) < self.landed_after:
+            return [None] * len(signatures)
+        return [
+            SimpleNamespace(slot=100, err=None, confirmation_status=TransactionConfirmationStatus.Confirmed)
+            for _ in signatures
+        ]
+
+
+class FakeSink(TransactionSink):
+    def __init__(self, name: str, seconds: float = 0, error: str = None):
+        super().__init__(name=name, url="http://localhost")
+        self.seconds = seconds
+        self.error = error
+        self.sent = []
+        self.cancelled = False
+
+    async def send(self, encoded: str):
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise ValueError(self.error)
+        self.sent.append(encoded)
+
+
+def signed_transaction() -> Transaction:
+    payer = Keypair()
+    return Transaction([payer], Message([], payer.pubkey()), Hash.new_unique())
+
+
+def test_transaction_fanout():
+    slow = FakeSink("slow", seconds=10)
+    failing = FakeSink("failing", error="Blockhash not found")
+    fast = FakeSink("fast")
+    fanout = TransactionFanout(sinks=[slow, failing, fast], poller=FakePoller(), rebroadcast_seconds=0.002)
+    transaction = signed_transaction()
+
+    result = asyncio.run(fanout.submit(transaction, timeout=5))
+    assert result.ok and result.landed
+    assert result.signature == transaction.signatures[0]
+    assert result.first_sink == "fast"
+    assert result.errors == {"failing": "Blockhash not found"}
+    # The slow sink is cancelled as soon as the transaction lands
+    assert slow.cancelled and slow.sent == []
+    assert len(fast.sent) >= 1
+
+    metrics = fanout.metrics()
+    assert metrics["fast"]["wins"] == 1 and metrics["fast"]["sent"] == len(fast.sent)
+    assert metrics["failing"]["errors"] == 1
+    assert metrics["slow"]["sent"] == 0
+
+    # Every sink failing gives up without waiting for the timeout
+    fanout = TransactionFanout(sinks=[FakeSink("failing", error="rejected")], poller=FakePoller(landed_after=10**6))
+    result = asyncio.run(fanout.submit(signed_transaction(), timeout=5))
+    assert not result.landed
+    assert result.error == "failing: rejected"
+    assert fanout.poller.pending == {}
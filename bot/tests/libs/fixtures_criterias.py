@@ -27,3 +27,34 @@ def get_artifical_pump_validations():
 @pytest.fixture
 def get_max_seconds_in_market():
     yield 30
+
+
+@pytest.fixture
+def get_token_trades():
+    trades = [
+        ("4ajMNhqWCeDVJtddbNhD3ss5N6CFZ37nV9Mg7StvBHdb", "buy", 30582206.734745, 977513247.598136, 32.93049999996889),
+        ("4RBnqw6CB9ANn9e16WWamqZNBZDHXwuFVWSjosk43ptC", "buy", 14605679.543704, 962907568.054432, 33.42999999993804),
+        ("5gaewKWutRmK5J7iAFLFeEz8aeuhLMGsYwmXnZw8ib9L", "buy", 7147473.040359, 955760095.014073, 33.67999999992259),
+        ("AuKQzaXcZwWH77sJmwheexwVAyVg9oGfrdmKpgPuj7at", "buy", 8429777.204002, 947330317.810071, 33.97969999990408),
+        ("4RBnqw6CB9ANn9e16WWamqZNBZDHXwuFVWSjosk43ptC", "sell", 14605679.543704, 961935997.353775, 33.46376483316213),
+        (
+            "GazCsmGe5RkzZmaTtPrfYKnHqQ2RQZjq2uoW8nRUgYri", "sell", 34612903.225806,
+            1034976204.566216, 31.102164337673464
+        ),
+        (
+            "orcACRJYTFjTeo2pV8TfYRTpmqfoYgbVi9GeANXTCc8", "sell", 30291642.440098997,
+            1065267847.006315, 30.217752361964582
+        ),
+        ("5gaewKWutRmK5J7iAFLFeEz8aeuhLMGsYwmXnZw8ib9L", "buy", 584679.9521120004, 1000363301.34041, 32.17830957699855),
+    ]
+    yield [
+        {
+            "mint": "4Wo7nxVsPV125DW3Tr2ppPrzrnNFwidiKjWyVsifpump",
+            "traderPublicKey": trader,
+            "txType": tx_type,
+            "tokenAmount": token_amount,
+            "vTokensInBondingCurve": v_tokens,
+            "vSolInBondingCurve": v_sol,
+        }
+        for trader, tx_type, token_amount, v_tokens, v_sol in trades
+    ]
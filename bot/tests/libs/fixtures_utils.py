@@ -0,0 +1,132 @@
+import base58
+import base64
+import pytest
+import struct
+
+from types import SimpleNamespace
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.message import Message
+from solders.keypair import Keypair
+from solders.transaction import VersionedTransaction
+
+from bot.config import appconfig
+from bot.libs.idl_decoder import instruction_discriminator
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("<I", len(data)) + data
+
+
+def pump_instruction(data: bytes, accounts: list) -> SimpleNamespace:
+    return SimpleNamespace(
+        program_id=appconfig.PUMP_PROGRAM,
+        data=base58.b58encode(data).decode("utf-8"),
+        accounts=accounts
+    )
+
+
+def transaction(instructions: list, accounts: list) -> SimpleNamespace:
+    # jsonParsed transactions: account keys include every account used by the instructions
+    message = SimpleNamespace(
+        instructions=instructions,
+        account_keys=[SimpleNamespace(pubkey=account) for account in accounts]
+    )
+    return SimpleNamespace(transaction=SimpleNamespace(message=message))
+
+
+@pytest.fixture
+def get_create_instruction_data():
+    yield struct.pack("<Q", instruction_discriminator("create")) + \
+        encode_string("Some Day") + encode_string("SMD") + encode_string("https://ipfs.io/ipfs/some_day")
+
+
+@pytest.fixture
+def get_buy_instruction_data():
+    yield struct.pack("<QQQ", instruction_discriminator("buy"), 100_000_000 * 10**6, 3 * 10**9)
+
+
+@pytest.fixture
+def get_set_params_instruction_data():
+    yield struct.pack("<Q", instruction_discriminator("setParams")) + bytes(Keypair().pubkey()) + struct.pack(
+        "<QQQQQ", 1_073_000_000_000_000, 30_000_000_000, 793_100_000_000_000, 1_000_000_000_000_000, 100
+    )
+
+
+@pytest.fixture
+def get_sell_instruction_data():
+    yield struct.pack("<QQQ", instruction_discriminator("sell"), 100_000_000 * 10**6, 2 * 10**9)
+
+
+@pytest.fixture
+def get_pump_block(get_create_instruction_data, get_buy_instruction_data):
+    create_accounts = [Keypair().pubkey() for _ in range(14)]
+    mint = create_accounts[0]
+    transactions = [transaction(
+        instructions=[pump_instruction(data=get_create_instruction_data, accounts=create_accounts)],
+        accounts=create_accounts
+    )]
+    # Five different sniper bots buying the new token
+    for _ in range(5):
+        buy_accounts = [Keypair().pubkey() for _ in range(12)]
+        buy_accounts[2] = mint
+        unrelated_accounts = [Keypair().pubkey() for _ in range(20)]
+        transactions.append(transaction(
+            instructions=[pump_instruction(data=get_buy_instruction_data, accounts=buy_accounts)],
+            accounts=unrelated_accounts + buy_accounts
+        ))
+
+    yield SimpleNamespace(
+        value=SimpleNamespace(
+            transactions=transactions,
+            parent_slot=100,
+            block_time=1732963950
+        )
+    ), str(mint)
+
+
+def encoded_transaction(data: bytes, accounts: list, err=None) -> dict:
+    # base64 transactions as they're pushed by blockSubscribe
+    payer = Keypair()
+    instruction = Instruction(
+        program_id=appconfig.PUMP_PROGRAM,
+        data=data,
+        accounts=[AccountMeta(pubkey=account, is_signer=False, is_writable=True) for account in accounts]
+    )
+    message = Message.new_with_blockhash([instruction], payer.pubkey(), Hash.default())
+    return {
+        "transaction": [base64.b64encode(bytes(VersionedTransaction(message, [payer]))).decode("utf-8"), "base64"],
+        "meta": {"err": err, "loadedAddresses": {"writable": [], "readonly": []}}
+    }
+
+
+@pytest.fixture
+def get_pump_block_notification(get_create_instruction_data, get_buy_instruction_data):
+    create_accounts = [Keypair().pubkey() for _ in range(14)]
+    mint = create_accounts[0]
+    transactions = [encoded_transaction(data=get_create_instruction_data, accounts=create_accounts)]
+    for index in range(4):
+        buy_accounts = [Keypair().pubkey() for _ in range(12)]
+        buy_accounts[2] = mint
+        # Last buy failed and it shouldn't be taken into account
+        transactions.append(encoded_transaction(
+            data=get_buy_instruction_data,
+            accounts=buy_accounts,
+            err={"InstructionError": [0, "Custom"]} if index == 3 else None
+        ))
+
+    yield {
+        "jsonrpc": "2.0",
+        "method": "blockNotification",
+        "params": {
+            "result": {
+                "context": {"slot": 101},
+                "value": {
+                    "slot": 101,
+                    "block": {"parentSlot": 100, "blockTime": 1732963950, "transactions": transactions}
+                }
+            },
+            "subscription": 1
+        }
+    }, str(mint)
@@ -0,0 +1,102 @@
+import asyncio
+import numpy as np
+
+from solders.pubkey import Pubkey
+from unittest.mock import patch
+
+from bot.libs.bonding_curve import (
+    BondingCurveMirror,
+    BondingCurveState,
+    INITIAL_VIRTUAL_SOL_RESERVES,
+    INITIAL_VIRTUAL_TOKEN_RESERVES,
+    curve_from_block,
+    quote_buy,
+    quote_buy_batch,
+    quote_sell,
+    quote_sell_batch
+)
+
+
+def test_bonding_curve_mirror():
+    mirror = BondingCurveMirror(max_age_seconds=60)
+    msg = {
+        "mint": "some_mint",
+        "txType": "buy",
+        "vTokensInBondingCurve": 977513247.598136,
+        "vSolInBondingCurve": 32.93049999996889
+    }
+    state = mirror.update_from_trade(msg)
+    assert mirror.get("some_mint") is state
+    assert state.virtual_sol_reserves == 32_930_500_000
+    assert state.virtual_token_reserves == 977_513_247_598_136
+    assert state.real_sol_reserves == 2_930_500_000
+    assert mirror.update_from_trade({"mint": "some_mint", "txType": "buy"}) is None
+
+    state = mirror.update_from_block({
+        "mint": "other_mint",
+        "buyers": [{"tokens_bought": 100_000_000, "sol_traded": 3.0}] * 2
+    })
+    assert state.virtual_token_reserves == INITIAL_VIRTUAL_TOKEN_RESERVES - 200_000_000_000_000
+    assert state.virtual_sol_reserves == 36_872_852_233
+
+    # Stale curves are fetched from the RPC node
+    mirror.max_age_seconds = -1
+    assert mirror.get("some_mint") is None
+    fetched = BondingCurveState.from_virtual_reserves(
+        virtual_sol_reserves=INITIAL_VIRTUAL_SOL_RESERVES,
+        virtual_token_reserves=INITIAL_VIRTUAL_TOKEN_RESERVES
+    )
+    with patch("bot.libs.bonding_curve.get_pump_curve_state", return_value=fetched) as get_pump_curve_state_mocked:
+        mint = Pubkey.new_unique()
+        assert asyncio.run(mirror.astate(mint=mint, curve_address=Pubkey.new_unique())) is fetched
+        assert mirror.curves[str(mint)][0] is fetched
+        get_pump_curve_state_mocked.assert_called_once()
+
+    mirror.remove(str(mint))
+    assert str(mint) not in mirror.curves
+
+
+def test_curve_from_block_ignores_max_sol_cost():
+    buyers = [{"tokens_bought": 100_000_000, "sol_traded": 3.0}] * 2
+    state = curve_from_block({"mint": "some_mint", "buyers": buyers})
+
+    # Buyers paying for a 50% slippage leave the same curve
+    padded_buyers = [{"tokens_bought": 100_000_000, "sol_traded": 4.5}] * 2
+    padded_state = curve_from_block({"mint": "some_mint", "buyers": padded_buyers})
+    assert padded_state.virtual_sol_reserves == state.virtual_sol_reserves
+    assert padded_state.virtual_token_reserves == state.virtual_token_reserves
+
+    # Constant product is kept
+    product = state.virtual_sol_reserves * state.virtual_token_reserves
+    assert 0 <= INITIAL_VIRTUAL_SOL_RESERVES * INITIAL_VIRTUAL_TOKEN_RESERVES - product < state.virtual_token_reserves
+
+    # Buys of repeated buyers are counted by decode_token_bundles even though they aren't listed
+    state = curve_from_block({"mint": "some_mint", "buyers": buyers[:1], "raw_tokens_bought": 200_000_000_000_000})
+    assert state.virtual_sol_reserves == 36_872_852_233
+
+
+def test_quotes():
+    state = BondingCurveState.from_virtual_reserves(
+        virtual_sol_reserves=INITIAL_VIRTUAL_SOL_RESERVES,
+        virtual_token_reserves=INITIAL_VIRTUAL_TOKEN_RESERVES
+    )
+    # 1 SOL into a new curve: 1% fee on top of the SOL going into the curve
+    quote = quote_buy(state=state, lamports=1_010_000_000, slippage_bps=2_000)
+    assert quote.fee == 10_000_000
+    assert quote.amount_out == 34_612_903_225_806
+    assert quote.limit == 1_212_000_000
+
+    quote = quote_sell(state=state, tokens=34_612_903_225_806, slippage_bps=2_000)
+    assert quote.amount_out == 928_125_000
+    assert quote.fee == 9_374_999
+    assert quote.limit == quote.amount_out * 8_000 // 10_000
+
+    # Batched quotes match the scalar ones unit by unit
+    lamports = np.array([0, 1, 1_010_000_000, 85 * 10**9])
+    batch = quote_buy_batch(state=state, lamports=lamports, slippage_bps=500)
+    assert batch.amount_out.tolist() == [quote_buy(state, int(amount), 500).amount_out for amount in lamports]
+    assert batch.limit.tolist() == [quote_buy(state, int(amount), 500).limit for amount in lamports]
+
+    tokens = np.array([0, 1, 34_612_903_225_806, 793_100_000_000_000])
+    batch = quote_sell_batch(state=state, tokens=tokens, slippage_bps=500)
+    assert batch.amount_out.tolist() == [quote_sell(state, int(amount), 500).amount_out for amount in tokens]
@@ -4,7 +4,10 @@ from unittest.mock import patch, Mock
 import pytest
 from bot.config import appconfig
 from bot.tests.libs.fixtures_criterias import *
+from bot.libs.utils import TimestampBuckets
 from bot.libs.criterias import (
+    TokenTradeState,
+    CompiledCriteria,
     exit_on_first_sale,
     trading_analytics,
     exit_on_first_sale,
@@ -1513,3 +1516,108 @@ def test_max_seconds_in_market(
     )
     assert result == expected_result, description
 
+
+def test_token_trade_state_matches_trading_analytics(get_pubkey, get_token_trades):
+    # Values produced by trading_analytics before it was built on TokenTradeState:
+    # (consecutive_buys, consecutive_sells, is_relevant_trade, is_non_relevant_trade_count,
+    #  seller_is_an_unknown_trader, max_consecutive_buys as (quantity, sols))
+    expected_trades = [
+        (0, 0, True, 0, False, [(0, 0.5)]),
+        (1, 0, True, 0, False, [(1, 0.999499999969153)]),
+        (2, 0, True, 0, False, [(2, 1.2494999999537058)]),
+        (3, 0, True, 0, False, [(3, 1.5491999999351904)]),
+        (0, 1, False, 1, False, [(3, 1.5491999999351904)]),
+        (0, 1, False, 2, True, [(3, 1.5491999999351904)]),
+        (0, 2, False, 0, True, [(3, 1.5491999999351904)]),
+        (1, 0, True, 0, False, [(3, 1.5491999999351904), (1, 1.960557215033969)]),
+    ]
+    state = TokenTradeState(pubkey=get_pubkey)
+    for msg, expected in zip(get_token_trades, expected_trades, strict=True):
+        new_msg = state.update(msg=msg, amount_traded=0.5, token_timestamps={})
+        assert (
+            new_msg["consecutive_buys"],
+            new_msg["consecutive_sells"],
+            new_msg["is_relevant_trade"],
+            new_msg["is_non_relevant_trade_count"],
+            new_msg["seller_is_an_unknown_trader"]
+        ) == expected[:5]
+        assert new_msg["vSolInBondingCurve_Base"] == pytest.approx(32.43049999996889)
+        assert [
+            (buys["quantity"], pytest.approx(buys["sols"])) for buys in new_msg["max_consecutive_buys"]
+        ] == expected[5]
+
+
+def test_token_trade_state_is_bounded(get_pubkey, get_token_trades):
+    state = TokenTradeState(pubkey=get_pubkey, trades_size=4, buys_size=2)
+    for msg in get_token_trades * 10:
+        state.update(msg=msg, amount_traded=0.5, token_timestamps={})
+
+    assert len(state.trades) == 4
+    assert len(state.max_consecutive_buys) == 2
+    assert len(state.traders_seen) == len({msg["traderPublicKey"] for msg in get_token_trades})
+
+
+@pytest.mark.parametrize(
+    "criteria, msg, expected_result, description", [
+        (
+            {"max_seconds_between_buys": 5, "max_consecutive_buys": 2},
+            {"consecutive_buys": 1, "seconds_between_buys": 1},
+            (False, None),
+            "No criteria met"
+        ),
+        (
+            {"max_consecutive_sells": 2, "max_consecutive_buys": 2},
+            {"consecutive_buys": 3, "consecutive_sells": 3},
+            (True, "max_consecutive_sells"),
+            "First criteria in roadmap order wins"
+        ),
+        (
+            {"max_seconds_in_market": 10, "max_consecutive_buys": 2},
+            {"consecutive_buys": 3, "consecutive_buys_timestamps": {"20241212121212": 1}},
+            (True, "max_seconds_in_market"),
+            "Expensive criteria written first keeps its priority"
+        ),
+    ]
+)
+def test_compiled_criteria(criteria, msg, expected_result, description):
+    compiled = CompiledCriteria(criteria=criteria)
+    assert compiled(msg=msg, amount_traded=0.5) == expected_result, description
+
+
+def test_compiled_criteria_order_and_stats():
+    compiled = CompiledCriteria(criteria={"max_seconds_in_market": 10, "max_consecutive_buys": 2})
+    # Cheap criteria are evaluated first
+    assert [position for position, _ in compiled.predicates] == [1, 0]
+
+    compiled(msg={"consecutive_buys": 1, "consecutive_buys_timestamps": {"20241212121212": 1}}, amount_traded=0.5)
+    stats = compiled.stats()
+    assert stats["max_consecutive_buys"]["calls"] == 1
+    assert stats["max_seconds_in_market"]["hits"] == 1
+
+
+def test_compiled_criteria_unknown_name():
+    with pytest.raises(ValueError):
+        CompiledCriteria(criteria={"max_consecutive_buys": 2, "not_a_criteria": True})
+
+
+def test_timestamp_buckets(get_artifical_pump_validations):
+    stamps = {"20241212121212": 3, "20241212121213": 4, "20241212121215": 1, "20241212121216": 3}
+    buckets = TimestampBuckets.from_stamps(stamps=stamps)
+
+    assert len(buckets) == 4
+    assert buckets.last - buckets.first == 4
+    assert buckets.count_at_least(min_count=3) == 3
+    assert buckets.to_stamps() == stamps
+    assert buys_in_the_same_second(
+        validations=get_artifical_pump_validations,
+        msg={"consecutive_buys_timestamps": buckets}
+    ) == buys_in_the_same_second(
+        validations=get_artifical_pump_validations,
+        msg={"consecutive_buys_timestamps": stamps}
+    )
+
+    # Full buffers drop the second oldest bucket and keep the first one
+    buckets = TimestampBuckets(size=3)
+    for second in [100, 101, 101, 102, 103]:
+        buckets.add(timestamp=second)
+    assert list(buckets.seconds[:len(buckets)]) == [100, 102, 103]
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import websockets
+
+from bot.libs.feed_replay import BLOCKS, PUMPPORTAL, FeedWriter, Frame, RecordingProxy, ReplayServer, read_frames
+from bot.libs.solana_functions import read_pump_blocks
+from bot.tests.libs.fixtures_utils import *
+
+
+def test_replay_feeds(tmp_path, get_pump_block_notification):
+    notification, mint = get_pump_block_notification
+    new_token = {"mint": mint, "txType": "create", "name": "Some Day"}
+    frames = [
+        Frame(0.0, PUMPPORTAL, json.dumps({"message": "Successfully subscribed to token creation events."})),
+        Frame(0.1, BLOCKS, json.dumps({"jsonrpc": "2.0", "result": 1, "id": 1})),
+        Frame(0.2, PUMPPORTAL, json.dumps(new_token)),
+        Frame(0.3, BLOCKS, json.dumps(notification)),
+    ]
+    path = str(tmp_path / "session.jsonl.gz")
+
+    async def run():
+        replay = ReplayServer(frames=frames, speed=10)
+        urls = await replay.start()
+
+        # The session is recorded through a proxy in front of the replayed feed
+        with FeedWriter(path) as writer:
+            proxy = RecordingProxy(writer=writer, feed=PUMPPORTAL, url=urls[PUMPPORTAL])
+            async with websockets.connect(await proxy.start()) as websocket:
+                await websocket.send(json.dumps({"method": "subscribeNewToken"}))
+                received = [json.loads(message) async for message in websocket]
+            await proxy.stop()
+
+        async with websockets.connect(urls[BLOCKS]) as websocket:
+            blocks = [token_data async for token_data in read_pump_blocks(websocket)]
+        await replay.stop()
+        return received, blocks, replay.metrics()
+
+    received, blocks, metrics = asyncio.run(run())
+    assert received[1] == new_token
+    assert list(blocks[0].keys()) == [mint]
+    # Recorded gaps are divided by speed
+    assert metrics[PUMPPORTAL]["sent"] == 2 and 0.02 <= metrics[PUMPPORTAL]["seconds"] < 0.2
+    assert metrics[BLOCKS]["sent"] == 2
+
+    recorded = read_frames(path)
+    assert [frame.data for frame in recorded] == [frame.data for frame in frames if frame.feed == PUMPPORTAL]
+    assert recorded[1].offset >= 0.02 and {frame.feed for frame in recorded} == {PUMPPORTAL}
+
+    # Recordings are replayed as fast as possible with speed 0
+    async def replay_recording():
+        replay = ReplayServer.from_file(path, speed=0)
+        urls = await replay.start()
+        async with websockets.connect(urls[PUMPPORTAL]) as websocket:
+            received = [message async for message in websocket]
+        await replay.stop()
+        return received, replay.metrics()
+
+    received, metrics = asyncio.run(replay_recording())
+    assert received == [frame.data for frame in recorded]
+    assert metrics[PUMPPORTAL]["seconds"] < 0.02
@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+import struct
+
+from solders.hash import Hash
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from unittest.mock import patch, AsyncMock
+
+from bot.config import appconfig
+from bot.libs.pump_buy import sell_token
+from bot.libs.sell_template import SELL_DISCRIMINATOR, SellTemplates, sell_templates
+
+
+def test_sell_template():
+    templates = SellTemplates()
+    payer = Keypair()
+    mint = Pubkey.new_unique()
+    template = templates.prepare(
+        mint=mint,
+        payer=payer,
+        bonding_curve=Pubkey.new_unique(),
+        associated_bonding_curve=Pubkey.new_unique(),
+        crator_vault=Pubkey.new_unique(),
+        token_amount=34_612_903_225_806,
+        jito_tip_account=Pubkey.new_unique()
+    )
+    assert templates.get(mint) is template
+    assert templates.get(Pubkey.new_unique()) is None
+
+    transaction = template.transaction(
+        amount=34_612_903_225_806,
+        min_sol_output=742_500_000,
+        blockhash=Hash.new_unique()
+    )
+    transaction.verify()
+    message = transaction.message
+    keys = message.account_keys
+    # Compute price, compute limit, sell and Jito tip
+    assert len(message.instructions) == 4
+    sell = message.instructions[2]
+    assert keys[sell.program_id_index] == appconfig.PUMP_PROGRAM
+    assert bytes(sell.data) == SELL_DISCRIMINATOR + struct.pack("<QQ", 34_612_903_225_806, 742_500_000)
+    assert keys[sell.accounts[5]] == template.associated_token_account
+
+    # A new blockhash and amounts only change the sell data and the signature
+    other = template.transaction(amount=1, min_sol_output=2, blockhash=Hash.new_unique())
+    other.verify()
+    assert other.signatures[0] != transaction.signatures[0]
+    assert list(other.message.account_keys) == list(keys)
+    assert bytes(other.message.instructions[2].data)[8:] == struct.pack("<QQ", 1, 2)
+
+    templates.remove(mint)
+    assert templates.get(mint) is None
+
+
+@patch("bot.libs.pump_buy._sell_token", new_callable=AsyncMock)
+def test_sell_token_drops_template(sell_token_mocked):
+    mint = Pubkey.new_unique()
+    accounts = {
+        "bonding_curve": Pubkey.new_unique(),
+        "associated_bonding_curve": Pubkey.new_unique(),
+        "crator_vault": Pubkey.new_unique()
+    }
+
+    # Sold or not, the template with the payer's keypair is gone
+    for signature in ["signature", None]:
+        sell_templates.prepare(mint=mint, payer=Keypair(), token_amount=1_000, **accounts)
+        sell_token_mocked.return_value = signature
+        assert asyncio.run(sell_token(mint=mint, token_balance=0.001, **accounts)) == signature
+        assert sell_templates.get(mint) is None
+
+    sell_templates.prepare(mint=mint, payer=Keypair(), token_amount=1_000, **accounts)
+    sell_token_mocked.side_effect = RuntimeError("AccountNotInitialized")
+    with pytest.raises(RuntimeError):
+        asyncio.run(sell_token(mint=mint, token_balance=0.001, **accounts))
+    assert sell_templates.get(mint) is None
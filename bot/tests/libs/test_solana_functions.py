@@ -0,0 +1,19 @@
+from bot.libs.solana_functions import decode_block_notification
+from bot.libs.utils import select_tradable_tokens
+from bot.tests.libs.fixtures_utils import *
+
+
+def test_decode_block_notification(get_pump_block_notification):
+    notification, mint = get_pump_block_notification
+    token_data = decode_block_notification(notification)
+
+    assert list(token_data.keys()) == [mint]
+    token = token_data[mint]
+    assert token["name"] == "Some Day"
+    assert token["block"] == 101
+    assert token["blockTime"] == 1732963950
+    assert len(token["buyers"]) == 3
+
+    assert select_tradable_tokens(token_data=token_data, threshold=300_000_000, min_scam_buyers=2) == [token]
+    assert select_tradable_tokens(token_data=token_data, threshold=400_000_000, min_scam_buyers=2) == []
+    assert decode_block_notification({"jsonrpc": "2.0", "result": 1, "id": 1}) is None
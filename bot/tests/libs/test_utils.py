@@ -0,0 +1,80 @@
+from bot.libs.utils import (
+    decode_token_bundles,
+    get_token_data_from_block,
+    get_pump_instruction_decoders,
+    load_idl,
+    PUMP_IDL_PATH
+)
+from bot.libs.idl_decoder import load_instruction_decoders, interpret_instruction, instruction_discriminator, benchmark
+from bot.tests.libs.fixtures_utils import *
+
+
+def test_pump_instruction_decoders():
+    decoders = get_pump_instruction_decoders()
+    assert decoders is get_pump_instruction_decoders()
+    assert decoders[8576854823835016728][0] == "create"
+    assert decoders[16927863322537952870][0] == "buy"
+
+
+def test_get_token_data_from_block(get_pump_block):
+    block, mint = get_pump_block
+    tokens = get_token_data_from_block(block=block, threshold=400_000_000, min_scam_buyers=3)
+
+    assert len(tokens) == 1
+    token = tokens[0]
+    assert token["mint"] == mint
+    assert token["name"] == "Some Day"
+    assert token["symbol"] == "SMD"
+    assert token["block"] == 101
+    assert len(token["buyers"]) == 5
+    assert token["buyers"][0]["tokens_bought"] == 100_000_000
+    assert token["raw_tokens_bought"] == 5 * 100_000_000 * 10**6
+
+
+def test_decode_token_bundles_repeated_buyer(get_create_instruction_data, get_buy_instruction_data):
+    create_accounts = [str(Keypair().pubkey()) for _ in range(14)]
+    buy_accounts = [str(Keypair().pubkey()) for _ in range(12)]
+    buy_accounts[2] = create_accounts[0]
+    instructions = [(get_create_instruction_data, create_accounts)] + [(get_buy_instruction_data, buy_accounts)] * 2
+
+    token_data = decode_token_bundles(instructions=instructions, block=101, block_time=1732963950)
+    token = token_data[create_accounts[0]]
+    # Second buy of the same wallet isn't listed but it's bought from the curve
+    assert len(token["buyers"]) == 1
+    assert token["raw_tokens_bought"] == 2 * 100_000_000 * 10**6
+
+
+def test_generated_decoders_match_interpreter(
+    get_create_instruction_data,
+    get_buy_instruction_data,
+    get_sell_instruction_data,
+    get_set_params_instruction_data
+):
+    idl = load_idl(PUMP_IDL_PATH)
+    decoders = load_instruction_decoders(idl=idl)
+    definitions = {ix_def["name"]: ix_def for ix_def in idl["instructions"]}
+    samples = [
+        get_create_instruction_data,
+        get_buy_instruction_data,
+        get_sell_instruction_data,
+        get_set_params_instruction_data,
+        struct.pack("<Q", instruction_discriminator("initialize")),
+        struct.pack("<Q", instruction_discriminator("withdraw"))
+    ]
+
+    # Every IDL instruction is covered
+    assert {decoders[struct.unpack_from("<Q", ix_data)[0]].name for ix_data in samples} == set(definitions)
+    for ix_data in samples:
+        decoder = decoders[struct.unpack_from("<Q", ix_data)[0]]
+        assert decoder(ix_data)._asdict() == interpret_instruction(ix_data, definitions[decoder.name])
+
+    # publicKey arguments are raw bytes in both implementations
+    assert len(decoders[instruction_discriminator("setParams")](get_set_params_instruction_data).feeRecipient) == 32
+
+    result = benchmark(
+        decoders=decoders,
+        idl=idl,
+        samples=[get_create_instruction_data, get_buy_instruction_data],
+        iterations=10
+    )
+    assert result["instructions"] == 20
@@ -25,3 +25,19 @@ def get_trader():
 @pytest.fixture
 def get_pubkey():
     yield "1ajMNhqWCeDVJtddbNhD1ss1N1CFZ11nV1Mg1StvBHdb"
+
+
+@pytest.fixture
+def get_checked_tokens():
+    yield [
+        {
+            "mint": "Token{}_pump".format(index),
+            "name": "Token{}".format(index),
+            "trading_amount": 0.01,
+            "is_checked": True,
+            "is_closed": False,
+            "is_traded": False,
+            "trades": []
+        }
+        for index in range(3)
+    ]
@@ -1,12 +1,18 @@
-from bot.module.pump import Pump, TxType
-from bot.config import appconfig
+import asyncio
+
+from bot.module.pump import Pump, TxType, TradeRoadmap
+from bot.config import appconfig, AppMode
+from bot.libs.bonding_curve import bonding_curves
 from bot.libs.utils import Trader, get_solana_balance
 from bot.tests.module.fixture_pump import *
 
 from datetime import datetime
 from typing import Any
-from unittest.mock import patch, Mock
-from solders.message import Message
+from unittest.mock import patch, AsyncMock, Mock
+from solders.hash import Hash
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.transaction import VersionedTransaction
 
 
 @patch.object(Pump, "get_balance")
@@ -68,17 +74,13 @@ def test_attribute_handling(
         )
     ]
 )
-@patch.object(Keypair, "pubkey")
-@patch("requests.post")
-@patch("solders.transaction.VersionedTransaction.from_bytes")
-@patch("solders.transaction.VersionedTransaction.message")
+@patch("bot.domain.trade_executor.sign_transaction")
+@patch("bot.domain.trade_executor.rpc_apost", new_callable=AsyncMock)
 @patch.object(Pump, "get_balance")
 def test_trade(
-    pubkey_mocked,
-    post_mocked,
-    from_bytes_mocked,
-    message_mocked,
     get_balance_mocked,
+    post_mocked,
+    sign_transaction_mocked,
     txtype,
     token,
     amount,
@@ -87,27 +89,33 @@ def test_trade(
     status_code,
     content,
     description,
-    get_pubkey
+    get_pubkey,
+    monkeypatch
 ):
-    pubkey_mocked.return_value = Mock(get_pubkey)
-    
+    monkeypatch.setattr(appconfig, "APPMODE", AppMode.real.value)
     mock_response = Mock()
     mock_response.status_code = status_code
     mock_response.content = content
-    post_mocked.return_value = mock_response
+    rpc_response = Mock(status_code=500, text="error")
+    rpc_response.json.return_value = {"error": {"message": "Internal error"}}
+    post_mocked.side_effect = [mock_response, rpc_response]
+    keypair = Keypair()
+    message = MessageV0.try_compile(keypair.pubkey(), [], [], Hash.default())
+    sign_transaction_mocked.return_value = VersionedTransaction(message, [keypair])
 
     appconfig.TRADING_RETRIES = retries
 
-    from_bytes_mocked.return_value = Mock(message=Mock())
-    message_mocked.return_value = Mock()
-
     get_balance_mocked.return_value = 5.00
-    
+
     pump = Pump(executor_name="test", trader_type=Trader.sniper)
     pump.add_update_token(token=token)
-    txn = pump.trade(txtype=txtype, token=token["mint"], keypair=pubkey_mocked, amount=amount)
-    assert txn == expected_value, description
-    post_mocked.assert_called_once
+    result = asyncio.run(pump.trade(txtype=txtype, token=token["mint"], keypair=keypair, amount=amount))
+    assert result.signature == expected_value, description
+    assert not result.ok, description
+    assert result.attempts == 1, description
+    assert post_mocked.await_args_list[0].args[0] == appconfig.PUMPFUN_TRANSACTION_URL
+    assert post_mocked.await_args_list[0].kwargs["data"]["publicKey"] == str(keypair.pubkey())
+
 
 @pytest.mark.parametrize(
     "description, trade_action, mint_address", [
@@ -143,4 +151,62 @@ def test_fees():
     pump.decrease_fees()
     pump.decrease_fees()
     pump.decrease_fees()
-    assert pump.trade_fees == appconfig.FEES
\ No newline at end of file
+    assert pump.trade_fees == appconfig.FEES
+
+
+@patch("bot.module.pump.signature_subscriptions")
+@patch("bot.module.pump.tip_accounts")
+@patch("bot.module.pump.blockhash_cache")
+def test_block_suscription(blockhash_cache_mocked, tip_accounts_mocked, signature_subscriptions_mocked):
+    pump = Pump(executor_name="test", trader_type=Trader.sniper)
+    pump.max_trades = 1
+    traded = []
+
+    async def trade_position(token_data):
+        traded.append(token_data["mint"])
+
+    def scam_token(mint, buyers):
+        return {"mint": mint, "buyers": [{"tokens_bought": 200_000_000, "sol_traded": 5.0}] * buyers}
+
+    async def blocks():
+        yield {}
+        # Only the scam token with enough buyers will be traded
+        yield {"mint_a": scam_token(mint="mint_a", buyers=2), "mint_b": scam_token(mint="mint_b", buyers=4)}
+        await asyncio.sleep(0)
+        # Max trades reached: scanner stops before this block
+        yield {"mint_c": scam_token(mint="mint_c", buyers=4)}
+
+    async def run():
+        pump.trade_position = trade_position
+        await pump.block_suscription(step=TradeRoadmap.scanner_blocks[1], blocks=blocks())
+        await asyncio.gather(*pump.trading_tasks)
+
+    asyncio.run(run())
+    assert traded == ["mint_b"]
+
+
+@patch("bot.module.pump.calculate_pump_curve_price_local")
+@patch("bot.module.pump.buy_token", new_callable=AsyncMock)
+def test_trade_position_releases_failed_buy(buy_token_mocked, price_mocked):
+    pump = Pump(executor_name="test", trader_type=Trader.sniper)
+    pump.max_trades = 1
+    buy_token_mocked.return_value = (None, None, None)
+    token_data = {
+        "mint": str(Pubkey.new_unique()),
+        "bondingCurve": str(Pubkey.new_unique()),
+        "associatedBondingCurve": str(Pubkey.new_unique()),
+        "buyers": [{"creator_vault": str(Pubkey.new_unique()), "tokens_bought": 100_000_000}]
+    }
+
+    # Position is counted as soon as it's opened
+    pump.trade_counter += 1
+    bonding_curves.update_from_block(token_data)
+    asyncio.run(pump.trade_position(token_data=token_data))
+    buy_token_mocked.assert_awaited_once()
+    assert pump.trade_counter == 0
+    assert token_data["mint"] not in bonding_curves.curves
+
+    # Unparsable mints release the trade too
+    pump.trade_counter += 1
+    asyncio.run(pump.trade_position(token_data=dict(token_data, mint="not_a_mint")))
+    assert pump.trade_counter == 0
@@ -0,0 +1,117 @@
+import asyncio
+
+from bot.config import appconfig
+from bot.module.pump import Pump, TradeRoadmap, Suscription
+from bot.module.roadmap import RoadmapExecutor, StepLatencyHistogram
+from bot.domain.trade_executor import TradeResult, TradeStatus
+from bot.libs.utils import Trader, TxType
+from bot.tests.module.fixture_pump import *
+
+from unittest.mock import patch, AsyncMock, Mock
+
+
+def test_step_latency_histogram():
+    histogram = StepLatencyHistogram()
+    histogram.observe(step="1:BUY", seconds=0.07)
+    histogram.observe(step="1:BUY", seconds=0.3)
+    histogram.observe(step="1:BUY", seconds=500)
+
+    snapshot = histogram.snapshot()["1:BUY"]
+    assert snapshot["count"] == 3
+    assert snapshot["buckets"]["0.1"] == 1
+    assert snapshot["buckets"]["0.5"] == 1
+    assert snapshot["buckets"]["inf"] == 1
+
+
+@patch.object(Pump, "update_balance")
+@patch.object(Pump, "token_trade_subscription")
+@patch.object(Pump, "trade")
+@patch.object(Pump, "get_balance")
+def test_positions_move_independently(
+    get_balance_mocked,
+    trade_mocked,
+    token_trade_subscription_mocked,
+    update_balance_mocked,
+    get_checked_tokens
+):
+    get_balance_mocked.return_value = 5.00
+    trade_mocked.return_value = TradeResult(
+        txtype=TxType.buy,
+        mint="mint",
+        status=TradeStatus.sent,
+        signature="txn",
+        attempts=1
+    )
+    token_trade_subscription_mocked.return_value = (True, "max_consecutive_buys")
+
+    pump = Pump(executor_name="test", trader_type=Trader.sniper)
+    redisdb = Mock()
+    redisdb.update_token = AsyncMock(side_effect=lambda token, **kwargs: token)
+    sent = []
+
+    async def send(payload):
+        sent.append(payload)
+
+    async def run():
+        executor = RoadmapExecutor(
+            pump=pump,
+            steps=TradeRoadmap.sniper_1,
+            redisdb=redisdb,
+            send=send,
+            max_positions=2
+        )
+        first, second, third = get_checked_tokens
+        for token in get_checked_tokens:
+            pump.add_update_token(token=token)
+
+        assert executor.open_position(first)
+        assert executor.open_position(second)
+        assert not executor.open_position(third)
+        await asyncio.sleep(0.05)
+
+        # Both tokens were bought and are waiting for their own trades
+        assert trade_mocked.call_count == 2
+        assert {payload["keys"][0] for payload in sent} == {first["mint"], second["mint"]}
+        assert all(position.step_index == 2 for position in executor.positions.values())
+
+        # A trade for the first token closes only its position
+        executor.dispatch({"mint": first["mint"], "txType": "buy"})
+        await asyncio.sleep(0.05)
+        assert list(executor.positions) == [second["mint"]]
+        assert sent[-1] == {"method": Suscription.unsubscribeTokenTrade.value, "keys": [first["mint"]]}
+
+        # Market inactivity closes the second one
+        executor.positions[second["mint"]].deadline = 0
+        executor.expire()
+        await asyncio.sleep(0.05)
+        await executor.close_all()
+        assert executor.positions == {}
+        assert pump.tokens[third["mint"]] == third
+        return executor.histogram.snapshot()
+
+    snapshot = asyncio.run(run())
+    assert trade_mocked.call_count == 4
+    assert snapshot["2:TOKEN_SUBSCRIPTION"]["count"] == 2
+    assert snapshot["5:CLOSE_TOKEN"]["count"] == 2
+
+
+@patch.object(Pump, "check_token_for_trading")
+def test_feed_positions_survives_redis_errors(check_token_for_trading_mocked, monkeypatch, get_checked_tokens):
+    monkeypatch.setattr(appconfig, "RETRYING_SECONDS", 0.001)
+    token = dict(get_checked_tokens[0], stream_id="1-0")
+    check_token_for_trading_mocked.side_effect = lambda token, **kwargs: token
+
+    pump = Pump(executor_name="test", trader_type=Trader.sniper)
+    redisdb = Mock()
+    redisdb.read_tokens = AsyncMock(side_effect=[ConnectionError("Connection reset by peer"), [token]])
+    redisdb.ack_tokens = AsyncMock()
+    executor = Mock(free_slots=1, positions={})
+
+    def open_position(token):
+        pump.stop_app = True
+        return True
+    executor.open_position.side_effect = open_position
+
+    asyncio.run(pump.feed_positions(executor=executor, step=TradeRoadmap.sniper_1[0], redisdb=redisdb))
+    executor.open_position.assert_called_once_with(token)
+    redisdb.ack_tokens.assert_awaited_once_with(trader=Trader.sniper, stream_ids=["1-0"])